@@ -1,24 +1,33 @@
 from __future__ import annotations
-import os
 import signal
+import time
 import numpy as np
 import cv2
 from colorama import Fore, Style, Back
 from tabulate import tabulate
 
+from nico_lib.gesture_minilib import GestureEngine, GestureEvent
 from nico_lib.hvc_minilib import HandVideoClassifier
 from nico_lib.hmi_minilib import Ball, Box, GUI, Text
+from nico_lib.manifest_minilib import load_manifest, manifest_path
+from nico_lib.sink_minilib import make_sink
 
 # ------------- EXECUTION SETTINGS -----------
 SHOW_INFO_AT_STARTUP = True
 
-MODEL_PATH = "Assets/model_data/model.h5"  # TensorFlow Keras model path root
-DATA_PATH = "Assets/datasets_records"  # The data path is used to extract the list of labels
+MODEL_PATH = "Assets/model_data/model.h5"  # TensorFlow Keras model path root, the labels are read from its manifest
 USE_VERBOSE_ON_HVC = True  # Enables INFO output from HandVideoClassifier
 VIDEO_OUTPUT = True  # Enables the video output of the camera (optional)
+SMOOTHING = dict(ema_alpha=0.5, vote_window=5, enter_threshold=0.7, exit_threshold=0.5)  # None for raw predictions
+HEADLESS = False  # No window at all (hosts without display), stop with Ctrl-C
+GUI_SINK = "none"  # Where the interface images are sent : "none", "shm:name", "mjpeg:port" or "file:path"
+CAMERA_IN_GUI = None  # Camera feed in the interface : None, "background" or "pip" (picture-in-picture)
 
 # -------------- Data formatting --------------
-MODEL_OUTPUT_LABELS = [class_file[:-4] for class_file in os.listdir(DATA_PATH)]
+MODEL_MANIFEST = load_manifest(MODEL_PATH)
+if MODEL_MANIFEST is None:
+    raise FileNotFoundError(f"The model manifest {manifest_path(MODEL_PATH)} is needed to get the labels")
+MODEL_OUTPUT_LABELS = MODEL_MANIFEST["labels"]
 POSTURE_DICT = dict(zip(MODEL_OUTPUT_LABELS, range(len(MODEL_OUTPUT_LABELS))))
 
 # -------------- USAGE SETTINGS ---------------
@@ -88,68 +97,91 @@ def create_base_scene(gui_handler: GUI) -> None:
     gui_handler.add_object(text_4)
 
 
+def register_handlers(engine: GestureEngine, gui_handler: GUI) -> None:
+    """
+    Connects the hands gestures to the interface actions.
+    :param engine: GestureEngine object from gesture_minilib
+    :param gui_handler: GUI object from hmi_minilib
+    """
+    held_objects = [None, None]  # Object grabbed by each hand
+
+    def grab(event: GestureEvent) -> None:
+        obj = gui_handler.query_point(event.position)  # Topmost object under the hand
+        if obj is not None and obj.can_by_grabbed and not obj.is_grabbed():
+            obj.set_grabbed(grabbed=True, holder_index=event.hand)
+            held_objects[event.hand] = obj
+
+    def drag(event: GestureEvent) -> None:
+        if held_objects[event.hand] is not None:
+            held_objects[event.hand].set_position(position=list(event.position))
+
+    def release(event: GestureEvent) -> None:
+        if held_objects[event.hand] is not None:
+            held_objects[event.hand].set_grabbed(grabbed=False)
+            held_objects[event.hand] = None
+
+    def delete(event: GestureEvent) -> None:
+        obj = gui_handler.query_point(event.position)
+        if obj is not None and not obj.is_grabbed():
+            gui_handler.delete_object(obj)
+
+    def add_ball(event: GestureEvent) -> None:
+        gui_handler.add_object(Ball(initial_position=list(event.position), ball_radius=20,
+                                    color=np.random.random(size=3)))
+
+    def add_box(event: GestureEvent) -> None:
+        gui_handler.add_object(Box(initial_position=list(event.position), box_size=[40, 50],
+                                   color=np.random.random(size=3)))
+
+    engine.on("grab", grab)
+    engine.on("drag", drag)
+    engine.on("release", release)
+    engine.on("enter", delete, posture=DEL_INDEX)
+    engine.on("enter", add_ball, posture=ADD_BALL_INDEX)
+    engine.on("enter", add_box, posture=ADD_BOX_INDEX)
+
+
 def main() -> None:
     # Video capture and detection initialisation
-    hvc = HandVideoClassifier(model_path=MODEL_PATH, stream_path=0, video_output=VIDEO_OUTPUT,
-                              labels_on_vid=MODEL_OUTPUT_LABELS, verbose=USE_VERBOSE_ON_HVC).start()
+    hvc = HandVideoClassifier(model_path=MODEL_PATH, stream_path=0, video_output=VIDEO_OUTPUT and not HEADLESS,
+                              labels_on_vid=MODEL_OUTPUT_LABELS, verbose=USE_VERBOSE_ON_HVC,
+                              smoothing=SMOOTHING, share_frames=CAMERA_IN_GUI is not None,
+                              landmarks_overlay=CAMERA_IN_GUI is not None).start()
 
     # Graphic interface initialisation
-    hmi = GUI(window_name="Interface")
+    gui_sink = make_sink(GUI_SINK)
+    hmi = GUI(window_name="Interface", headless=HEADLESS, sinks=[gui_sink] if gui_sink is not None else None)
+    if CAMERA_IN_GUI is not None:
+        hmi.set_camera(hvc.get_frame_buffer(), mode=CAMERA_IN_GUI)
 
     # Ctrl-C handling for clean subprocess shutdown
     signal.signal(signal.SIGINT, hvc.stop)
 
     create_base_scene(gui_handler=hmi)
 
-    prev_states = [-1, -1]  # Stores the previous hand states to detect changes in hands postures
-    while hvc.is_running():  # Mainloop tests and actions
-        states = hvc.get_predictions()
-        hands_coords = hvc.get__hands_coords()
-        hmi.set_hands_coords(hands_coords)
-
-        # Grab test
-        for hand_pos, hand_id in zip(hands_coords, range(2)):
-            for obj in hmi.objects:
-                held = False
-                if (np.less(np.abs(np.subtract(obj.get_position(), hand_pos)), obj.get_hit_box())).all() \
-                        and states[hand_id] == GRAB_INDEX and prev_states[hand_id] != GRAB_INDEX:
-                    obj.set_grabbed(grabbed=True, holder_index=hand_id)
-                    held = True
-                elif obj.is_grabbed() and hand_id == obj.grabbed_by and states[hand_id] == GRAB_INDEX:
-                    obj.set_position(position=hand_pos)
-                    held = True
-                if not held and hand_id == obj.grabbed_by:
-                    obj.set_grabbed(grabbed=False)
-                elif held:
-                    break
-
-        # Object deletion
-        for hand_pos, hand_id in zip(hands_coords, range(2)):
-            for obj, obj_id in zip(hmi.objects, range(len(hmi.objects))):
-                if (np.less(np.abs(np.subtract(obj.get_position(), hand_pos)), obj.get_hit_box())).all() \
-                        and states[hand_id] == DEL_INDEX and prev_states[hand_id] != DEL_INDEX:
-                    hmi.delete_object(obj_id)
-                    break
-
-        # Adding balls on hand position if ADD_BALL_INDEX state is reached by hand
-        for state, prev_state, xy in zip(states, prev_states, hands_coords):
-            if state == ADD_BALL_INDEX and prev_state != ADD_BALL_INDEX:
-                hmi.add_object(Ball(initial_position=xy, ball_radius=20, color=np.random.random(size=3)))
-
-        # Adding boxes on hand position if ADD_BOX_INDEX state is reached by hand
-        for state, prev_state, xy in zip(states, prev_states, hands_coords):
-            if state == ADD_BOX_INDEX and prev_state != ADD_BOX_INDEX:
-                hmi.add_object(Box(initial_position=xy, box_size=[40, 50], color=np.random.random(size=3)))
-
-        prev_states = states
+    engine = GestureEngine(grab_posture=GRAB_INDEX)
+    register_handlers(engine=engine, gui_handler=hmi)
+
+    last_frame_id = -1  # Index of the last processed frame, frames are processed only once
+    while hvc.is_running():  # Mainloop, the actions are done by the gesture handlers
+        results = hvc.get_results()
+        if results["frame_id"] != last_frame_id:
+            last_frame_id = results["frame_id"]
+            hands_coords = results["centers"].tolist()
+            hmi.set_hands_coords(hands_coords)
+            engine.update(results["predictions"].tolist(), hands_coords, float(results["timestamp"]))
 
         hmi.draw()
-        if cv2.waitKey(1) == 27:
+        if HEADLESS:
+            time.sleep(0.001)  # No waitKey pacing without window
+        elif cv2.waitKey(1) == 27:
             if hvc.is_running():  # If ended by Ctrl-C, the process could have stopped the hvc before
                 hvc.stop()
             break
 
-    cv2.destroyAllWindows()
+    hmi.close()
+    if not HEADLESS:
+        cv2.destroyAllWindows()
 
 
 if __name__ == '__main__':
@@ -159,9 +191,12 @@ if __name__ == '__main__':
         print(Style.RESET_ALL + "(Config. and classes infos can be disabled by setting SHOW_INFO_AT_STARTUP = False)\n")
         print(Fore.LIGHTBLUE_EX + "CONFIGURATION :\n\n" +
               tabulate(tabular_data=[["MODEL_PATH", MODEL_PATH],
-                                     ["DATA_PATH", DATA_PATH],
                                      ["USE_VERBOSE_ON_HVC", USE_VERBOSE_ON_HVC],
-                                     ["VIDEO_OUTPUT", VIDEO_OUTPUT]],
+                                     ["VIDEO_OUTPUT", VIDEO_OUTPUT],
+                                     ["SMOOTHING", SMOOTHING],
+                                     ["HEADLESS", HEADLESS],
+                                     ["GUI_SINK", GUI_SINK],
+                                     ["CAMERA_IN_GUI", CAMERA_IN_GUI]],
                        headers=["PARAMS", "VALUE"],
                        tablefmt="github",
                        stralign="left"))
@@ -0,0 +1,277 @@
+from __future__ import annotations
+import argparse
+import os
+import platform
+import sys
+import time
+import numpy as np
+import cv2
+from tabulate import tabulate
+
+from nico_lib.backend_minilib import load_backend
+from nico_lib.features_minilib import transform_landmarks
+from nico_lib.hmi_minilib import Ball, Box, ElementStore, GUI
+from nico_lib.landmarks_minilib import N_LANDMARKS, LandmarkExtractor
+from nico_lib.manifest_minilib import load_manifest
+from nico_lib.metrics_minilib import StageTimer, compare_results, load_results, make_results, save_results, \
+    summary_table
+from nico_lib.shm_minilib import ResultBlock
+
+MODEL_PATH = "Assets/model_data/model.h5"
+TRACE_EXTENSIONS = (".csv", ".npz")  # Landmarks traces, the other files are read as videos
+
+
+def load_trace(path: str) -> tuple:
+    """
+    Reads a landmarks trace: a .npz output of classify_video.py, or a CSV file with 63 (one hand, like the dataset
+    files) or 126 (two hands) coordinates per row. One hand traces are replayed with the mirrored hand as second hand,
+    so that the frames are classified like two hands frames of HandVideoClassifier.
+    :param path: trace file path.
+    :return: ((frames, 2, 21, 3) float32 landmarks, (frames,) number of hands).
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return np.nan_to_num(data["landmarks"]).astype(np.float32), data["n_hands"].astype(np.int64)
+
+    rows = np.loadtxt(path, delimiter=",", dtype=np.float32, ndmin=2)
+    if rows.shape[1] not in (N_LANDMARKS * 3, N_LANDMARKS * 6):
+        raise ValueError(f"Trace <{path}> has {rows.shape[1]} columns, {N_LANDMARKS * 3} (one hand) or "
+                         f"{N_LANDMARKS * 6} (two hands) landmarks coordinates expected")
+    landmarks = np.zeros((rows.shape[0], 2, N_LANDMARKS, 3), dtype=np.float32)
+    if rows.shape[1] == N_LANDMARKS * 3:
+        landmarks[:, 0] = rows.reshape(-1, N_LANDMARKS, 3)
+        landmarks[:, 1] = landmarks[:, 0]
+        landmarks[:, 1, :, 0] = 1 - landmarks[:, 1, :, 0]
+    else:
+        landmarks[:] = rows.reshape(-1, 2, N_LANDMARKS, 3)
+    return landmarks, np.full(rows.shape[0], 2, dtype=np.int64)
+
+
+def create_scene(gui: GUI, n_objects: int, seed: int = 0) -> None:
+    """
+    Fills the GUI with randomly placed balls and boxes.
+    :param gui: GUI object.
+    :param n_objects: number of objects.
+    :param seed: placement seed.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(n_objects):
+        position = [int(rng.integers(0, gui.size[0])), int(rng.integers(0, gui.size[1]))]
+        color = tuple(rng.random(3).tolist())
+        if i % 2 == 0:
+            gui.add_object(Ball(initial_position=position, ball_radius=int(rng.integers(10, 30)), color=color))
+        else:
+            gui.add_object(Box(initial_position=position, box_size=[int(rng.integers(20, 60)),
+                                                                   int(rng.integers(20, 60))], color=color))
+
+
+class PipelineBenchmark:
+    def __init__(self,
+                 model_path: str,
+                 backend: str | None = None,
+                 gui_size: tuple = (640, 480),
+                 gui_objects: int = 20,
+                 element_store: bool = False,
+                 detection_scale: float = 1.,
+                 warmup: int = 10,
+                 seed: int = 0) -> None:
+        """
+        Runs the stages of the HandVideoClassifier detection loop and of the GUI loop in a single process,
+        on recorded videos or landmarks traces, without camera or display, and times each stage of every frame:
+        decode, flip_cvtcolor, hands_process (detection and landmarks extraction), inference, publish (ResultBlock
+        write), read (ResultBlock read by the GUI side), hit_test (GUI.query_points), gui_update (objects under
+        the hands follow them), render (GUI.draw without imshow) and frame (all the stages).
+        Frames are processed as fast as possible.
+        :param model_path: model file, with its manifest for the input normalization.
+        :param backend: inference backend, guessed from model_path if None.
+        :param gui_size: (width, height) of the GUI.
+        :param gui_objects: number of objects of the GUI scene.
+        :param element_store: GUI with an ElementStore.
+        :param detection_scale: downscale of the frames fed to the detection.
+        :param warmup: number of first frames not timed.
+        :param seed: scene seed.
+        """
+        self.model = load_backend(model_path, backend)
+        self.model.warmup()
+        manifest = load_manifest(model_path, n_classes=self.model.n_classes)
+        self.normalization = manifest["input"]["normalization"] if manifest is not None else "none"
+        self.features = np.zeros((2, N_LANDMARKS, 3), dtype=np.float32)
+        self.detection_scale = detection_scale
+        self.warmup = warmup
+
+        self.results = ResultBlock()
+        self.gui = GUI(window_name="Benchmark", size=gui_size,
+                       element_store=ElementStore() if element_store else None)
+        create_scene(self.gui, gui_objects, seed)
+        self.timer = StageTimer()
+        self.frames = 0
+        self._previous_centers = None
+        self._hands = None
+
+    def replay(self, path: str, max_frames: int | None = None) -> int:
+        """
+        Replays a video or a landmarks trace.
+        :param path: video file, or .csv/.npz landmarks trace.
+        :param max_frames: maximum number of frames read from the file, all the frames if None.
+        :return: number of replayed frames.
+        """
+        if os.path.splitext(path)[1].lower() in TRACE_EXTENSIONS:
+            return self.replay_trace(path, max_frames)
+        return self.replay_video(path, max_frames)
+
+    def replay_video(self, path: str, max_frames: int | None = None) -> int:
+        """
+        Replays a video file through all the stages.
+        :param path: video file path.
+        :param max_frames: maximum number of frames, all the frames if None.
+        :return: number of replayed frames.
+        """
+        if self._hands is None:
+            import mediapipe as mp
+            self._hands = mp.solutions.hands.Hands(min_detection_confidence=0.9, max_num_hands=2)
+        extractor = LandmarkExtractor(max_num_hands=2)
+        stream = cv2.VideoCapture(path)
+        if not stream.isOpened():
+            raise IOError(f"Cannot open video file <{path}>")
+
+        frame_id = 0
+        try:
+            while max_frames is None or frame_id < max_frames:
+                start = time.perf_counter()
+                grabbed, src = stream.read()
+                if not grabbed:
+                    break
+                t = self.timer.lap("decode", start)
+                src = cv2.flip(src, 1)
+                rgb_src = src if self.detection_scale == 1 else \
+                    cv2.resize(src, None, fx=self.detection_scale, fy=self.detection_scale,
+                               interpolation=cv2.INTER_AREA)
+                rgb_src = cv2.cvtColor(rgb_src, cv2.COLOR_BGR2RGB)
+                t = self.timer.lap("flip_cvtcolor", t)
+                n_hands = extractor.extract(self._hands.process(rgb_src))
+                t = self.timer.lap("hands_process", t)
+                self._downstream(start, t, frame_id, (src.shape[1], src.shape[0]),
+                                 extractor.landmarks, n_hands, extractor.handedness, extractor.scores)
+                frame_id += 1
+        finally:
+            stream.release()
+        return frame_id
+
+    def replay_trace(self, path: str, max_frames: int | None = None) -> int:
+        """
+        Replays a landmarks trace through the stages following the detection.
+        :param path: .csv or .npz trace path, see load_trace.
+        :param max_frames: maximum number of frames, all the frames if None.
+        :return: number of replayed frames.
+        """
+        landmarks, n_hands = load_trace(path)
+        handedness = np.array([0, 1], dtype=np.int8)
+        scores = np.ones(2, dtype=np.float32)
+        n_frames = landmarks.shape[0] if max_frames is None else min(max_frames, landmarks.shape[0])
+        for frame_id in range(n_frames):
+            start = time.perf_counter()
+            self._downstream(start, start, frame_id, self.gui.size, landmarks[frame_id], int(n_hands[frame_id]),
+                             handedness, scores)
+        return n_frames
+
+    def _downstream(self, start: float, t: float, frame_id: int, frame_size: tuple, landmarks: np.ndarray,
+                    n_hands: int, handedness: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Stages following the detection, from the classification to the GUI rendering.
+        """
+        preds = None
+        if n_hands == 2:
+            preds = self.model.predict(transform_landmarks(landmarks, self.normalization, out=self.features))
+            t = self.timer.lap("inference", t)
+        self.results.publish(frame_id, time.monotonic(), frame_size, landmarks, handedness, scores, preds)
+        t = self.timer.lap("publish", t)
+
+        record = self.results.read()
+        t = self.timer.lap("read", t)
+        centers = record["centers"]
+        hit_objects = self.gui.query_points(centers)
+        t = self.timer.lap("hit_test", t)
+        if self._previous_centers is not None:
+            delta = centers - self._previous_centers
+            moved = {}  # An object under both hands follows the first one
+            for obj, hand_delta in zip(hit_objects, delta.tolist()):
+                if obj is not None and id(obj) not in moved:
+                    moved[id(obj)] = (obj, hand_delta)
+            if moved:
+                self.gui.move_objects([obj for obj, _ in moved.values()], [d for _, d in moved.values()])
+        self._previous_centers = centers
+        self.gui.set_hands_coords(centers.tolist())
+        t = self.timer.lap("gui_update", t)
+        self.gui.render()
+        t = self.timer.lap("render", t)
+        self.timer.add("frame", t - start)
+
+        self.frames += 1
+        if self.frames == self.warmup:
+            self.timer.reset()
+
+    def close(self) -> None:
+        """
+        Releases the detection and the result block.
+        """
+        if self._hands is not None:
+            self._hands.close()
+        self.results.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the detection and GUI stages on recorded videos or "
+                                                 "landmarks traces, without camera nor display")
+    parser.add_argument("inputs", nargs="+", help="Video files, or .csv/.npz landmarks traces")
+    parser.add_argument("--model_path", default=MODEL_PATH, help="Model file (.h5/.keras, .npz, .tflite or .onnx)")
+    parser.add_argument("--backend", default=None, help="Inference backend, guessed from the model file if not set")
+    parser.add_argument("--max_frames", type=int, default=None, help="Maximum number of frames of each input")
+    parser.add_argument("--warmup", type=int, default=10, help="Number of first frames not timed")
+    parser.add_argument("--detection_scale", type=float, default=1., help="Downscale of the detection frames")
+    parser.add_argument("--gui_objects", type=int, default=20, help="Number of objects of the GUI scene")
+    parser.add_argument("--element_store", help="GUI objects held in an ElementStore", action="store_true")
+    parser.add_argument("--output", default=None, help="JSON file the results are written to")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative timing increase reported as a regression by --compare")
+    args = parser.parse_args()
+
+    benchmark = PipelineBenchmark(args.model_path, args.backend,
+                                  gui_objects=args.gui_objects,
+                                  element_store=args.element_store,
+                                  detection_scale=args.detection_scale,
+                                  warmup=args.warmup)
+    try:
+        for path in args.inputs:
+            frames = benchmark.replay(path, args.max_frames)
+            print(f"INFO: {frames} frames replayed from <{path}>")
+    finally:
+        benchmark.close()
+
+    config = {"inputs": args.inputs, "model_path": args.model_path, "backend": args.backend,
+              "max_frames": args.max_frames, "warmup": args.warmup, "detection_scale": args.detection_scale,
+              "gui_objects": args.gui_objects, "element_store": args.element_store,
+              "platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__,
+              "opencv": cv2.__version__, "cpu_count": os.cpu_count()}
+    results = make_results(benchmark.timer, config)
+    rows = summary_table(results)
+    print(tabulate(tabular_data=rows[1:], headers=rows[0], tablefmt="rounded_outline"))
+    print(f"INFO: {results['frames']} timed frames, {results['fps']:.1f} FPS")
+    if args.output is not None:
+        save_results(results, args.output)
+        print(f"INFO: Results written to {args.output}")
+
+    if args.compare is not None:
+        baseline = load_results(args.compare)
+        changed = [key for key in config if baseline["config"].get(key) != config[key]]
+        if changed:
+            print(f"INFO: Settings differing from the compared run : {changed}")
+        rows, regressions = compare_results(baseline, results, args.tolerance)
+        print(tabulate(tabular_data=rows[1:], headers=rows[0], tablefmt="rounded_outline"))
+        if regressions:
+            print(f"INFO: Regressions above {args.tolerance:.0%} : {regressions}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import time
+
+from nico_lib.offline_minilib import classify_video, classify_video_parallel
+
+MODEL_PATH = "Assets/model_data/model.h5"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify the hands postures of every frame of a video file")
+    parser.add_argument("video_path", help="Video file to classify")
+    parser.add_argument("output_path", help="Per-frame results file (.csv, .parquet or .npz)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file (.h5/.keras, .npz, .tflite or .onnx)")
+    parser.add_argument("--backend", default=None, help="Inference backend, guessed from the model file if not set")
+    parser.add_argument("--start", type=int, default=0, help="Index of the first frame")
+    parser.add_argument("--end", type=int, default=None,
+                        help="Index after the last frame, the video is read until its end if not set")
+    parser.add_argument("--batch_size", type=int, default=256, help="Number of frames per inference call")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes, 0 to use all cores")
+    parser.add_argument("--no_flip", help="Do not mirror the frames before detection", action="store_true")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.jobs == 1:
+        n_frames = classify_video(args.video_path, args.model, args.output_path,
+                                  start_frame=args.start, end_frame=args.end, batch_size=args.batch_size,
+                                  backend=args.backend, flip=not args.no_flip)
+    else:
+        n_frames = classify_video_parallel(args.video_path, args.model, args.output_path,
+                                           n_jobs=args.jobs or None, start_frame=args.start, end_frame=args.end,
+                                           batch_size=args.batch_size, backend=args.backend,
+                                           flip=not args.no_flip)
+    duration = time.perf_counter() - start_time
+    print(f"INFO: {n_frames} frames classified in {duration:.1f} s ({n_frames / max(duration, 1e-9):.1f} FPS), "
+          f"results written to {args.output_path}")
+
+
+if __name__ == '__main__':
+    main()
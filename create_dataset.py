@@ -6,6 +6,10 @@ import numpy as np
 import csv
 import mediapipe as mp
 
+from nico_lib.dataset_minilib import list_class_files, parse_csv
+from nico_lib.features_minilib import normalize_landmarks
+from nico_lib.landmarks_minilib import LandmarkExtractor
+
 DATASET_PATH = "Assets/datasets_records"  # "path/to/folder" format
 class_path = ""
 SHOW_LM = True
@@ -31,7 +35,7 @@ def ask_class_name(dataset_path):
         exit(0)
 
     def show_dataset(path):
-        files_names = [class_file for class_file in os.listdir(path)]
+        files_names = list_class_files(path)
         posture_list = [x[:-4] for x in files_names]
         dataset_window = tk.Toplevel(app)
         dataset_window.title("Recorded data")
@@ -86,6 +90,7 @@ def main():
     mp_hands = mp.solutions.hands
     hands = mp_hands.Hands(min_detection_confidence=0.9)
     mp_draw = mp.solutions.drawing_utils
+    extractor = LandmarkExtractor(max_num_hands=2)
 
     # Capture object initialisation
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
@@ -101,26 +106,19 @@ def main():
                 # Detection
                 results = hands.process(img_rgb)
 
-                nb_hands = 0
-                # if at least one hand is detected :
-                if results.multi_hand_landmarks:
-                    nb_hands = len(results.multi_hand_landmarks)
+                nb_hands = extractor.extract(results)
 
                 if nb_hands == 0:
                     cv2.rectangle(img_rgb, (0, 0), (w, h), (0, 0, 0), 5)
                 elif nb_hands == 1:
                     cv2.rectangle(img_rgb, (0, 0), (w, h), (0, 255, 0), 5)
 
-                    for handLms in results.multi_hand_landmarks:
-
-                        mp_draw.draw_landmarks(img_rgb, handLms, mp_hands.HAND_CONNECTIONS)
+                    mp_draw.draw_landmarks(img_rgb, results.multi_hand_landmarks[0], mp_hands.HAND_CONNECTIONS)
 
-                        # Landmarks enumeration
-                        coords_list = np.zeros((21, 3), dtype=np.float32)
-                        for nb, lm in enumerate(handLms.landmark):
-                            coords_list[nb, :] = [lm.x, lm.y, lm.z]
-                            cx, cy = int(lm.x * w), int(lm.y * h)
-                            cv2.putText(img_rgb, str(nb), (cx + 5, cy + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+                    # Landmarks enumeration
+                    coords_list = extractor.landmarks[0]
+                    for nb, (cx, cy) in enumerate((coords_list[:, :2] * (w, h)).astype(int).tolist()):
+                        cv2.putText(img_rgb, str(nb), (cx + 5, cy + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
 
                     if cv2.waitKey(1) & 0xFF == 32:  # Windows space bar
                         file_writer.writerow(coords_list.flatten())
@@ -144,10 +142,10 @@ def main():
     cap.release()
     cv2.destroyAllWindows()
 
-    if SHOW_LM:
-        with open(class_path, 'r') as f:
-            if os.path.getsize(class_path) > 0:
-                lm_from_csv = np.loadtxt(f.readlines(), delimiter=',').reshape((-1, 21, 3))
+    if SHOW_LM and os.path.getsize(class_path) > 0:
+        lm_from_csv = parse_csv(class_path).reshape((-1, 21, 3))
+        # Wrist-centered and scale-normalized landmarks, as fed to models trained with this normalization
+        normalized = normalize_landmarks(lm_from_csv)
 
         for i in range(lm_from_csv.shape[0]):
             im = np.ones((img_rgb.shape[0] * 5, img_rgb.shape[1] * 5), dtype=np.uint8) * 255
@@ -157,7 +155,15 @@ def main():
                            radius=3,
                            color=(100, int(lm[2] * 5 * 255) % 255, 100),
                            thickness=2)
-            cv2.imshow(f"Landmarks in {DATASET_PATH}", im)
+            preview = np.ones((im.shape[0], im.shape[0]), dtype=np.uint8) * 255
+            for lm in normalized[i]:
+                cv2.circle(img=preview,
+                           center=(int(preview.shape[1] / 2 + lm[0] * preview.shape[0] / 4),
+                                   int(preview.shape[0] * 3 / 4 + lm[1] * preview.shape[0] / 4)),
+                           radius=3,
+                           color=(100, int(lm[2] * 255) % 255, 100),
+                           thickness=2)
+            cv2.imshow(f"Landmarks in {DATASET_PATH}", np.hstack((im, preview)))
             cv2.waitKey(1)
 
 
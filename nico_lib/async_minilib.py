@@ -0,0 +1,159 @@
+from __future__ import annotations
+import asyncio
+import os
+import sys
+from multiprocessing import Pipe
+import numpy as np
+
+from nico_lib.hvc_minilib import STARTUP_TIMEOUT, HandVideoClassifier
+
+DEFAULT_POLL_INTERVAL = 0.005  # Seconds between two results reads without notifications
+
+
+class AsyncHandVideoClassifier:
+    def __init__(self, poll_interval: float | None = None, **hvc_kwargs) -> None:
+        """
+        Asyncio interface of HandVideoClassifier: awaitable start and stop, and an async iterator of the results
+        snapshots that wakes up only when the detection process publishes a new frame.
+        The detection process writes one byte to a pipe after each publication, the pipe is watched by the event
+        loop (loop.add_reader), no thread and no CPU is used while waiting.
+
+        async with AsyncHandVideoClassifier(model_path="Assets/model_data/model.h5") as ahvc:
+            async for snapshot in ahvc.results():
+                print(snapshot["frame_id"], snapshot["predictions"])
+
+        :param poll_interval: reads the results every poll_interval seconds instead of waiting for the
+        notifications, used with DEFAULT_POLL_INTERVAL on Windows and when the event loop cannot watch pipes.
+        :param hvc_kwargs: HandVideoClassifier arguments.
+        """
+        self.hvc = HandVideoClassifier(**hvc_kwargs)
+        self.poll_interval = poll_interval
+        self._loop = None
+        self._receiver = None  # Read end of the notifications pipe
+        self._read_fd = None
+        self._published = asyncio.Event()
+        self._ended = False  # The detection process closed the pipe
+
+    async def start(self, timeout: float = STARTUP_TIMEOUT) -> "AsyncHandVideoClassifier":
+        """
+        Starts the detection process, waiting for its startup in an executor thread.
+
+        :param timeout: maximum startup duration in seconds.
+        :return: AsyncHandVideoClassifier object
+        """
+        self._loop = asyncio.get_running_loop()
+        self._ended = False
+        sender = None
+        if self.poll_interval is None and sys.platform == "win32":
+            self.poll_interval = DEFAULT_POLL_INTERVAL  # Connection.fileno() is a handle, not a watchable descriptor
+        if self.poll_interval is None:
+            # Connection objects are passed to the subprocess with any start method, unlike raw pipe descriptors
+            self._receiver, sender = Pipe(duplex=False)
+            self._read_fd = self._receiver.fileno()
+            try:
+                os.set_blocking(self._read_fd, False)
+                self._loop.add_reader(self._read_fd, self._on_notification)
+            except (NotImplementedError, OSError, AttributeError):
+                self._receiver.close()
+                sender.close()
+                self._receiver = self._read_fd = sender = None
+                self.poll_interval = DEFAULT_POLL_INTERVAL
+
+        self.hvc.notify_connection = sender
+        try:
+            await self._loop.run_in_executor(None, self.hvc.start, timeout)
+        except BaseException:
+            self._close_pipe()
+            raise
+        finally:
+            if sender is not None:
+                sender.close()  # Only the detection process keeps the write end, EOF is received when it exits
+            self.hvc.notify_connection = None
+        return self
+
+    def _on_notification(self) -> None:
+        try:
+            data = os.read(self._read_fd, 4096)  # All the pending notifications at once
+        except BlockingIOError:
+            return
+        if not data:
+            self._ended = True
+            self._loop.remove_reader(self._read_fd)
+        self._published.set()
+
+    def _close_pipe(self) -> None:
+        if self._receiver is not None:
+            self._loop.remove_reader(self._read_fd)
+            self._receiver.close()
+            self._receiver = self._read_fd = None
+
+    def is_running(self) -> bool:
+        """
+        Returns the running state of the detection process.
+
+        :return: Running state
+        """
+        return self.hvc.is_running() and not self._ended
+
+    async def wait_results(self, frame_id: int = -1) -> np.ndarray | None:
+        """
+        Waits for the results of a frame newer than frame_id.
+
+        :param frame_id: index of the last frame already processed by the caller.
+        :return: results snapshot (see HandVideoClassifier.get_results), None if the detection process stopped.
+        """
+        while True:
+            self._published.clear()  # Cleared before reading, a publication during the read wakes the next wait
+            snapshot = self.hvc.get_results()
+            if int(snapshot["frame_id"]) != frame_id:
+                return snapshot
+            if not self.is_running():
+                return None
+            if self.poll_interval is None:
+                await self._published.wait()
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    async def results(self):
+        """
+        Async iterator of the results snapshots, one per published frame, ends when the detection process stops.
+        Frames published while the consumer is busy are skipped, the newest results are always returned.
+
+        :return: async iterator of HandVideoClassifier.get_results snapshots.
+        """
+        frame_id = -1
+        while True:
+            snapshot = await self.wait_results(frame_id)
+            if snapshot is None:
+                return
+            frame_id = int(snapshot["frame_id"])
+            yield snapshot
+
+    def __aiter__(self):
+        return self.results()
+
+    async def stop(self, timeout: float = 5.) -> None:
+        """
+        Stops the detection process and waits for its exit, signaled by the end of its notifications.
+
+        :param timeout: maximum duration in seconds waited for the detection process exit.
+        """
+        if self.hvc.is_running():
+            self.hvc.stop()
+        if self._read_fd is not None and not self._ended:
+            try:
+                await asyncio.wait_for(self._wait_end(), timeout)
+            except asyncio.TimeoutError:
+                pass  # The pipe is closed anyway, the detection process ignores the closed reader
+        self._close_pipe()
+
+    async def _wait_end(self) -> None:
+        while not self._ended:
+            self._published.clear()
+            await self._published.wait()
+
+    async def __aenter__(self) -> "AsyncHandVideoClassifier":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
@@ -0,0 +1,293 @@
+from __future__ import annotations
+import argparse
+import os
+import numpy as np
+
+SUPPORTED_BACKENDS = ("keras", "numpy", "tflite", "onnx")
+BACKEND_EXTENSIONS = {".h5": "keras",
+                      ".keras": "keras",
+                      ".npz": "numpy",
+                      ".tflite": "tflite",
+                      ".onnx": "onnx"}
+
+
+class InferenceBackend:
+    def __init__(self, model_path: str) -> None:
+        """
+        Base class for posture model inference, the predict function needs to be implemented in the subclass.
+        :param model_path: path of the model file.
+        """
+        self.model_path = model_path
+        self.n_inputs = 0
+        self.n_classes = 0
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Runs the model on a batch of landmarks vectors.
+        :param batch: (batch, n_inputs) float32 array.
+        :return: (batch, n_classes) probabilities array.
+        """
+        raise NotImplementedError
+
+    def warmup(self, batch_size: int = 2) -> None:
+        """
+        Runs a dummy inference so that lazy initialisation does not happen on the first detected frame.
+        :param batch_size: batch size used in the main loop.
+        """
+        self.predict(np.zeros((batch_size, self.n_inputs), dtype=np.float32))
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.predict(batch)
+
+
+class KerasBackend(InferenceBackend):
+    def __init__(self, model_path: str) -> None:
+        """
+        TensorFlow Keras model called directly through a compiled graph, skipping model.predict overhead.
+        :param model_path: path of the .h5/.keras model.
+        """
+        super().__init__(model_path)
+        import tensorflow as tf
+        from keras import models
+
+        self.model = models.load_model(model_path)
+        self.n_inputs = self.model.input_shape[-1]
+        self.n_classes = self.model.output_shape[-1]
+        self._graph_call = tf.function(lambda x: self.model(x, training=False),
+                                       input_signature=[tf.TensorSpec(shape=(None, self.n_inputs),
+                                                                      dtype=tf.float32)])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self._graph_call(batch).numpy()
+
+
+class NumpyBackend(InferenceBackend):
+    ACTIVATIONS = ("linear", "relu", "softmax")
+
+    def __init__(self, model_path: str) -> None:
+        """
+        Pure NumPy matmul chain for the dense posture MLP, see export_numpy to create the weights file.
+        :param model_path: path of the .npz weights file.
+        """
+        super().__init__(model_path)
+        with np.load(model_path) as data:
+            n_layers = int(data["n_layers"])
+            self.kernels = [np.ascontiguousarray(data[f"kernel_{i}"], dtype=np.float32) for i in range(n_layers)]
+            self.biases = [np.ascontiguousarray(data[f"bias_{i}"], dtype=np.float32) for i in range(n_layers)]
+            self.activations = [str(a) for a in data["activations"]]
+
+        for activation in self.activations:
+            if activation not in self.ACTIVATIONS:
+                raise ValueError(f"Unsupported activation <{activation}> in {model_path}")
+
+        self.n_inputs = self.kernels[0].shape[0]
+        self.n_classes = self.kernels[-1].shape[1]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        x = np.asarray(batch, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = x @ kernel
+            x += bias
+            if activation == "relu":
+                np.maximum(x, 0, out=x)
+            elif activation == "softmax":
+                x -= x.max(axis=-1, keepdims=True)
+                np.exp(x, out=x)
+                x /= x.sum(axis=-1, keepdims=True)
+        return x
+
+
+class TFLiteBackend(InferenceBackend):
+    def __init__(self, model_path: str, num_threads: int = 1) -> None:
+        """
+        TensorFlow Lite interpreter, uses tflite_runtime if installed, TensorFlow otherwise.
+        Handles float and int8 quantized models.
+        :param model_path: path of the .tflite model.
+        :param num_threads: number of interpreter threads.
+        """
+        super().__init__(model_path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self.n_inputs = int(self._input["shape"][-1])
+        self.n_classes = int(self._output["shape"][-1])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if batch.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], [batch.shape[0], self.n_inputs])
+            self.interpreter.allocate_tensors()
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch.shape[0]
+
+        scale, zero_point = self._input["quantization"]
+        if scale:
+            # Values outside of the calibrated range are saturated instead of wrapping around
+            info = np.iinfo(self._input["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        self.interpreter.set_tensor(self._input["index"], batch.astype(self._input["dtype"]))
+        self.interpreter.invoke()
+
+        output = self.interpreter.get_tensor(self._output["index"])
+        scale, zero_point = self._output["quantization"]
+        if scale:
+            return (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class OnnxBackend(InferenceBackend):
+    def __init__(self, model_path: str, num_threads: int = 1) -> None:
+        """
+        ONNX Runtime session on CPU.
+        :param model_path: path of the .onnx model.
+        :param num_threads: number of intra-op threads.
+        """
+        super().__init__(model_path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+        self.n_inputs = self.session.get_inputs()[0].shape[-1]
+        self.n_classes = self.session.get_outputs()[0].shape[-1]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+def backend_from_path(model_path: str) -> str:
+    """
+    Guesses the backend name from the model file extension.
+    :param model_path: path of the model file.
+    :return: backend name.
+    """
+    extension = os.path.splitext(model_path)[1].lower()
+    if extension not in BACKEND_EXTENSIONS:
+        raise ValueError(f"Cannot guess the inference backend of <{model_path}>, "
+                         f"supported extensions are {list(BACKEND_EXTENSIONS)}")
+    return BACKEND_EXTENSIONS[extension]
+
+
+def load_backend(model_path: str, backend: str | None = None) -> InferenceBackend:
+    """
+    Loads a model file with the requested inference backend.
+    :param model_path: path of the model file.
+    :param backend: one of SUPPORTED_BACKENDS, guessed from the file extension if None.
+    :return: InferenceBackend object.
+    """
+    if backend is None:
+        backend = backend_from_path(model_path)
+
+    if backend == "keras":
+        return KerasBackend(model_path)
+    elif backend == "numpy":
+        return NumpyBackend(model_path)
+    elif backend == "tflite":
+        return TFLiteBackend(model_path)
+    elif backend == "onnx":
+        return OnnxBackend(model_path)
+    raise ValueError(f"Unknown backend <{backend}>, use one of {SUPPORTED_BACKENDS}")
+
+
+def export_numpy(model_path: str, output_path: str | None = None, compressed: bool = False) -> str:
+    """
+    Exports the Dense layers of a Keras model to a NumPy weights file (Dropout layers are skipped).
+    :param model_path: path of the .h5/.keras model.
+    :param output_path: path of the .npz file, next to the model if None.
+    :param compressed: writes a zip compressed file, smaller for pruned weights.
+    :return: path of the written file.
+    """
+    from keras import models, layers
+
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + ".npz"
+
+    model = models.load_model(model_path)
+    weights = {}
+    activations = []
+    for layer in model.layers:
+        if isinstance(layer, layers.Dense):
+            kernel, bias = layer.get_weights()
+            weights[f"kernel_{len(activations)}"] = kernel.astype(np.float32)
+            weights[f"bias_{len(activations)}"] = bias.astype(np.float32)
+            activations.append(layer.get_config()["activation"])
+        elif not isinstance(layer, (layers.Dropout, layers.InputLayer)):
+            raise ValueError(f"Layer <{layer.name}> of type {type(layer).__name__} cannot be exported to NumPy")
+
+    save = np.savez_compressed if compressed else np.savez
+    save(output_path, n_layers=len(activations), activations=np.array(activations), **weights)
+    return output_path
+
+
+def export_tflite(model_path: str, output_path: str | None = None) -> str:
+    """
+    Exports a Keras model to a float TensorFlow Lite model.
+    :param model_path: path of the .h5/.keras model.
+    :param output_path: path of the .tflite file, next to the model if None.
+    :return: path of the written file.
+    """
+    import tensorflow as tf
+    from keras import models
+
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + ".tflite"
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(models.load_model(model_path))
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def export_onnx(model_path: str, output_path: str | None = None) -> str:
+    """
+    Exports a Keras model to ONNX (requires the tf2onnx package).
+    :param model_path: path of the .h5/.keras model.
+    :param output_path: path of the .onnx file, next to the model if None.
+    :return: path of the written file.
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from keras import models
+
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + ".onnx"
+
+    model = models.load_model(model_path)
+    tf2onnx.convert.from_keras(model,
+                               input_signature=[tf.TensorSpec((None, model.input_shape[-1]), tf.float32, name="input")],
+                               output_path=output_path)
+    return output_path
+
+
+EXPORTERS = {"numpy": export_numpy,
+             "tflite": export_tflite,
+             "onnx": export_onnx}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the posture model for a lightweight inference backend")
+    parser.add_argument("model_path", help="Keras model to export (.h5/.keras)")
+    parser.add_argument("--format", choices=list(EXPORTERS), default="numpy", help="Exported model format")
+    parser.add_argument("--output", default=None, help="Output path, next to the model by default")
+    args = parser.parse_args()
+
+    from nico_lib.manifest_minilib import add_model_format, load_manifest
+
+    output_path = EXPORTERS[args.format](args.model_path, args.output)
+    print(f"INFO: Model exported to {output_path}")
+    manifest = load_manifest(args.model_path)
+    if manifest is not None:
+        add_model_format(output_path, manifest)
+        print(f"INFO: {output_path} added to the manifest of {args.model_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+import threading
+import time
+import numpy as np
+import cv2
+
+
+def open_stream(stream_path: int | str,
+                resolution: tuple | None = None,
+                fps: float | None = None) -> cv2.VideoCapture:
+    """
+    Opens a camera or a video file.
+    :param stream_path: integer for camera usage (0 for main camera), string for video file.
+    :param resolution: (width, height) requested to the camera, camera default if None.
+    :param fps: frame rate requested to the camera, camera default if None.
+    :return: opened OpenCV video capture.
+    """
+    if type(stream_path) == int:
+        stream = cv2.VideoCapture(stream_path, cv2.CAP_DSHOW)
+        if resolution is not None:
+            stream.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+            stream.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+        if fps is not None:
+            stream.set(cv2.CAP_PROP_FPS, fps)
+    else:
+        stream = cv2.VideoCapture(stream_path)
+    if not stream.isOpened():
+        raise IOError(f"Cannot open video stream <{stream_path}>")
+    return stream
+
+
+class FpsCounter:
+    def __init__(self, smoothing: float = 0.9) -> None:
+        """
+        Exponentially smoothed rate of calls to tick.
+        :param smoothing: weight of the previous value, between 0 and 1.
+        """
+        self.smoothing = smoothing
+        self.fps = 0.
+        self._last_time = None
+
+    def tick(self) -> float:
+        """
+        Registers a processed frame.
+        :return: smoothed frames per second.
+        """
+        now = time.monotonic()
+        if self._last_time is not None and now > self._last_time:
+            rate = 1 / (now - self._last_time)
+            self.fps = rate if self.fps == 0 else self.smoothing * self.fps + (1 - self.smoothing) * rate
+        self._last_time = now
+        return self.fps
+
+
+class DirectCapture:
+    def __init__(self, stream: cv2.VideoCapture) -> None:
+        """
+        Sequential capture, each read call decodes the next frame of the stream.
+        Same interface as FrameGrabber.
+        :param stream: opened OpenCV video capture.
+        """
+        self.stream = stream
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.processed_frames = 0
+
+    def start(self) -> "DirectCapture":
+        return self
+
+    def read(self) -> tuple:
+        """
+        Reads the next frame.
+        :return: (grabbed, frame index, time.monotonic() at capture, frame)
+        """
+        grabbed, frame = self.stream.read()
+        timestamp = time.monotonic()
+        if not grabbed:
+            return False, -1, timestamp, None
+        frame_id = self.captured_frames
+        self.captured_frames += 1
+        self.processed_frames += 1
+        return True, frame_id, timestamp, frame
+
+    def stop(self) -> None:
+        pass
+
+
+class FrameGrabber:
+    def __init__(self,
+                 stream: cv2.VideoCapture,
+                 ring_size: int = 3,
+                 drop_frames: bool = True,
+                 new_frame_event: threading.Event | None = None) -> None:
+        """
+        Capture thread decoding frames into a ring of preallocated buffers.
+        The reader always gets the newest frame, older unread frames are dropped so that
+        the latency between capture and detection does not grow when detection is slower than the camera.
+        :param stream: opened OpenCV video capture.
+        :param ring_size: number of frame buffers (at least 3: one being written, the newest and the one being read).
+        :param drop_frames: drops unread frames if True (cameras), waits for the reader if False (video files),
+        :param new_frame_event: optional event set on each new frame and at end of stream,
+        used to wait for several grabbers at once.
+        """
+        if ring_size < 3:
+            raise ValueError("The ring size must be at least 3")
+        self.stream = stream
+        self.drop_frames = drop_frames
+        self.new_frame_event = new_frame_event
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.processed_frames = 0
+
+        self._ring = [None] * ring_size
+        self._frame_ids = np.full(ring_size, -1, dtype=np.int64)
+        self._timestamps = np.zeros(ring_size, dtype=np.float64)
+        self._latest = -1  # Newest complete slot
+        self._reading = -1  # Slot held by the reader until its next read call
+        self._last_read_id = -1
+        self._eof = False
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameGrabber", daemon=True)
+
+    def start(self) -> "FrameGrabber":
+        """
+        Starts the capture thread.
+        :return: FrameGrabber object
+        """
+        self._thread.start()
+        return self
+
+    def _capture_loop(self) -> None:
+        slot = 0
+        try:
+            while not self._stopped:
+                # Decoding directly into the free slot buffer, allocated by OpenCV on first use of the slot
+                grabbed, frame = self.stream.read(self._ring[slot])
+                timestamp = time.monotonic()
+                if not grabbed:
+                    return
+
+                with self._condition:
+                    if not self.drop_frames:
+                        while self._latest != -1 and self._frame_ids[self._latest] > self._last_read_id \
+                                and not self._stopped:
+                            self._condition.wait()
+                    elif self._latest != -1 and self._frame_ids[self._latest] > self._last_read_id:
+                        self.dropped_frames += 1
+
+                    self._ring[slot] = frame
+                    self._frame_ids[slot] = self.captured_frames
+                    self._timestamps[slot] = timestamp
+                    self.captured_frames += 1
+                    self._latest = slot
+                    self._condition.notify_all()
+                    if self.new_frame_event is not None:
+                        self.new_frame_event.set()
+
+                    # Next slot: neither the newest frame nor the one held by the reader
+                    slot = next(i for i in range(len(self._ring)) if i != self._latest and i != self._reading)
+        finally:
+            # Also reached when the stream read raises, the readers must not wait for frames that never come
+            with self._condition:
+                self._eof = True
+                self._condition.notify_all()
+                if self.new_frame_event is not None:
+                    self.new_frame_event.set()
+
+    @property
+    def ended(self) -> bool:
+        """
+        True when the end of the stream is reached and the last frame was read.
+        """
+        with self._condition:
+            return self._eof and (self._latest == -1 or self._frame_ids[self._latest] <= self._last_read_id)
+
+    def read(self, timeout: float | None = None) -> tuple:
+        """
+        Waits for a frame newer than the previous one and returns it without copy.
+        The returned frame stays valid until the next read call.
+        :param timeout: maximum waiting duration in seconds, None to wait indefinitely.
+        :return: (grabbed, frame index, time.monotonic() at capture, frame), grabbed is False at end of stream.
+        """
+        with self._condition:
+            self._reading = -1
+            self._condition.notify_all()
+            ready = self._condition.wait_for(lambda: self._eof or self._stopped or
+                                             (self._latest != -1 and
+                                              self._frame_ids[self._latest] > self._last_read_id),
+                                             timeout=timeout)
+            if not ready or self._latest == -1 or self._frame_ids[self._latest] <= self._last_read_id:
+                return False, -1, time.monotonic(), None
+
+            self._reading = self._latest
+            self._last_read_id = int(self._frame_ids[self._reading])
+            self.processed_frames += 1
+            self._condition.notify_all()
+            return True, self._last_read_id, float(self._timestamps[self._reading]), self._ring[self._reading]
+
+    def stop(self) -> None:
+        """
+        Stops the capture thread, the stream is not released.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
@@ -0,0 +1,231 @@
+from __future__ import annotations
+import gzip
+import os
+import time
+import numpy as np
+
+from nico_lib.backend_minilib import load_backend
+from nico_lib.features_minilib import augment_landmarks
+
+
+def variant_path(model_path: str, variant: str, extension: str) -> str:
+    """
+    Returns the file path of a compressed variant of a model, next to the model
+    (model.h5 gives model_int8.tflite for variant "int8" and extension ".tflite").
+    :param model_path: base model file path.
+    :param variant: variant name.
+    :param extension: file extension of the variant.
+    :return: variant file path.
+    """
+    return f"{os.path.splitext(model_path)[0]}_{variant}{extension}"
+
+
+def quantize_int8(model, representative: np.ndarray, output_path: str, n_samples: int = 500) -> str:
+    """
+    Full integer post-training quantization of a Keras model to TensorFlow Lite: int8 weights, activations,
+    input and output, the activations ranges being calibrated on representative samples.
+    :param model: Keras model.
+    :param representative: (samples, n_inputs) training samples, already transformed like the model inputs.
+    :param output_path: path of the .tflite file.
+    :param n_samples: number of representative samples used for the calibration.
+    :return: path of the written file.
+    """
+    import tensorflow as tf
+
+    samples = representative[np.random.default_rng(0).permutation(representative.shape[0])[:n_samples]]
+
+    def representative_dataset():
+        for sample in samples:
+            yield [sample[None].astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def _dense_layers(model) -> list:
+    from keras import layers
+
+    return [layer for layer in model.layers if isinstance(layer, layers.Dense)]
+
+
+def prune_model(model, x: np.ndarray, y: np.ndarray, sparsity: float = 0.8, epochs: int = 5,
+                batch_size: int = 64) -> list:
+    """
+    Magnitude pruning: the smallest weights of each Dense kernel are set to zero, then the model is fine-tuned
+    with the pruned weights kept at zero (the masks are applied again after each training step).
+    The output layer is pruned at half the sparsity, having few weights per class.
+    :param model: Keras model with softmax outputs, pruned in place and compiled for the fine-tuning.
+    :param x: (samples, n_inputs) training samples.
+    :param y: (samples,) class indexes.
+    :param sparsity: fraction of the weights set to zero.
+    :param epochs: fine-tuning epochs, no fine-tuning if 0.
+    :param batch_size: fine-tuning batch size.
+    :return: list of the kernel masks.
+    """
+    from keras import callbacks, losses
+
+    dense_layers = _dense_layers(model)
+    masks = []
+    for layer in dense_layers:
+        kernel = layer.kernel.numpy()
+        layer_sparsity = sparsity / 2 if layer is dense_layers[-1] else sparsity
+        threshold = np.quantile(np.abs(kernel), layer_sparsity)
+        masks.append((np.abs(kernel) > threshold).astype(kernel.dtype))
+        layer.kernel.assign(kernel * masks[-1])
+
+    def apply_masks(batch, logs=None):
+        for dense_layer, mask in zip(dense_layers, masks):
+            dense_layer.kernel.assign(dense_layer.kernel * mask)
+
+    if epochs > 0:
+        model.compile(optimizer="adam", loss=losses.SparseCategoricalCrossentropy(),
+                      metrics=["sparse_categorical_accuracy"])
+        model.fit(x, y, batch_size=batch_size, epochs=epochs, verbose=2,
+                  callbacks=[callbacks.LambdaCallback(on_train_batch_end=apply_masks)])
+    return masks
+
+
+def distill_model(teacher, student, x: np.ndarray, y: np.ndarray, n_classes: int, epochs: int = 30,
+                  batch_size: int = 64, temperature: float = 2., hard_weight: float = 0.3,
+                  n_augmented: int = 1, seed: int = 0):
+    """
+    Knowledge distillation: trains a smaller student network on the true labels and on the teacher predictions,
+    both softened by a temperature (Hinton et al.). The soft loss is the Kullback-Leibler divergence between the
+    softened distributions, scaled by temperature ** 2, the hard loss is the cross-entropy at temperature 1,
+    so the student is served at temperature 1 with confidences comparable to the teacher ones.
+    The teacher also labels randomly augmented copies of the samples, giving the student more examples of the
+    teacher decision boundaries.
+    :param teacher: trained Keras model with softmax outputs.
+    :param student: Keras model with softmax outputs, trained in place.
+    :param x: (samples, n_inputs) training samples.
+    :param y: (samples,) class indexes.
+    :param n_classes: number of classes.
+    :param epochs: training epochs.
+    :param batch_size: training batch size.
+    :param temperature: softening of the teacher and student distributions in the soft loss, 1 keeps them as is.
+    :param hard_weight: weight of the hard loss, the soft loss having 1 - hard_weight.
+    :param n_augmented: number of augmented copies of the samples labeled by the teacher.
+    :param seed: augmentation seed.
+    :return: trained student, compiled with the usual cross-entropy so it is saved and loaded as a plain model.
+    """
+    import tensorflow as tf
+    from keras import losses
+
+    rng = np.random.default_rng(seed)
+    inputs = np.concatenate([x] + [augment_landmarks(x, rng) for _ in range(n_augmented)])
+    hard = np.zeros((inputs.shape[0], n_classes), dtype=np.float32)
+    hard[np.arange(x.shape[0]), y] = 1
+    hard_mask = np.zeros((inputs.shape[0], 1), dtype=np.float32)
+    hard_mask[:x.shape[0]] = hard_weight  # The augmented copies only have the teacher labels
+    soft = _soften(teacher.predict(inputs, batch_size=1024, verbose=0), temperature)
+    targets = np.concatenate((hard, soft, hard_mask), axis=-1)  # Single targets array, split in the loss
+
+    def distillation_loss(packed_targets, probabilities):
+        hard_targets = packed_targets[:, :n_classes]
+        soft_targets = packed_targets[:, n_classes:2 * n_classes]
+        weights = packed_targets[:, -1]
+        # The softmax outputs are the logits up to a constant, removed by the softened softmax
+        log_probabilities = tf.math.log(tf.clip_by_value(probabilities, 1e-7, 1.))
+        soft_log_probabilities = tf.nn.log_softmax(log_probabilities / temperature)
+        hard_loss = -tf.reduce_sum(hard_targets * log_probabilities, axis=-1)
+        soft_loss = tf.reduce_sum(soft_targets * (tf.math.log(tf.maximum(soft_targets, 1e-7))
+                                                  - soft_log_probabilities), axis=-1)
+        return weights * hard_loss + (1 - weights) * temperature ** 2 * soft_loss
+
+    student.compile(optimizer="adam", loss=distillation_loss)
+    student.fit(inputs, targets, batch_size=batch_size, epochs=epochs, shuffle=True, verbose=2)
+    student.compile(optimizer="adam", loss=losses.SparseCategoricalCrossentropy(),
+                    metrics=["sparse_categorical_accuracy"])
+    return student
+
+
+def _soften(probabilities: np.ndarray, temperature: float) -> np.ndarray:
+    """
+    Softmax of the logits divided by a temperature, computed from the softmax outputs.
+    """
+    logits = np.log(np.maximum(probabilities, 1e-7)) / temperature
+    soft = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return (soft / soft.sum(axis=-1, keepdims=True)).astype(np.float32)
+
+
+def check_confidence(results: dict, reference: str = "base", tolerance: float = 0.1) -> list:
+    """
+    Compares the mean confidence of the variants with the reference model: a variant whose confidences dropped
+    may keep its accuracy but stay under the enter_threshold of the prediction smoothing.
+    :param results: {variant name: evaluate_variant result}.
+    :param reference: name of the reference variant.
+    :param tolerance: accepted decrease of the mean confidence.
+    :return: names of the variants whose mean confidence is more than tolerance under the reference one.
+    """
+    reference_confidence = results[reference]["mean_confidence"]
+    return [name for name, result in results.items()
+            if result["mean_confidence"] < reference_confidence - tolerance]
+
+
+def gzip_size(path: str) -> int:
+    """
+    Returns the gzip compressed size of a file, showing the gain of pruned weights on storage and download.
+    :param path: file path.
+    :return: size in bytes.
+    """
+    with open(path, "rb") as f:
+        return len(gzip.compress(f.read()))
+
+
+def evaluate_variant(model_path: str, x: np.ndarray, y: np.ndarray, repeats: int = 500) -> dict:
+    """
+    Evaluates a model file with the inference backend used by HandVideoClassifier.
+    :param model_path: model file path.
+    :param x: (samples, n_inputs) held-out samples, already transformed like the model inputs.
+    :param y: (samples,) class indexes.
+    :param repeats: number of timed single sample inferences.
+    :return: dictionary with the accuracy, the mean confidence (highest probability), the file and gzip sizes in
+    bytes, the median and 95th percentile latency of a single sample in microseconds and the sparsity of the weights.
+    """
+    model = load_backend(model_path)
+    probabilities = model.predict(x)
+    accuracy = float(np.mean(np.argmax(probabilities, axis=-1) == y))
+    mean_confidence = float(np.mean(np.max(probabilities, axis=-1)))
+
+    sample = np.ascontiguousarray(x[:1], dtype=np.float32)
+    model.warmup(1)
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict(sample)
+        timings[i] = time.perf_counter() - start
+
+    sparsity = None
+    kernels = getattr(model, "kernels", None)
+    if kernels is not None:
+        sparsity = float(sum(np.count_nonzero(kernel == 0) for kernel in kernels) / sum(k.size for k in kernels))
+    return {"accuracy": accuracy,
+            "mean_confidence": mean_confidence,
+            "size": os.path.getsize(model_path),
+            "gzip_size": gzip_size(model_path),
+            "latency_p50_us": float(np.percentile(timings, 50) * 1e6),
+            "latency_p95_us": float(np.percentile(timings, 95) * 1e6),
+            "sparsity": sparsity}
+
+
+def report_table(results: dict) -> list:
+    """
+    Formats the evaluation of the variants for tabulate.
+    :param results: {variant name: {"path": model file, "backend": backend name, **evaluate_variant result}}.
+    :return: list of table rows, the first one being the header.
+    """
+    rows = [["Variant", "File", "Backend", "Accuracy", "Confidence", "Size (kB)", "Gzip (kB)", "Latency p50 (us)",
+             "Latency p95 (us)"]]
+    for name, result in results.items():
+        rows.append([name, os.path.basename(result["path"]), result["backend"], f"{result['accuracy']:.2%}",
+                     f"{result['mean_confidence']:.2f}", f"{result['size'] / 1024:.1f}",
+                     f"{result['gzip_size'] / 1024:.1f}", f"{result['latency_p50_us']:.1f}",
+                     f"{result['latency_p95_us']:.1f}"])
+    return rows
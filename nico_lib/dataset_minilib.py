@@ -0,0 +1,183 @@
+from __future__ import annotations
+import json
+import os
+import numpy as np
+
+DATASET_PATH = "Assets/datasets_records"  # One CSV file per class, one row of 63 landmarks coordinates per sample
+CACHE_PATH = "Assets/datasets_cache"  # Binary cache of the parsed CSV files
+N_FEATURES = 63
+CACHE_VERSION = 2
+
+
+def parse_csv(path: str) -> np.ndarray:
+    """
+    Parses a class CSV file.
+    :param path: CSV file path.
+    :return: (samples, 63) float32 array.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        raise ValueError(f"File <{path}> is empty or doesn't exist")
+    data = np.loadtxt(path, delimiter=",", dtype=np.float32, ndmin=2)
+    if data.shape[1] != N_FEATURES:
+        raise ValueError(f"File <{path}> has {data.shape[1]} columns instead of {N_FEATURES}")
+    return data
+
+
+def list_class_files(data_path: str = DATASET_PATH) -> list:
+    """
+    Returns the CSV files names of the dataset folder, sorted so that the class indexes do not depend on the
+    file system listing order.
+    :param data_path: dataset folder.
+    :return: sorted list of files names.
+    """
+    return sorted(class_file for class_file in os.listdir(data_path) if class_file.endswith(".csv"))
+
+
+class DatasetCache:
+    def __init__(self, data_path: str = DATASET_PATH, cache_path: str = CACHE_PATH, verbose: bool = False) -> None:
+        """
+        Consolidated binary cache of the class CSV files: all the samples are stored in a single .npy file,
+        loaded as a memory map (no parsing, no copy), and an index records the rows range, modification time and
+        size of each CSV file. Only the CSV files that changed since the last load are parsed again.
+        Each update writes a new samples file under a new generation number, as the previous one may still be
+        mapped by the arrays of earlier loads (which prevents replacing or deleting it on Windows).
+        :param data_path: dataset folder.
+        :param cache_path: cache folder, created if needed.
+        :param verbose: prints the parsed and cached files.
+        """
+        self.data_path = data_path
+        self.cache_path = cache_path
+        self.verbose = verbose
+        self.index_file = os.path.join(cache_path, "index.json")
+        self.generation = 0  # Number of the current samples file
+        self.data_file = self._data_file(self.generation)
+
+    def _data_file(self, generation: int) -> str:
+        return os.path.join(self.cache_path, f"samples_{generation}.npy")
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_file, "r", encoding="UTF8") as f:
+                index = json.load(f)
+            if index.get("version") == CACHE_VERSION and os.path.isfile(self._data_file(index["generation"])):
+                self.generation = index["generation"]
+                self.data_file = self._data_file(self.generation)
+                return index["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def _stat(self, file_name: str) -> dict:
+        stat = os.stat(os.path.join(self.data_path, file_name))
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def load(self, files_names: list | None = None) -> tuple:
+        """
+        Loads the samples of the class files, updating the cache if needed.
+        :param files_names: CSV files names, the class index of a file being its index in the list,
+        all the files of the dataset folder if None.
+        :return: (x, y, files_names), x being a read-only (samples, 63) float32 memory map and y the int32 class
+        index of each sample.
+        """
+        if files_names is None:
+            files_names = list_class_files(self.data_path)
+        index = self._read_index()
+        stats = {file_name: self._stat(file_name) for file_name in files_names}
+        unchanged = [file_name for file_name in files_names
+                     if file_name in index and all(index[file_name][key] == value
+                                                   for key, value in stats[file_name].items())]
+
+        if len(unchanged) < len(files_names) or len(index) != len(files_names):
+            index = self._update(index, files_names, unchanged, stats)
+        elif self.verbose:
+            print(f"INFO: {len(files_names)} class files loaded from cache <{self.cache_path}>")
+
+        x = np.load(self.data_file, mmap_mode="r")
+        y = np.empty(x.shape[0], dtype=np.int32)
+        for class_id, file_name in enumerate(files_names):
+            y[index[file_name]["start"]:index[file_name]["stop"]] = class_id
+        return x, y, list(files_names)
+
+    def _update(self, index: dict, files_names: list, unchanged: list, stats: dict) -> dict:
+        """
+        Writes a new consolidated file from the unchanged rows of the previous one and the parsed changed files.
+        """
+        parsed = {file_name: parse_csv(os.path.join(self.data_path, file_name))
+                  for file_name in files_names if file_name not in unchanged}
+        if self.verbose:
+            for file_name in parsed:
+                print(f"INFO: Parsed <{file_name}> ({parsed[file_name].shape[0]} samples)")
+
+        counts = [parsed[file_name].shape[0] if file_name in parsed
+                  else index[file_name]["stop"] - index[file_name]["start"] for file_name in files_names]
+        os.makedirs(self.cache_path, exist_ok=True)
+        previous = np.load(self.data_file, mmap_mode="r") if unchanged else None
+        generation = self.generation + 1
+        temp_file = self._data_file(generation) + ".tmp.npy"
+        data = np.lib.format.open_memmap(temp_file, mode="w+", dtype=np.float32, shape=(sum(counts), N_FEATURES))
+
+        new_index = {}
+        start = 0
+        for file_name, count in zip(files_names, counts):
+            if file_name in parsed:
+                data[start:start + count] = parsed[file_name]
+            else:
+                data[start:start + count] = previous[index[file_name]["start"]:index[file_name]["stop"]]
+            new_index[file_name] = dict(stats[file_name], start=start, stop=start + count)
+            start += count
+        data.flush()
+        del data, previous  # Memory maps closed before renaming the file
+        os.replace(temp_file, self._data_file(generation))
+
+        temp_index = self.index_file + ".tmp"
+        with open(temp_index, "w", encoding="UTF8") as f:
+            json.dump({"version": CACHE_VERSION, "generation": generation, "files": new_index}, f, indent=1)
+        os.replace(temp_index, self.index_file)
+        self.generation = generation
+        self.data_file = self._data_file(generation)
+        self._remove_old_files()
+        if self.verbose:
+            print(f"INFO: Cache <{self.cache_path}> updated ({start} samples)")
+        return new_index
+
+    def _remove_old_files(self) -> None:
+        """
+        Deletes the samples files of the previous generations, those still mapped are deleted by a later update.
+        """
+        for file_name in os.listdir(self.cache_path):
+            path = os.path.join(self.cache_path, file_name)
+            if file_name.startswith("samples") and file_name.endswith(".npy") and path != self.data_file:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def load_dataset(data_path: str = DATASET_PATH,
+                 files_names: list | None = None,
+                 cache_path: str | None = CACHE_PATH,
+                 verbose: bool = False) -> tuple:
+    """
+    Loads the samples of all the class files of a dataset folder.
+    :param data_path: dataset folder.
+    :param files_names: CSV files names, the class index of a file being its index in the list,
+    all the files of the dataset folder if None.
+    :param cache_path: cache folder, the files are parsed without cache if None.
+    :param verbose: prints the parsed and cached files.
+    :return: (x, y, files_names) with x the (samples, 63) float32 samples and y the int32 class index of each sample.
+    """
+    if cache_path is not None:
+        return DatasetCache(data_path, cache_path, verbose).load(files_names)
+
+    if files_names is None:
+        files_names = list_class_files(data_path)
+    parsed = [parse_csv(os.path.join(data_path, file_name)) for file_name in files_names]
+    # Single allocation for all the classes
+    x = np.empty((sum(data.shape[0] for data in parsed), N_FEATURES), dtype=np.float32)
+    y = np.empty(x.shape[0], dtype=np.int32)
+    start = 0
+    for class_id, data in enumerate(parsed):
+        x[start:start + data.shape[0]] = data
+        y[start:start + data.shape[0]] = class_id
+        start += data.shape[0]
+    return x, y, list(files_names)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import numpy as np
+
+from nico_lib.landmarks_minilib import N_LANDMARKS
+
+NORMALIZATIONS = ("none", "wrist_scale")  # Input transforms applied to the landmarks before inference
+WRIST = 0
+MIDDLE_FINGER_MCP = 9
+MIRROR_WORDS = {"left": "right", "right": "left"}  # Words of the class names swapped by a horizontal mirror
+
+
+def normalize_landmarks(landmarks: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Wrist-centered and scale-normalized landmarks: the wrist (landmark 0) is moved to the origin and the coordinates
+    are divided by the wrist to middle finger MCP (landmark 9) distance in the image plane,
+    so that the features do not depend on the position and size of the hand in the frame.
+    :param landmarks: (..., 21, 3) or (..., 63) landmarks normalized to the image.
+    :param out: output array of the same shape, may be landmarks itself, allocated if None.
+    :return: normalized landmarks, same shape as landmarks.
+    """
+    hands = landmarks.reshape(-1, N_LANDMARKS, 3)
+    if out is None:
+        out = np.empty(landmarks.shape, dtype=np.float32)
+    normalized = out.reshape(-1, N_LANDMARKS, 3)
+    np.subtract(hands, hands[:, WRIST:WRIST + 1], out=normalized)
+    scale = np.hypot(normalized[:, MIDDLE_FINGER_MCP, 0], normalized[:, MIDDLE_FINGER_MCP, 1])
+    normalized /= np.maximum(scale, 1e-6)[:, None, None]
+    return out
+
+
+def transform_landmarks(landmarks: np.ndarray, normalization: str, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Applies the input transform of a model, recorded in the input normalization of its manifest.
+    :param landmarks: (..., 21, 3) or (..., 63) landmarks normalized to the image.
+    :param normalization: one of NORMALIZATIONS.
+    :param out: output array of the same shape, allocated if None (the landmarks are returned as is with "none").
+    :return: (hands, 63) model input.
+    """
+    if normalization == "none":
+        features = landmarks
+    elif normalization == "wrist_scale":
+        features = normalize_landmarks(landmarks, out)
+    else:
+        raise ValueError(f"Unknown normalization <{normalization}>, use one of {NORMALIZATIONS}")
+    return features.reshape(-1, N_LANDMARKS * 3)
+
+
+def mirror_classes(labels: list) -> np.ndarray:
+    """
+    Class of each class once mirrored, from the class names of the manifest: the names containing "left" or "right"
+    are paired with the name where the word is swapped ("left" <-> "right", "swipe_left" <-> "swipe_right").
+    The other classes are considered mirror invariant (the same posture made with the other hand).
+    :param labels: class names, in class index order.
+    :return: (classes,) int index of the mirrored class, -1 for the left or right classes without a pair
+    (never mirrored).
+    """
+    indexes = {label: i for i, label in enumerate(labels)}
+    mirrored = np.arange(len(labels))
+    for i, label in enumerate(labels):
+        words = label.split("_")
+        if any(word in MIRROR_WORDS for word in words):
+            mirrored[i] = indexes.get("_".join(MIRROR_WORDS.get(word, word) for word in words), -1)
+    return mirrored
+
+
+def augment_landmarks(features: np.ndarray,
+                      rng: np.random.Generator,
+                      rotation: float = 15.,
+                      scale: float = 0.1,
+                      jitter: float = 0.01,
+                      mirror: float = 0.,
+                      labels: np.ndarray | None = None,
+                      mirrored_classes: np.ndarray | None = None) -> np.ndarray | tuple:
+    """
+    Random augmentation of a batch of samples, all the samples being transformed in a few array operations:
+    in-plane rotation and per axis scaling around the wrist, Gaussian jitter of each coordinate and optionally
+    mirroring, the class of a mirrored sample being replaced by its mirrored class (a mirrored "left" is a "right").
+    Works on raw and on normalized landmarks, the jitter being relative to the hand size in both cases.
+    :param features: (samples, 63) landmarks.
+    :param rng: random generator.
+    :param rotation: maximum rotation angle in degrees.
+    :param scale: maximum relative scale change of each axis.
+    :param jitter: standard deviation of the coordinates noise, relative to the hand size.
+    :param mirror: probability of mirroring a sample, requires labels and mirrored_classes if not 0.
+    :param labels: (samples,) class indexes of the samples.
+    :param mirrored_classes: mirrored class of each class (see mirror_classes), the samples of the classes
+    mapped to -1 are never mirrored.
+    :return: (samples, 63) float32 augmented samples, and (samples,) their class indexes if labels is given.
+    """
+    if mirror > 0 and (labels is None or mirrored_classes is None):
+        raise ValueError("Mirroring requires the labels and the mirrored classes of the samples")
+    hands = features.reshape(-1, N_LANDMARKS, 3).astype(np.float32)
+    n = hands.shape[0]
+    wrist = hands[:, WRIST:WRIST + 1].copy()
+    hands -= wrist
+    hand_size = np.hypot(hands[:, MIDDLE_FINGER_MCP, 0], hands[:, MIDDLE_FINGER_MCP, 1])[:, None, None]
+
+    angles = np.radians(rng.uniform(-rotation, rotation, n)).astype(np.float32)
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    scales = rng.uniform(1 - scale, 1 + scale, (n, 1, 2)).astype(np.float32)
+    if mirror > 0:
+        mirrored = mirrored_classes[labels]
+        flipped = (rng.random(n) < mirror) & (mirrored >= 0)
+        scales[flipped, :, 0] *= -1
+        labels = np.where(flipped, mirrored, labels).astype(labels.dtype)
+    x, y = hands[:, :, 0].copy(), hands[:, :, 1].copy()
+    hands[:, :, 0] = (cos * x - sin * y) * scales[:, :, 0]
+    hands[:, :, 1] = (sin * x + cos * y) * scales[:, :, 1]
+    hands += rng.normal(0, jitter, hands.shape).astype(np.float32) * hand_size
+
+    hands += wrist
+    features = hands.reshape(-1, N_LANDMARKS * 3)
+    return features if labels is None else (features, labels)
@@ -0,0 +1,233 @@
+from __future__ import annotations
+import math
+import time
+
+import numpy as np
+
+EVENT_TYPES = ("enter", "exit", "hold", "grab", "drag", "release", "two_hand_enter", "two_hand_move",
+               "two_hand_exit")
+
+
+class GestureEvent:
+    __slots__ = ("type", "hand", "posture", "position", "timestamp", "duration", "delta", "distance")
+
+    def __init__(self,
+                 event_type: str,
+                 hand: int,
+                 posture: int | None,
+                 position: tuple,
+                 timestamp: float,
+                 duration: float = 0.,
+                 delta: tuple = (0, 0),
+                 distance: float = 0.) -> None:
+        """
+        Event dispatched by the GestureEngine to the registered handlers.
+        :param event_type: one of EVENT_TYPES.
+        :param hand: hand index, -1 for the two-hand events.
+        :param posture: posture (model output index) concerned by the event.
+        :param position: (x, y) hand position, center of both hands for the two-hand events.
+        :param timestamp: time of the frame that triggered the event in seconds.
+        :param duration: time spent in the posture in seconds.
+        :param delta: (dx, dy) displacement since the previous drag or two-hand move event.
+        :param distance: distance between the hands for the two-hand events.
+        """
+        self.type = event_type
+        self.hand = hand
+        self.posture = posture
+        self.position = position
+        self.timestamp = timestamp
+        self.duration = duration
+        self.delta = delta
+        self.distance = distance
+
+    def __repr__(self) -> str:
+        return f"GestureEvent({self.type}, hand={self.hand}, posture={self.posture}, position={self.position})"
+
+
+class GestureEngine:
+    def __init__(self,
+                 grab_posture: int | None = None,
+                 debounce_frames: int = 2,
+                 move_threshold: float = 1.,
+                 n_hands: int = 2) -> None:
+        """
+        Turns the stream of predictions and hands coordinates of a HandVideoClassifier into debounced events
+        dispatched to registered handlers:
+        - enter / exit: a hand enters or leaves a posture,
+        - hold: a hand stays in a posture for a given duration (once per entry in the posture),
+        - grab / drag / release: enter, move and exit of the grab posture,
+        - two_hand_enter / two_hand_move / two_hand_exit: both hands in the same posture.
+        A posture change is accepted only after being predicted on debounce_frames consecutive frames.
+        Handlers are called only when an event occurs, the work per frame is constant when nothing changes.
+        :param grab_posture: posture triggering the grab, drag and release events, no such events if None.
+        :param debounce_frames: number of consecutive frames needed to accept a posture change.
+        :param move_threshold: minimum displacement in pixels triggering a drag or two-hand move event.
+        :param n_hands: number of hands.
+        """
+        self.grab_posture = grab_posture
+        self.debounce_frames = max(1, debounce_frames)
+        self.move_threshold = move_threshold
+        self.n_hands = n_hands
+        self.postures = [None] * n_hands  # Debounced posture of each hand, None if no posture
+        self.positions = [(0, 0)] * n_hands
+        self._handlers = {event_type: [] for event_type in EVENT_TYPES}
+        self._candidates = [None] * n_hands  # Posture change waiting for confirmation
+        self._candidate_counts = [0] * n_hands
+        self._enter_times = [0.] * n_hands
+        self._pending_holds = [[] for _ in range(n_hands)]  # Hold handlers not fired yet, sorted by duration
+        self._drag_positions = [(0, 0)] * n_hands  # Position at the last drag event
+        self._two_hand_posture = None
+        self._two_hand_position = (0, 0)  # Center of the hands at the last two-hand event
+        self._two_hand_distance = 0.
+        self._last_frame_id = None
+
+    def on(self,
+           event_type: str,
+           handler,
+           posture: int | None = None,
+           hand: int | None = None,
+           hold_time: float = 0.):
+        """
+        Registers an event handler.
+        :param event_type: one of EVENT_TYPES.
+        :param handler: function called with the GestureEvent.
+        :param posture: calls the handler only for this posture, any posture if None.
+        :param hand: calls the handler only for this hand index, any hand if None.
+        :param hold_time: duration in seconds for the hold events.
+        :return: the handler.
+        """
+        if event_type not in self._handlers:
+            raise ValueError(f"Unknown event type <{event_type}>, use one of {EVENT_TYPES}")
+        self._handlers[event_type].append((handler, posture, hand, hold_time))
+        if event_type == "hold":
+            self._handlers["hold"].sort(key=lambda entry: entry[3])
+        return handler
+
+    def handler(self, event_type: str, posture: int | None = None, hand: int | None = None, hold_time: float = 0.):
+        """
+        Decorator version of on.
+        """
+        return lambda function: self.on(event_type, function, posture, hand, hold_time)
+
+    def _dispatch(self, event: GestureEvent) -> int:
+        count = 0
+        for handler, posture, hand, _ in self._handlers[event.type]:
+            if (posture is None or posture == event.posture) and (hand is None or hand == event.hand):
+                handler(event)
+                count += 1
+        return count
+
+    def update_results(self, results: np.ndarray) -> int:
+        """
+        Processes a HandVideoClassifier.get_results snapshot, a frame already processed is ignored.
+        :param results: 0-d structured array from get_results.
+        :return: number of handlers called.
+        """
+        frame_id = int(results["frame_id"])
+        if frame_id == self._last_frame_id or frame_id < 0:
+            return 0
+        self._last_frame_id = frame_id
+        return self.update(results["predictions"].tolist(), results["centers"].tolist(), float(results["timestamp"]))
+
+    def update(self, predictions: list | tuple, positions: list | tuple, timestamp: float | None = None) -> int:
+        """
+        Processes the predictions of a frame.
+        :param predictions: posture of each hand, -1 (or None) if no posture is detected.
+        :param positions: (x, y) position of each hand.
+        :param timestamp: time of the frame in seconds, time.monotonic() if None.
+        :return: number of handlers called.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        count = 0
+        for hand in range(self.n_hands):
+            prediction = predictions[hand]
+            if prediction is not None and prediction < 0:
+                prediction = None
+            position = (positions[hand][0], positions[hand][1])
+            self.positions[hand] = position
+
+            # Debouncing of the posture changes
+            if prediction == self.postures[hand]:
+                self._candidate_counts[hand] = 0
+            else:
+                if prediction == self._candidates[hand]:
+                    self._candidate_counts[hand] += 1
+                else:
+                    self._candidates[hand] = prediction
+                    self._candidate_counts[hand] = 1
+                if self._candidate_counts[hand] >= self.debounce_frames:
+                    count += self._change_posture(hand, prediction, position, timestamp)
+                    self._candidate_counts[hand] = 0
+
+            # No hold or drag while a change is pending, the position of a lost hand is not reliable
+            posture = self.postures[hand]
+            if posture is None or prediction != posture:
+                continue
+            pending = self._pending_holds[hand]
+            duration = timestamp - self._enter_times[hand]
+            while pending and duration >= pending[0][3]:
+                handler = pending.pop(0)[0]
+                handler(GestureEvent("hold", hand, posture, position, timestamp, duration))
+                count += 1
+            if posture == self.grab_posture:
+                previous = self._drag_positions[hand]
+                if math.hypot(position[0] - previous[0], position[1] - previous[1]) >= self.move_threshold:
+                    self._drag_positions[hand] = position
+                    count += self._dispatch(GestureEvent("drag", hand, posture, position, timestamp, duration,
+                                                         delta=(position[0] - previous[0],
+                                                                position[1] - previous[1])))
+
+        return count + self._update_two_hands(timestamp)
+
+    def _change_posture(self, hand: int, posture: int | None, position: tuple, timestamp: float) -> int:
+        count = 0
+        previous = self.postures[hand]
+        if previous is not None:
+            duration = timestamp - self._enter_times[hand]
+            if previous == self.grab_posture:
+                count += self._dispatch(GestureEvent("release", hand, previous, position, timestamp, duration))
+            count += self._dispatch(GestureEvent("exit", hand, previous, position, timestamp, duration))
+
+        self.postures[hand] = posture
+        self._enter_times[hand] = timestamp
+        self._pending_holds[hand] = [] if posture is None else \
+            [entry for entry in self._handlers["hold"]
+             if (entry[1] is None or entry[1] == posture) and (entry[2] is None or entry[2] == hand)]
+        if posture is not None:
+            count += self._dispatch(GestureEvent("enter", hand, posture, position, timestamp))
+            if posture == self.grab_posture:
+                self._drag_positions[hand] = position
+                count += self._dispatch(GestureEvent("grab", hand, posture, position, timestamp))
+        return count
+
+    def _update_two_hands(self, timestamp: float) -> int:
+        if self.n_hands < 2:
+            return 0
+        count = 0
+        (x0, y0), (x1, y1) = self.positions[0], self.positions[1]
+        center = ((x0 + x1) / 2, (y0 + y1) / 2)
+        distance = math.hypot(x1 - x0, y1 - y0)
+        posture = self.postures[0] if self.postures[0] == self.postures[1] else None
+
+        if posture != self._two_hand_posture:
+            if self._two_hand_posture is not None:
+                count += self._dispatch(GestureEvent("two_hand_exit", -1, self._two_hand_posture, center, timestamp,
+                                                     distance=distance))
+            self._two_hand_posture = posture
+            if posture is not None:
+                self._two_hand_position = center
+                self._two_hand_distance = distance
+                count += self._dispatch(GestureEvent("two_hand_enter", -1, posture, center, timestamp,
+                                                     distance=distance))
+        elif posture is not None:
+            previous = self._two_hand_position
+            if math.hypot(center[0] - previous[0], center[1] - previous[1]) >= self.move_threshold or \
+                    abs(distance - self._two_hand_distance) >= self.move_threshold:
+                self._two_hand_position = center
+                self._two_hand_distance = distance
+                count += self._dispatch(GestureEvent("two_hand_move", -1, posture, center, timestamp,
+                                                     timestamp - max(self._enter_times),
+                                                     delta=(center[0] - previous[0], center[1] - previous[1]),
+                                                     distance=distance))
+        return count
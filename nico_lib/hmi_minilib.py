@@ -1,51 +1,459 @@
 from __future__ import annotations
+import time
 import cv2
 import numpy as np
 
+from nico_lib.shm_minilib import FrameBuffer
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: int = 64) -> None:
+        """
+        Uniform grid index of objects areas, used to find the objects under a point without testing all of them.
+        :param cell_size: grid cell size in pixels.
+        """
+        self.cell_size = cell_size
+        self._cells = {}  # (column, row) -> {id: object}
+        self._entries = {}  # id -> (object, rect, cells)
+
+    def _cells_of(self, rect: tuple) -> list:
+        x0, y0, x1, y1 = (int(v // self.cell_size) for v in rect)
+        return [(column, row) for column in range(x0, x1 + 1) for row in range(y0, y1 + 1)]
+
+    def insert(self, obj, rect: tuple) -> None:
+        """
+        Adds or moves an object in the index.
+        :param obj: indexed object.
+        :param rect: (x0, y0, x1, y1) area of the object.
+        """
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] == rect:
+                return
+            cells = self._cells_of(rect)
+            if cells == entry[2]:
+                self._entries[key] = (obj, rect, cells)
+                return
+            self.remove(obj)
+        else:
+            cells = self._cells_of(rect)
+
+        for cell in cells:
+            self._cells.setdefault(cell, {})[key] = obj
+        self._entries[key] = (obj, rect, cells)
+
+    def remove(self, obj) -> None:
+        """
+        Removes an object from the index.
+        :param obj: indexed object.
+        """
+        entry = self._entries.pop(id(obj), None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            objects = self._cells[cell]
+            del objects[id(obj)]
+            if not objects:
+                del self._cells[cell]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._entries.clear()
+
+    def query_point(self, xy: list | tuple | np.ndarray) -> list:
+        """
+        Returns the objects whose area strictly contains a point.
+        :param xy: [x, y] point.
+        :return: list of objects.
+        """
+        x, y = xy[0], xy[1]
+        objects = self._cells.get((int(x // self.cell_size), int(y // self.cell_size)), {})
+        return [obj for key, obj in objects.items()
+                if self._entries[key][1][0] < x < self._entries[key][1][2]
+                and self._entries[key][1][1] < y < self._entries[key][1][3]]
+
+
+class ElementStore:
+    def __init__(self, capacity: int = 64) -> None:
+        """
+        Structure of arrays holding the state of the elements of a GUI in contiguous arrays, the elements bound
+        to the store being views on their row. Hit-testing, moving and deleting many elements are then done
+        in a few vectorized operations instead of a Python loop over the elements.
+        :param capacity: initial number of rows, the arrays grow when needed.
+        """
+        self.n = 0
+        self.elements = []  # Element of each row
+        self.positions = np.zeros((capacity, 2), dtype=np.float32)
+        self.hit_boxes = np.zeros((capacity, 2), dtype=np.float32)
+        self.colors = np.zeros((capacity, 3), dtype=np.float32)
+        self.can_be_grabbed = np.zeros(capacity, dtype=bool)
+        self.deletable = np.zeros(capacity, dtype=bool)
+        self.grabbed = np.zeros(capacity, dtype=bool)
+        self.grabbed_by = np.zeros(capacity, dtype=np.int8)
+        self.z = np.zeros(capacity, dtype=np.int64)  # Stacking order, lower values are on top
+        self.drawn_rects = np.zeros((capacity, 4), dtype=np.int32)  # Area at the last draw, empty if not drawn
+
+    _ARRAYS = ("positions", "hit_boxes", "colors", "can_be_grabbed", "deletable", "grabbed", "grabbed_by", "z",
+               "drawn_rects")
+
+    def _grow(self, capacity: int) -> None:
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self.n] = array[:self.n]
+            setattr(self, name, grown)
+
+    def bind(self, element: "Element") -> int:
+        """
+        Copies the state of an element to a new row and turns the element into a view on this row.
+        :param element: unbound Element object.
+        :return: row index.
+        """
+        if self.n == self.positions.shape[0]:
+            self._grow(2 * self.n)
+        index = self.n
+        values = [element.position, element.hit_box, element.color, element.can_by_grabbed, element.deletable,
+                  element.grabbed, element.grabbed_by, element._z, element._drawn_rect or (0, 0, 0, 0)]
+        for name, value in zip(self._ARRAYS, values):
+            getattr(self, name)[index] = value
+        self.elements.append(element)
+        self.n += 1
+        element._store = self
+        element._index = index
+        return index
+
+    def unbind(self, indices: np.ndarray | list) -> None:
+        """
+        Copies back the state of the elements of some rows to the elements and removes these rows.
+        :param indices: row indices or boolean mask of the rows.
+        """
+        remove = np.zeros(self.n, dtype=bool)
+        remove[indices] = True
+        for index in np.flatnonzero(remove):
+            element = self.elements[index]
+            state = (element.position.tolist(), element.hit_box.tolist(), tuple(element.color.tolist()),
+                     element.can_by_grabbed, element.deletable, element.grabbed, element.grabbed_by,
+                     element._z, element._drawn_rect)
+            element._store = None
+            (element._position, element._hit_box, element._color, element._can_by_grabbed, element._deletable,
+             element._grabbed, element._grabbed_by, element._z_value, element._drawn_rect_value) = state
+
+        # Remaining rows are packed at the beginning of the arrays
+        keep = np.flatnonzero(~remove)
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            array[:keep.shape[0]] = array[keep]
+        self.elements = [self.elements[index] for index in keep]
+        self.n = keep.shape[0]
+        for index, element in enumerate(self.elements):
+            element._index = index
+
+    def hit_test(self, points: list | tuple | np.ndarray) -> np.ndarray:
+        """
+        Finds the topmost element whose hit box strictly contains each point, for all the points in one call.
+        :param points: (points, 2) coordinates, the positions of both hands for example.
+        :return: (points,) row indices, -1 if no element is under the point.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        inside = np.all(np.abs(self.positions[None, :self.n] - points[:, None]) < self.hit_boxes[None, :self.n],
+                        axis=-1)
+        z = np.where(inside, self.z[None, :self.n], np.iinfo(np.int64).max)
+        rows = np.argmin(z, axis=-1) if self.n else np.zeros(points.shape[0], dtype=np.int64)
+        return np.where(inside.any(axis=-1), rows, -1)
+
+    def intersecting(self, rect: tuple, grabbed: bool) -> np.ndarray:
+        """
+        Finds the elements whose last drawn area intersects an area.
+        :param rect: (x0, y0, x1, y1) area.
+        :param grabbed: selects the grabbed elements if True, the other elements if False.
+        :return: row indices sorted from the bottom element to the top element.
+        """
+        x0, y0, x1, y1 = rect
+        rects = self.drawn_rects[:self.n]
+        mask = (rects[:, 0] < x1) & (x0 < rects[:, 2]) & (rects[:, 1] < y1) & (y0 < rects[:, 3]) & \
+            (self.grabbed[:self.n] == grabbed)
+        rows = np.flatnonzero(mask)
+        return rows[np.argsort(-self.z[rows], kind="stable")]
+
+
+class _StoreField:
+    def __init__(self, array: str, local: str, from_store=None, to_store=None) -> None:
+        """
+        Element attribute read from the row of the element in its ElementStore when bound, from a slot otherwise.
+        :param array: ElementStore array name.
+        :param local: slot name used when the element is not bound.
+        :param from_store: conversion of the value read from the store.
+        :param to_store: conversion of the value written to the store.
+        """
+        self.array = array
+        self.local = local
+        self.from_store = from_store
+        self.to_store = to_store
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if obj._store is None:
+            return getattr(obj, self.local)
+        value = getattr(obj._store, self.array)[obj._index]
+        return self.from_store(value) if self.from_store is not None else value
+
+    def __set__(self, obj, value) -> None:
+        if obj._store is None:
+            setattr(obj, self.local, value)
+        else:
+            getattr(obj._store, self.array)[obj._index] = self.to_store(value) if self.to_store is not None else value
+
+
+def _rect_from_store(rect: np.ndarray) -> tuple | None:
+    return None if rect[2] <= rect[0] else tuple(rect.tolist())
+
 
 class GUI:
     def __init__(self,
-                 window_name: str = "HMI") -> None:
+                 window_name: str = "HMI",
+                 size: tuple = (640, 480),
+                 element_store: ElementStore | None = None,
+                 headless: bool = False,
+                 sinks: list | None = None) -> None:
         """
         Basic interface handling the displacement, adding and deleting of object of Element subclasses.
+        The scene is rendered in retained mode: the non-grabbed objects are cached in a background layer and
+        only the areas of the objects that changed since the last draw (and the hands cursors) are redrawn.
+        Grabbed objects are drawn above the other objects.
+        Objects must be modified through their set_position and set_grabbed methods, or invalidated after
+        any other modification with GUI.invalidate.
         :param window_name: GUI window name.
+        :param size: (width, height) of the interface in pixels.
+        :param element_store: ElementStore holding the objects state in arrays, for scenes with thousands of
+        objects. Hit-testing, redrawing and the bulk operations are then vectorized over all the objects.
+        :param headless: draw renders the image without any OpenCV window call, for hosts without display.
+        :param sinks: sink_minilib.FrameSink objects receiving the rendered images, opened here.
         """
         self.window_name = window_name
         self.objects = []
-        self.hmi_output = np.zeros((480, 640, 3))
+        self.size = size
+        self.hmi_output = np.zeros((size[1], size[0], 3), dtype=np.uint8)
         self.hand_coords = [[0, 0], [0, 0]]
+        self._background = np.zeros_like(self.hmi_output)  # Non-grabbed objects layer
+        self._full_redraw = True
+        self._invalidated = {}  # Changed objects, by id, with their area at the last draw
+        self._hands_rects = []  # Hands cursors areas at the last draw
+        self.element_store = element_store
+        self._hit_index = SpatialGrid()  # Objects hit boxes, not used with an element store
+        self._next_z = 0  # Stacking order of the next added object, lower values are on top
+        self.headless = headless
+        self.sinks = list(sinks) if sinks is not None else []
+        for sink in self.sinks:
+            sink.open(size)
+        self._frame_index = 0
+        self._camera = None  # FrameBuffer composited into the interface
+        self._camera_mode = "background"
+        self._camera_rect = None
+        self._background_mask = np.zeros((size[1], size[0]), dtype=bool)  # Drawn pixels of the background layer
+
+    def set_camera(self,
+                   frame_buffer: FrameBuffer | None = None,
+                   mode: str = "background",
+                   rect: tuple | None = None) -> None:
+        """
+        Composites the latest frame of a shared memory frame buffer (HandVideoClassifier.get_frame_buffer()) into the
+        interface on every render, read in place from the shared memory.
+        In background mode the objects are drawn over the frame, the black pixels of the non-grabbed objects
+        being transparent. In picture-in-picture mode the frame is drawn over the objects, under the hands cursors.
+        :param frame_buffer: frame buffer of the camera, disables the camera if None.
+        :param mode: "background" or "pip".
+        :param rect: (x0, y0, x1, y1) area of the picture-in-picture, bottom right quarter of the interface if None.
+        """
+        if mode not in ("background", "pip"):
+            raise ValueError(f"Unknown camera mode <{mode}>, use \"background\" or \"pip\"")
+        if rect is None:
+            width, height = self.size
+            rect = (width * 3 // 4 - 8, height * 3 // 4 - 8, width - 8, height - 8)
+        self._camera = frame_buffer
+        self._camera_mode = mode
+        self._camera_rect = self._clip(rect)
+        self._full_redraw = True
 
     def draw(self) -> None:
         """
-        Output image generation, used to update the scene.
+        Output image generation and display, used to update the scene.
+        The image is sent to the active sinks and shown if the GUI is not headless.
         """
-        self.hmi_output = np.zeros((480, 640, 3))
+        self.render()
+        for sink in self.sinks:
+            if sink.active:
+                sink.write(self.hmi_output, self._frame_index, time.monotonic())
+        self._frame_index += 1
+        if not self.headless:
+            cv2.imshow("HMI", self.hmi_output)
 
-        for obj in self.objects[::-1]:
-            obj.draw(self.hmi_output)
+    def close(self) -> None:
+        """
+        Closes the sinks.
+        """
+        for sink in self.sinks:
+            sink.close()
+
+    def render(self) -> np.ndarray:
+        """
+        Output image generation without display, for headless use and benchmarks.
+        :return: output image, reused by the next renders.
+        """
+        if self._camera is not None and self._camera_mode == "background":
+            self._render_over_camera()
+        else:
+            if self._full_redraw:
+                self._redraw_all()
+            else:
+                self._redraw_dirty()
+            if self._camera is not None:
+                x0, y0, x1, y1 = self._camera_rect
+                self._copy_camera(self.hmi_output[y0:y1, x0:x1])
+        self._invalidated.clear()
 
         self._draw_hands()
+        return self.hmi_output
+
+    def _redraw_all(self) -> None:
+        """
+        Renders the background layer and the output image from scratch.
+        """
+        self._background[:] = 0
+        for obj in self.objects[::-1]:
+            if not obj.is_grabbed():
+                obj.draw(self._background)
+        self.hmi_output[:] = self._background
+        for obj in self.objects[::-1]:
+            if obj.is_grabbed():
+                obj.draw(self.hmi_output)
+            obj._drawn_rect = obj.get_draw_rect()
+        self._full_redraw = False
+
+    def _dirty_rects(self) -> list:
+        """
+        Returns the areas of the changed objects, before and after their change, and updates their drawn area.
+        """
+        dirty_rects = []
+        for obj, previous_rect in self._invalidated.values():
+            rects = [previous_rect]
+            if obj._gui is self:
+                obj._drawn_rect = obj.get_draw_rect()
+                rects.append(obj._drawn_rect)
+            dirty_rects += [rect for rect in map(self._clip, rects) if rect is not None]
+        return dirty_rects
+
+    def _redraw_dirty(self) -> None:
+        """
+        Renders only the areas of the changed objects and of the previous hands cursors.
+        """
+        background_rects = self._dirty_rects()
+        output_rects = self._hands_rects + background_rects
+
+        for rect in background_rects:
+            self._render_rect(self._background, rect, grabbed=False)
+        for rect in output_rects:
+            x0, y0, x1, y1 = rect
+            self.hmi_output[y0:y1, x0:x1] = self._background[y0:y1, x0:x1]
+            self._render_rect(self.hmi_output, rect, grabbed=True)
+
+    def _render_over_camera(self) -> None:
+        """
+        Renders the output image over the camera frame: the background layer is updated in the changed areas only,
+        then its drawn pixels and the grabbed objects are composited over the frame.
+        """
+        if self._full_redraw:
+            rects = [(0, 0, self.size[0], self.size[1])]
+            for obj in self.objects:
+                obj._drawn_rect = obj.get_draw_rect()
+            self._full_redraw = False
+        else:
+            rects = self._dirty_rects()
+        for x0, y0, x1, y1 in rects:
+            self._render_rect(self._background, (x0, y0, x1, y1), grabbed=False)
+            np.any(self._background[y0:y1, x0:x1], axis=2, out=self._background_mask[y0:y1, x0:x1])
 
-        cv2.imshow("HMI", self.hmi_output)
+        self._copy_camera(self.hmi_output)
+        cv2.copyTo(self._background, self._background_mask.view(np.uint8), self.hmi_output)
+        self._render_rect(self.hmi_output, (0, 0, self.size[0], self.size[1]), grabbed=True)
+
+    def _copy_camera(self, dst: np.ndarray) -> None:
+        """
+        Copies the latest camera frame to an area of the output image, resized to the area, directly from the
+        shared memory. The frame is read again if it was overwritten during the copy.
+        :param dst: output image area.
+        """
+        latest = self._camera.latest()
+        if latest is None:
+            dst[:] = 0
+            return
+        while True:
+            sequence, frame = latest[:2]
+            if frame.shape[:2] == dst.shape[:2]:
+                np.copyto(dst, frame)
+            else:
+                cv2.resize(frame, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=cv2.INTER_LINEAR)
+            if self._camera.is_valid(sequence):
+                return
+            latest = self._camera.latest()
+
+    def _render_rect(self, dst: np.ndarray, rect: tuple, grabbed: bool) -> None:
+        """
+        Draws the objects intersecting an area, clipped to this area.
+        :param dst: image to be drawn to.
+        :param rect: (x0, y0, x1, y1) area in the image.
+        :param grabbed: draws the grabbed objects if True, the other objects if False.
+        """
+        x0, y0, x1, y1 = rect
+        view = dst[y0:y1, x0:x1]
+        if not grabbed:
+            view[:] = 0
+        if self.element_store is not None:
+            for row in self.element_store.intersecting(rect, grabbed):
+                self.element_store.elements[row].draw(view, offset=(x0, y0))
+            return
+        for obj in self.objects[::-1]:
+            if obj.is_grabbed() == grabbed and self._intersects(obj._drawn_rect, rect):
+                obj.draw(view, offset=(x0, y0))
+
+    def _clip(self, rect: tuple | None) -> tuple | None:
+        """
+        Clips an area to the image, None if the area is outside the image.
+        """
+        if rect is None:
+            return None
+        x0, y0, x1, y1 = max(rect[0], 0), max(rect[1], 0), min(rect[2], self.size[0]), min(rect[3], self.size[1])
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _intersects(rect_a: tuple | None, rect_b: tuple) -> bool:
+        return rect_a is not None and rect_a[0] < rect_b[2] and rect_b[0] < rect_a[2] \
+            and rect_a[1] < rect_b[3] and rect_b[1] < rect_a[3]
 
     def _draw_hands(self) -> None:
         """
-        Hands positions drawing.
+        Hands positions drawing, the cursors areas are restored on the next draw.
         """
         cv2.circle(self.hmi_output,
                    center=self.hand_coords[0],
                    radius=10,
-                   color=(0.5, 0.5, 0),
+                   color=(127, 127, 0),
                    thickness=3,
                    lineType=cv2.LINE_4)
 
         cv2.circle(self.hmi_output,
                    center=self.hand_coords[1],
                    radius=10,
-                   color=(0, 0.5, 0.5),
+                   color=(0, 127, 127),
                    thickness=3,
                    lineType=cv2.LINE_4)
 
+        self._hands_rects = [rect for rect in (self._clip((x - 12, y - 12, x + 13, y + 13))
+                                               for x, y in self.hand_coords) if rect is not None]
+
     def set_hands_coords(self, coords: list) -> None:
         """
         Update the hand coordinates to control GUI.
@@ -59,17 +467,172 @@ class GUI:
         :param obj: Object to append to list.
         """
         self.objects.append(obj)
+        obj._gui = self
+        obj._drawn_rect = None
+        obj._z = self._next_z
+        self._next_z += 1
+        if self.element_store is not None:
+            self.element_store.bind(obj)
+        self.invalidate(obj)
 
     def delete_object(self, obj_id) -> None:
         """
         Deletes object from GUI.
-        :param obj_id: Index of the object to delete in object list.
+        :param obj_id: Index of the object to delete in object list, or the object itself.
         """
+        if isinstance(obj_id, Element):
+            obj_id = self.objects.index(obj_id)
         if self.objects[obj_id].deletable:
-            self.objects.pop(obj_id)
+            obj = self.objects.pop(obj_id)
+            self.invalidate(obj)
+            if self.element_store is not None:
+                self.element_store.unbind([obj._index])
+            self._hit_index.remove(obj)
+            obj._gui = None
+
+    def _rows(self, objects: list | np.ndarray) -> np.ndarray:
+        """
+        Returns the element store rows of objects.
+        :param objects: list of Element objects, or array of rows (indices or boolean mask) of the element store.
+        :return: array of rows.
+        """
+        if isinstance(objects, np.ndarray):
+            return np.flatnonzero(objects) if objects.dtype == bool else objects.astype(np.int64, copy=False)
+        return np.fromiter((obj._index for obj in objects), dtype=np.int64, count=len(objects))
+
+    def _invalidate_many(self, objects: list) -> None:
+        """
+        Marks objects to be redrawn, the whole scene is redrawn when many objects changed.
+        """
+        if len(objects) > 64:
+            self._full_redraw = True
+        else:
+            for obj in objects:
+                self.invalidate(obj)
+
+    def move_objects(self, objects: list | np.ndarray, delta: list | tuple | np.ndarray) -> None:
+        """
+        Moves several objects at once, in a single operation with an element store.
+        :param objects: list of Element objects, or with an element store, array of rows of the store
+        (indices or boolean mask, for example from a comparison on element_store.positions).
+        :param delta: [dx, dy] displacement of all the objects, or (objects, 2) displacement of each object.
+        """
+        if self.element_store is None:
+            for obj, obj_delta in zip(objects, np.broadcast_to(delta, (len(objects), 2))):
+                obj.set_position([obj.position[0] + obj_delta[0], obj.position[1] + obj_delta[1]])
+            return
+        rows = self._rows(objects)
+        self.element_store.positions[rows] += np.asarray(delta, dtype=np.float32)
+        self._invalidate_many([self.element_store.elements[row] for row in rows.tolist()])
+
+    def delete_objects(self, objects: list | np.ndarray) -> None:
+        """
+        Deletes several objects at once, the objects that are not deletable are kept.
+        :param objects: list of Element objects, or with an element store, array of rows of the store
+        (indices or boolean mask).
+        """
+        if self.element_store is None:
+            deleted = [obj for obj in objects if obj.deletable and obj._gui is self]
+        else:
+            rows = self._rows(objects)
+            rows = rows[self.element_store.deletable[rows]]
+            deleted = [self.element_store.elements[row] for row in rows]
+        if not deleted:
+            return
+
+        self._invalidate_many(deleted)
+        deleted_ids = set(map(id, deleted))
+        self.objects = [obj for obj in self.objects if id(obj) not in deleted_ids]
+        if self.element_store is not None:
+            self.element_store.unbind(rows)
+        for obj in deleted:
+            self._hit_index.remove(obj)
+            obj._gui = None
+
+    def query_point(self, xy: list | tuple | np.ndarray):
+        """
+        Returns the topmost object whose hit box contains a point, using the spatial index of the hit boxes.
+        :param xy: [x, y] point in the GUI coordinates, a hand position for example.
+        :return: Element object, None if no object is under the point.
+        """
+        if self.element_store is not None:
+            return self.query_points([xy])[0]
+        objects = self._hit_index.query_point(xy)
+        if not objects:
+            return None
+        return min(objects, key=lambda obj: obj._z)
+
+    def query_points(self, points: list | tuple | np.ndarray) -> list:
+        """
+        Same as query_point for several points, the positions of both hands for example,
+        tested in a single vectorized call with an element store.
+        :param points: (points, 2) coordinates in the GUI.
+        :return: list of Element objects or None, one per point.
+        """
+        if self.element_store is None:
+            return [self.query_point(xy) for xy in points]
+        return [self.element_store.elements[row] if row >= 0 else None
+                for row in self.element_store.hit_test(points).tolist()]
+
+    def invalidate(self, obj=None) -> None:
+        """
+        Marks an object to be redrawn on the next draw, the whole scene if obj is None.
+        Called by the objects methods, needed only after modifying objects attributes or the objects list directly.
+        :param obj: changed object.
+        """
+        if obj is None:
+            self._full_redraw = True
+            # The objects list may have been modified directly
+            self._hit_index.clear()
+            if self.element_store is not None:
+                self.element_store.unbind(np.arange(self.element_store.n))
+            for z, listed_obj in enumerate(self.objects):
+                listed_obj._gui = self
+                listed_obj._z = z
+                if self.element_store is not None:
+                    self.element_store.bind(listed_obj)
+                else:
+                    self._hit_index.insert(listed_obj, listed_obj.get_hit_rect())
+            self._next_z = len(self.objects)
+            return
+
+        if id(obj) not in self._invalidated:
+            self._invalidated[id(obj)] = (obj, obj._drawn_rect)
+        if obj._gui is self and self.element_store is None:
+            self._hit_index.insert(obj, obj.get_hit_rect())
+
+
+def _color(color: tuple | list | np.ndarray, src: np.ndarray, factor: float = 1.) -> tuple:
+    """
+    Converts a [0, 1] color to the range of the image it is drawn to.
+    :param color: color with [0, 1] components.
+    :param src: image to be drawn to.
+    :param factor: brightness factor.
+    :return: color tuple.
+    """
+    scale = 255 * factor if src.dtype == np.uint8 else factor
+    return tuple(float(c) * scale for c in color)
+
+
+def _rect_to_store(rect: tuple | None) -> tuple:
+    return (0, 0, 0, 0) if rect is None else rect
 
 
 class Element:
+    __slots__ = ("_position", "_hit_box", "_color", "_can_by_grabbed", "_deletable", "_grabbed", "_grabbed_by",
+                 "_z_value", "_drawn_rect_value", "_store", "_index", "_gui")
+
+    # State attributes, stored in the slots or in the row of the element when bound to an ElementStore
+    position = _StoreField("positions", "_position")
+    hit_box = _StoreField("hit_boxes", "_hit_box")
+    color = _StoreField("colors", "_color")
+    can_by_grabbed = _StoreField("can_be_grabbed", "_can_by_grabbed", bool)
+    deletable = _StoreField("deletable", "_deletable", bool)
+    grabbed = _StoreField("grabbed", "_grabbed", bool)
+    grabbed_by = _StoreField("grabbed_by", "_grabbed_by", int)
+    _z = _StoreField("z", "_z_value", int)  # Stacking order in the GUI
+    _drawn_rect = _StoreField("drawn_rects", "_drawn_rect_value", _rect_from_store, _rect_to_store)
+
     def __init__(self,
                  position: list | np.ndarray,
                  hit_box_dims: list | tuple = (20, 20),
@@ -84,6 +647,8 @@ class Element:
         :param can_be_grabbed: condition for the object to be displaced by grabbing it.
         :param deletable: condition for the object to be deleted.
         """
+        self._store = None  # ElementStore holding the state of the object
+        self._index = 0  # Row in the ElementStore
         self.hit_box = hit_box_dims
         self.position = position
         self.color = color
@@ -91,6 +656,9 @@ class Element:
         self.deletable = deletable
         self.grabbed = False
         self.grabbed_by = 0
+        self._gui = None  # GUI displaying the object
+        self._drawn_rect = None  # Area of the object at the last draw
+        self._z = 0
 
     def set_position(self, position: list | np.ndarray) -> None:
         """
@@ -98,11 +666,13 @@ class Element:
         :param position: [x, y] coordinates in the GUI.
         """
         self.position = position
+        if self._gui is not None:
+            self._gui.invalidate(self)
 
     def get_position(self) -> list:
         """
         Get the position of the object into the GUI coordinates.
-        :return: position of the object.
+        :return: position of the object, a view on the row of the object if bound to an ElementStore.
         """
         return self.position
 
@@ -113,6 +683,8 @@ class Element:
         :param holder_index: holder index
         """
         if self.can_by_grabbed:
+            if self._gui is not None and grabbed != self.grabbed:
+                self._gui.invalidate(self)
             self.grabbed = grabbed
             self.grabbed_by = holder_index
 
@@ -130,8 +702,31 @@ class Element:
         """
         return self.hit_box
 
+    def get_hit_rect(self) -> tuple:
+        """
+        Returns the interaction area of the object, a point interacts if strictly inside.
+        :return: (x0, y0, x1, y1) area in the GUI.
+        """
+        return self.position[0] - self.hit_box[0], self.position[1] - self.hit_box[1], \
+            self.position[0] + self.hit_box[0], self.position[1] + self.hit_box[1]
+
+    def get_draw_rect(self) -> tuple:
+        """
+        Returns the area covered by the object when drawn, used to redraw only the changed areas.
+        Defaults to the hit box, to be overridden in the subclass if the drawing is larger.
+        :return: (x0, y0, x1, y1) area in the GUI, x1 and y1 excluded.
+        """
+        x, y = int(self.position[0]), int(self.position[1])
+        return x - int(self.hit_box[0]) - 2, y - int(self.hit_box[1]) - 2, \
+            x + int(self.hit_box[0]) + 3, y + int(self.hit_box[1]) + 3
+
+    def _center(self, offset: tuple) -> tuple:
+        return int(self.position[0]) - offset[0], int(self.position[1]) - offset[1]
+
 
 class Ball(Element):
+    __slots__ = ("ball_radius",)
+
     def __init__(self,
                  initial_position: list | np.ndarray,
                  ball_radius: int = 30,
@@ -153,26 +748,34 @@ class Ball(Element):
                          deletable=deletable)
         self.ball_radius = ball_radius
 
-    def draw(self, src) -> None:
+    def draw(self, src, offset: tuple = (0, 0)) -> None:
         """
         Shows object on GUI, meant to be used into an update function only.
         :param src: image to be drawn to.
+        :param offset: GUI coordinates of the top left corner of src.
         """
         if not self.grabbed:
             cv2.circle(src,
-                       center=self.position,
+                       center=self._center(offset),
                        radius=self.ball_radius,
-                       color=self.color,
+                       color=_color(self.color, src),
                        thickness=-1)
         else:
             cv2.circle(src,
-                       center=self.position,
+                       center=self._center(offset),
                        radius=int(1.2 * self.ball_radius),
-                       color=[c / 2 for c in self.color],
+                       color=_color(self.color, src, factor=0.5),
                        thickness=-1)
 
+    def get_draw_rect(self) -> tuple:
+        radius = int(1.2 * self.ball_radius) if self.grabbed else self.ball_radius
+        x, y = int(self.position[0]), int(self.position[1])
+        return x - radius - 2, y - radius - 2, x + radius + 3, y + radius + 3
+
 
 class Box(Element):
+    __slots__ = ("box_size",)
+
     def __init__(self, initial_position: list | np.ndarray,
                  box_size: tuple | list | np.ndarray = (100, 40),
                  color: tuple | list | np.ndarray = (1, 1, 1),
@@ -193,28 +796,24 @@ class Box(Element):
                          deletable=deletable)
         self.box_size = box_size
 
-    def draw(self, src) -> None:
+    def draw(self, src, offset: tuple = (0, 0)) -> None:
         """
         Shows object on GUI, meant to be used into an update function only.
         :param src: image to be drawn to.
-        """
-        if not self.grabbed:
-            cv2.rectangle(src,
-                          pt1=(self.position[0] - self.box_size[0] // 2, self.position[1] - self.box_size[1] // 2),
-                          pt2=(self.position[0] + self.box_size[0] // 2, self.position[1] + self.box_size[1] // 2),
-                          color=self.color,
-                          thickness=-1,
-                          lineType=cv2.LINE_4)
-        else:
-            cv2.rectangle(src,
-                          pt1=(self.position[0] - self.box_size[0] // 2, self.position[1] - self.box_size[1] // 2),
-                          pt2=(self.position[0] + self.box_size[0] // 2, self.position[1] + self.box_size[1] // 2),
-                          color=[c / 2 for c in self.color],
-                          thickness=-1,
-                          lineType=cv2.LINE_4)
+        :param offset: GUI coordinates of the top left corner of src.
+        """
+        x, y = self._center(offset)
+        cv2.rectangle(src,
+                      pt1=(x - self.box_size[0] // 2, y - self.box_size[1] // 2),
+                      pt2=(x + self.box_size[0] // 2, y + self.box_size[1] // 2),
+                      color=_color(self.color, src, factor=0.5 if self.grabbed else 1.),
+                      thickness=-1,
+                      lineType=cv2.LINE_4)
 
 
 class Text(Element):
+    __slots__ = ("text", "font_size", "font")
+
     def __init__(self, initial_position: list | np.ndarray,
                  text: str = "Basic text",
                  cv2_font: int = cv2.FONT_HERSHEY_COMPLEX_SMALL,
@@ -238,25 +837,25 @@ class Text(Element):
         self.font_size = font_size
         self.font = cv2_font
 
-    def draw(self, src) -> None:
+    def draw(self, src, offset: tuple = (0, 0)) -> None:
         """
         Shows object on GUI, meant to be used into an update function only.
         :param src: image to be drawn to.
-        """
-        if not self.grabbed:
-            cv2.putText(src,
-                        text=self.text,
-                        org=[self.position[0] - self.hit_box[0], self.position[1]],
-                        fontFace=self.font,
-                        fontScale=self.font_size,
-                        color=self.color)
-        else:
-            cv2.putText(src,
-                        text=self.text,
-                        org=[self.position[0] - self.hit_box[0], self.position[1]],
-                        fontFace=self.font,
-                        fontScale=self.font_size * 1.1,
-                        color=[c for c in self.color])
+        :param offset: GUI coordinates of the top left corner of src.
+        """
+        x, y = self._center(offset)
+        cv2.putText(src,
+                    text=self.text,
+                    org=(int(x - self.hit_box[0]), y),
+                    fontFace=self.font,
+                    fontScale=self.font_size * 1.1 if self.grabbed else self.font_size,
+                    color=_color(self.color, src))
+
+    def get_draw_rect(self) -> tuple:
+        font_size = self.font_size * 1.1 if self.grabbed else self.font_size
+        (width, height), baseline = cv2.getTextSize(self.text, self.font, font_size, 1)
+        x, y = int(self.position[0] - self.hit_box[0]), int(self.position[1])
+        return x - 2, y - height - 2, x + width + 3, y + baseline + 3
 
 
 if __name__ == '__main__':
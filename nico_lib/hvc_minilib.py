@@ -2,14 +2,72 @@ from __future__ import annotations
 import os
 import signal
 import time
-from multiprocessing import Process, Value
+import traceback
+from multiprocessing import Pipe, Process, Value
+from multiprocessing.connection import Connection
 import numpy as np
 import cv2
-import mediapipe as mp
-from keras import models
 from halo import Halo
 
-MODEL_PATH = "../Assets/model_data/model.h5"  # TensorFlow Keras model path
+from nico_lib.backend_minilib import load_backend
+from nico_lib.capture_minilib import DirectCapture, FpsCounter, FrameGrabber, open_stream
+from nico_lib.features_minilib import transform_landmarks
+from nico_lib.landmarks_minilib import LandmarkExtractor, draw_landmarks
+from nico_lib.manifest_minilib import load_manifest
+from nico_lib.quality_minilib import LandmarkExtrapolator, QualityGovernor
+from nico_lib.roi_minilib import RoiTracker
+from nico_lib.shm_minilib import MAX_CLASSES, FrameBuffer, ResultBlock, StatsBlock
+from nico_lib.sink_minilib import SharedFrameSink
+from nico_lib.smoothing_minilib import PredictionSmoother
+from nico_lib.stats_minilib import LoopStats, MetricsHttpServer, UdpStatsSender, stats_to_dict
+
+MODEL_PATH = "../Assets/model_data/model.h5"  # Model path (.h5/.keras, .npz, .tflite or .onnx)
+STARTUP_TIMEOUT = 60.  # Maximum duration in seconds of the detection subprocess startup
+
+
+def wait_for_startup(process: Process, startup_receiver, timeout: float) -> tuple:
+    """
+    Waits for the readiness message of a detection subprocess, without using the CPU.
+
+    :param process: started detection subprocess.
+    :param startup_receiver: receiving end of the startup pipe, the sending end must be closed in this process.
+    :param timeout: maximum startup duration in seconds.
+    :return: (startup phases durations in seconds, names of the shared memory blocks created by the subprocess)
+    sent by the subprocess.
+    """
+    if not startup_receiver.poll(timeout):
+        process.terminate()
+        process.join()
+        raise TimeoutError(f"Detection subprocess not ready after {timeout} s")
+
+    try:
+        status, *content = startup_receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"Detection subprocess exited during startup "
+                           f"(exit code {process.exitcode})") from None
+
+    if status == "error":
+        error, child_traceback = content
+        process.join()
+        raise error from RuntimeError(f"Detection subprocess startup failed :\n{child_traceback}")
+
+    timings, shared_blocks = content
+    return timings, shared_blocks
+
+
+def send_startup_error(startup_sender, error: Exception) -> None:
+    """
+    Sends an exception raised during the subprocess startup to wait_for_startup, and closes the pipe.
+
+    :param startup_sender: sending end of the startup pipe.
+    :param error: exception to raise again in the main process.
+    """
+    try:
+        startup_sender.send(("error", error, traceback.format_exc()))
+    except Exception:  # Unpicklable exception
+        startup_sender.send(("error", RuntimeError(repr(error)), traceback.format_exc()))
+    startup_sender.close()
 
 
 class HandVideoClassifier:
@@ -19,7 +77,22 @@ class HandVideoClassifier:
                  video_output: bool = False,
                  verbose: bool = False,
                  labels_on_vid: list | np.ndarray = None,
-                 always_on_top: bool = True) -> None:
+                 always_on_top: bool = True,
+                 backend: str | None = None,
+                 threaded_capture: bool = True,
+                 roi_tracking: bool = False,
+                 roi_max_size: int | None = None,
+                 capture_resolution: tuple | None = None,
+                 capture_fps: float | None = None,
+                 detection_scale: float = 1.,
+                 detect_every: int = 1,
+                 target_fps: float | None = None,
+                 smoothing: dict | None = None,
+                 instrumentation: dict | None = None,
+                 sinks: list | None = None,
+                 share_frames: bool = False,
+                 landmarks_overlay: bool = False,
+                 notify_connection: Connection | None = None) -> None:
         """
         Description
 
@@ -28,145 +101,336 @@ class HandVideoClassifier:
         Video Classifier based on Mediapipe hand landmarks using
         a given TensorFlow model and giving a real time prediction.
 
-        :param model_path: folder that contains the TensorFlow Model,
+        :param model_path: model file (.h5/.keras, .npz, .tflite or .onnx),
         :param stream_path: integer for camera usage (0 for main camera), string for video file,
         :param video_output: enables OpenCV video output,
         :param verbose: enables verbose mode,
-        :param labels_on_vid: list or array of labels to show on video output,
-        :param always_on_top: keeps video output in front of other apps.
+        :param labels_on_vid: list or array of labels to show on video output, labels of the model manifest if None,
+        :param always_on_top: keeps video output in front of other apps,
+        :param backend: inference backend ("keras", "numpy", "tflite" or "onnx"), guessed from model_path if None,
+        :param threaded_capture: decodes frames in a capture thread, detection always uses the newest frame
+        (older camera frames are dropped, video files frames are all processed),
+        :param roi_tracking: runs the detection on the region around the hands of the previous frame only,
+        the full frame is processed when the tracking is lost,
+        :param roi_max_size: longest side of the region fed to the detection, larger regions are downscaled,
+        :param capture_resolution: (width, height) requested to the camera, camera default if None,
+        :param capture_fps: frame rate requested to the camera, camera default if None,
+        :param detection_scale: downscale factor of the image fed to the detection,
+        :param detect_every: runs the detection every N frames, landmarks are extrapolated in between,
+        :param target_fps: enables the adaptive quality governor, which lowers the detection scale and frequency
+        when the loop cannot process target_fps frames per second and raises them back when it can,
+        :param smoothing: PredictionSmoother settings (ema_alpha, vote_window, enter_threshold, exit_threshold),
+        the published predictions are the smoothed classes, raw argmax if None,
+        :param instrumentation: enables the detection loop stats (see get_stats) with the settings flush_interval
+        (seconds between two stats updates, 0.25 by default), http_port and http_host (Prometheus /metrics and JSON
+        /stats endpoint, 127.0.0.1 by default) and udp_address and udp_interval ((host, port) receiving a JSON
+        datagram every udp_interval seconds, 1 by default), no instrumentation if None ({} for the stats only),
+        :param sinks: sink_minilib.FrameSink objects receiving the annotated frames, opened in the detection process.
+        Without video output and active sink, the frames are neither mirrored nor annotated (headless mode).
+        :param share_frames: publishes the annotated frames in a shared memory FrameBuffer created by the detection
+        process, read in place by other processes (see get_frame_buffer and GUI.set_camera),
+        :param landmarks_overlay: draws the hands landmarks on the annotated frames,
+        :param notify_connection: write end of a multiprocessing.Pipe(duplex=False), passed to the detection process
+        (with any start method), which writes one byte to it after each published frame, without blocking (dropped
+        when the pipe is full), used to wait for new results without polling.
         """
         self.__process = None
         self.__stream = None
-        self.__prediction_left = Value("i", -1)
-        self.__prediction_right = Value("i", -1)
-        self.left_center_coords_x = Value("i", -1)
-        self.left_center_coords_y = Value("i", -1)
-        self.right_center_coords_x = Value("i", -1)
-        self.right_center_coords_y = Value("i", -1)
+        self.__results = ResultBlock()
         self.__running = Value('i', 0)
         self.__video_output = video_output
         self.__verbose = verbose
         self.__stream_path = stream_path
         self.model_path = model_path
+        self.manifest = load_manifest(model_path)  # None if the model has no manifest
         self.labels = labels_on_vid
+        if self.labels is None and self.manifest is not None:
+            self.labels = self.manifest["labels"]
         self.always_on_top = always_on_top
-
-    def start(self) -> "HandVideoClassifier":
+        self.backend = backend
+        self.threaded_capture = threaded_capture
+        self.roi_tracking = roi_tracking
+        self.roi_max_size = roi_max_size
+        self.capture_resolution = capture_resolution
+        self.capture_fps = capture_fps
+        self.detection_scale = detection_scale
+        self.detect_every = detect_every
+        self.target_fps = target_fps
+        self.smoothing = smoothing
+        self.instrumentation = instrumentation
+        self.__stats = StatsBlock() if instrumentation is not None else None
+        self._exporters = []
+        self.sinks = list(sinks) if sinks is not None else []
+        self.share_frames = share_frames
+        self.landmarks_overlay = landmarks_overlay
+        self.notify_connection = notify_connection
+        self.frame_buffer_name = None  # Name of the FrameBuffer of the running subprocess
+        self._frame_buffer = None
+        self.startup_timings = {}
+
+    def start(self, timeout: float = STARTUP_TIMEOUT) -> "HandVideoClassifier":
         """
-        Detection process startup.
+        Detection process startup, blocks until the subprocess is ready without using the CPU.
 
+        :param timeout: maximum startup duration in seconds.
         :return: HandVideoClassifier object
         """
         if self.__verbose:
             print("INFO: Starting capture and detection ...")
-        self.__process = Process(target=self._mainloop_subprocess, args=(self.model_path, self.labels))
+        startup_receiver, startup_sender = Pipe(duplex=False)
+        self.__process = Process(target=self._mainloop_subprocess,
+                                 args=(self.model_path, self.labels, startup_sender))
         self.__process.start()
+        startup_sender.close()  # Only the subprocess keeps the sending end, EOF is received if it dies.
 
         spinner = Halo("INFO: Waiting for subprocess to be ready ", placement="right", spinner="dots")
         if self.__verbose:
             spinner.start()
 
-        while not self.is_running():
-            pass
+        try:
+            self.startup_timings, shared_blocks = wait_for_startup(self.__process, startup_receiver, timeout)
+        finally:
+            startup_receiver.close()
+            if self.__verbose:
+                spinner.stop()
 
-        if self.__verbose:
-            spinner.stop()
+        # Attached while the frame buffer is known to exist, this process then owns and unlinks it
+        self.frame_buffer_name = shared_blocks.get("frame_buffer")
+        self._frame_buffer = FrameBuffer(name=self.frame_buffer_name, create=False, owner=True) \
+            if self.frame_buffer_name is not None else None
 
         if self.__verbose:
             print("INFO: Process has started.")
+            for phase, duration in self.startup_timings.items():
+                print(f"INFO:   {phase:<8} {duration * 1000:8.1f} ms")
+
+        # Exporters threads run in this process, reading the stats block
+        if self.instrumentation is not None and self.instrumentation.get("http_port") is not None:
+            server = MetricsHttpServer(self.get_stats, self.instrumentation["http_port"],
+                                       self.instrumentation.get("http_host", "127.0.0.1")).start()
+            self._exporters.append(server)
+            if self.__verbose:
+                print(f"INFO: Metrics served on http://{server.address[0]}:{server.address[1]}/metrics")
+        if self.instrumentation is not None and self.instrumentation.get("udp_address") is not None:
+            self._exporters.append(UdpStatsSender(self.get_stats, self.instrumentation["udp_address"],
+                                                  self.instrumentation.get("udp_interval", 1.)).start())
 
         return self
 
-    def _mainloop_subprocess(self, model_path, labels):
+    def _mainloop_subprocess(self, model_path, labels, startup_sender):
         signal.signal(signal.SIGINT, lambda x, y: 0)
 
-        # Hands detection objects
-        mp_hands = mp.solutions.hands
-        hands = mp_hands.Hands(min_detection_confidence=0.9, max_num_hands=2)
-
-        # Model loading
-        model = models.load_model(model_path)
-
-        # Capture type definition
-        if type(self.__stream_path) == int:
-            self.__stream = cv2.VideoCapture(self.__stream_path, cv2.CAP_DSHOW)
-        else:
-            self.__stream = cv2.VideoCapture(self.__stream_path)
-
-        if labels is not None:
-            if model.layers[-1].output_shape[1] == len(labels):
-                self.labels = labels
-            else:
-                raise ValueError("The labels list must be of length {0}".format((model.layers[-1]).output_shape[1]))
+        timings = {}
+        try:
+            start_time = time.perf_counter()
+            import mediapipe as mp
+            timings["imports"] = time.perf_counter() - start_time
+
+            # Hands detection objects
+            start_time = time.perf_counter()
+            mp_hands = mp.solutions.hands
+            hands = mp_hands.Hands(min_detection_confidence=0.9, max_num_hands=2)
+            extractor = LandmarkExtractor(max_num_hands=2)
+            timings["hands"] = time.perf_counter() - start_time
+
+            # Model loading
+            start_time = time.perf_counter()
+            model = load_backend(model_path, self.backend)
+            model.warmup()
+            timings["model"] = time.perf_counter() - start_time
+
+            if model.n_classes > MAX_CLASSES:
+                raise ValueError(f"The model must have at most {MAX_CLASSES} outputs")
+            if self.manifest is not None and len(self.manifest["labels"]) != model.n_classes:
+                raise ValueError(f"The model manifest has {len(self.manifest['labels'])} labels "
+                                 f"for a model with {model.n_classes} outputs")
+            if labels is not None:
+                if model.n_classes == len(labels):
+                    self.labels = labels
+                else:
+                    raise ValueError("The labels list must be of length {0}".format(model.n_classes))
+            smoother = PredictionSmoother(model.n_classes, **self.smoothing) if self.smoothing is not None else None
+
+            # Capture type definition
+            start_time = time.perf_counter()
+            self.__stream = open_stream(self.__stream_path, self.capture_resolution, self.capture_fps)
+            timings["capture"] = time.perf_counter() - start_time
+
+            stream_size = (int(self.__stream.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.__stream.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            if self.share_frames:
+                # Created here as the frames size is only known once the stream is opened
+                # The block is handed over to the main process, which attaches to it before this process can exit
+                self.sinks.append(SharedFrameSink(owner=False))
+            for sink in self.sinks:
+                sink.open(stream_size, self.__stream.get(cv2.CAP_PROP_FPS) or None)
+            shared_blocks = {"frame_buffer": self.sinks[-1].name} if self.share_frames else {}
+        except Exception as e:
+            send_startup_error(startup_sender, e)
+            for sink in self.sinks:
+                sink.close()
+            if self.__stream is not None:
+                self.__stream.release()
+            return
+
+        # Raw non-blocking writes on the connection file descriptor, a full pipe never blocks the loop
+        notify_fd = self.notify_connection.fileno() if self.notify_connection is not None else None
+        if notify_fd is not None:
+            os.set_blocking(notify_fd, False)
 
         # Allowing main process to continue and finishing startup.
         self._set_running()
+        startup_sender.send(("ready", timings, shared_blocks))
+        startup_sender.close()
+
+        with self.__results.write() as record:
+            record["n_classes"] = model.n_classes
+
+        if self.threaded_capture:
+            capture = FrameGrabber(self.__stream, drop_frames=type(self.__stream_path) == int).start()
+        else:
+            capture = DirectCapture(self.__stream)
+        fps_counter = FpsCounter()
+        roi_tracker = RoiTracker(max_size=self.roi_max_size) if self.roi_tracking else None
+        extrapolator = LandmarkExtrapolator(max_num_hands=2)
+        if self.target_fps is not None:
+            governor = QualityGovernor(self.target_fps)
+            detection_scale, detect_every = governor.detection_scale, governor.detect_every
+        else:
+            governor = None
+            detection_scale, detect_every = self.detection_scale, self.detect_every
+        frames_since_detection = detect_every
+        stats = LoopStats(self.__stats, self.instrumentation.get("flush_interval", 0.25)) \
+            if self.__stats is not None else None
+        normalization = self.manifest["input"]["normalization"] if self.manifest is not None else "none"
+        features = np.zeros_like(extractor.landmarks)  # Model input, transformed landmarks
+        preds = None
+        classes = confidences = None
 
         # Main loop, stops when EOF, escape or user code asking detection shutdown.
         while self.is_running() and self.__stream.isOpened():
-            grabbed, src = self.__stream.read()
+            capture_start = time.perf_counter()
+            grabbed, frame_id, timestamp, src = capture.read()
             if not grabbed:
                 self.stop()
             else:
-                src = cv2.flip(src, 1)
-                rgb_src = cv2.cvtColor(src, cv2.COLOR_BGR2RGB)
-
-                # Detection
-                results = hands.process(rgb_src)
-                if results.multi_hand_landmarks and len(results.multi_hand_landmarks) == 2:
-                    coords_list = np.zeros((2, 21, 3), dtype=np.float32)
-                    for handLms, hand_id in zip(results.multi_hand_landmarks, [0, 1]):
-                        # Landmarks enumeration
-                        for nb, lm in enumerate(handLms.landmark):
-                            coords_list[hand_id, nb, :] = [lm.x, lm.y, lm.z]
-
-                    pred_left = model.predict(coords_list[0, :, :].reshape(1, 63), verbose=False)
-                    self.__prediction_left.value = np.argmax(pred_left)
-
-                    pred_right = model.predict(coords_list[1, :, :].reshape(1, 63), verbose=False)
-                    self.__prediction_right.value = np.argmax(pred_right)
-
-                    self.left_center_coords_x.value = int(results.multi_hand_landmarks[0].landmark[9].x
-                                                          * rgb_src.shape[1])
-                    self.left_center_coords_y.value = int(results.multi_hand_landmarks[0].landmark[9].y
-                                                          * rgb_src.shape[0])
-                    self.right_center_coords_x.value = int(results.multi_hand_landmarks[1].landmark[9].x
-                                                           * rgb_src.shape[1])
-                    self.right_center_coords_y.value = int(results.multi_hand_landmarks[1].landmark[9].y
-                                                           * rgb_src.shape[0])
+                processing_start = time.perf_counter()
+                detected = classified = False
+                # The frame is mirrored and annotated only if it is shown or sent to a sink
+                consumed = self.__video_output or any(sink.active for sink in self.sinks)
+                frame_size = (src.shape[1], src.shape[0])
+                if frames_since_detection < detect_every:
+                    # No detection on this frame, landmarks estimated from the previous detections
+                    n_hands = extrapolator.predict(extractor.landmarks, timestamp)
+                    if consumed:
+                        src = cv2.flip(src, 1)
+                    frames_since_detection += 1
                 else:
-                    self.__prediction_left.value = -1
-                    self.__prediction_right.value = -1
-
-                if self.__video_output:
+                    if roi_tracker is None:
+                        if consumed:
+                            src = cv2.flip(src, 1)
+                        rgb_src = src if detection_scale == 1 else \
+                            cv2.resize(src, None, fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_AREA)
+                        rgb_src = cv2.cvtColor(rgb_src, cv2.COLOR_BGR2RGB)
+
+                        # Detection
+                        n_hands = extractor.extract(hands.process(rgb_src))
+                        if not consumed:
+                            # Detection on the frame as captured, landmarks mirrored instead of the whole frame
+                            extractor.mirror()
+                    else:
+                        # Detection on the region of the previous hands, on the full frame if the tracking is lost
+                        n_hands = extractor.extract(hands.process(roi_tracker.prepare(src, scale=detection_scale)))
+                        if n_hands < 2 and roi_tracker.cropped:
+                            n_hands = extractor.extract(hands.process(roi_tracker.prepare(src, full_frame=True,
+                                                                                          scale=detection_scale)))
+                        roi_tracker.to_frame(extractor.landmarks, n_hands, frame_size)
+                        roi_tracker.update(extractor.landmarks, n_hands, frame_size)
+                        if consumed:
+                            src = cv2.flip(src, 1)
+                    extrapolator.add(extractor.landmarks, n_hands, timestamp)
+                    frames_since_detection = 1
+                    detected = True
+                    detection_end = time.perf_counter()
+
+                    if n_hands == 2:
+                        # Single inference call for both hands, batched as a (2, 63) tensor
+                        preds = model.predict(transform_landmarks(extractor.landmarks, normalization, out=features))
+                        classified = True
+                    else:
+                        preds = None
+                    if smoother is not None:
+                        classes, confidences = smoother.update(preds)
+                    inference_end = time.perf_counter()
+
+                # Publication of the whole frame result at once
+                publish_start = time.perf_counter()
+                self.__results.publish(frame_id, timestamp, frame_size,
+                                       extractor.landmarks, extractor.handedness, extractor.scores, preds,
+                                       dropped_frames=capture.dropped_frames, fps=fps_counter.tick(),
+                                       classes=classes, confidences=confidences)
+                if notify_fd is not None:
+                    try:
+                        os.write(notify_fd, b"\0")
+                    except OSError:
+                        pass  # Pipe full (the reader has pending notifications) or reader closed
+                publish_end = time.perf_counter()
+
+                if consumed:
+                    if self.landmarks_overlay:
+                        draw_landmarks(src, extractor.landmarks, n_hands)
                     if self.labels:
-                        if self.__prediction_left.value != -1:
-                            cv2.putText(src, self.labels[self.__prediction_left.value],
-                                        org=(self.left_center_coords_x.value, self.left_center_coords_y.value),
-                                        fontFace=cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                                        fontScale=1, color=(255, 255, 255), thickness=1)
-                        if self.__prediction_right.value != -1:
-                            cv2.putText(src, self.labels[self.__prediction_right.value],
-                                        org=(self.right_center_coords_x.value, self.right_center_coords_y.value),
-                                        fontFace=cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                                        fontScale=1, color=(255, 255, 255), thickness=1)
-                    cv2.imshow("Video Output", src)
-                    if self.always_on_top:
-                        cv2.setWindowProperty("Video Output", cv2.WND_PROP_TOPMOST, 1)
-                    if cv2.waitKey(1) & 0xFF == 27:
-                        break
-
+                        # Only this process writes the block, the record is read directly
+                        predictions = self.__results.record["predictions"].tolist()
+                        centers = self.__results.record["centers"].tolist()
+                        for prediction, center in zip(predictions, centers):
+                            if prediction != -1:
+                                cv2.putText(src, self.labels[prediction],
+                                            org=center,
+                                            fontFace=cv2.FONT_HERSHEY_COMPLEX_SMALL,
+                                            fontScale=1, color=(255, 255, 255), thickness=1)
+                    for sink in self.sinks:
+                        if sink.active:
+                            sink.write(src, frame_id, timestamp)
+                    if self.__video_output:
+                        cv2.imshow("Video Output", src)
+                        if self.always_on_top:
+                            cv2.setWindowProperty("Video Output", cv2.WND_PROP_TOPMOST, 1)
+                        if cv2.waitKey(1) & 0xFF == 27:
+                            break
+
+                if stats is not None:
+                    frame_end = time.perf_counter()
+                    stats.add("capture", processing_start - capture_start)
+                    if detected:
+                        stats.add("detection", detection_end - processing_start)
+                        if classified:
+                            stats.add("inference", inference_end - detection_end)
+                    stats.add("publish", publish_end - publish_start)
+                    if consumed:
+                        stats.add("display", frame_end - publish_end)
+                    stats.add("frame", frame_end - processing_start)
+                    stats.frame(detected, n_hands, classified, capture.dropped_frames, fps_counter.fps)
+
+                if governor is not None:
+                    detection_scale, detect_every = governor.update(time.perf_counter() - processing_start)
+
+        if stats is not None:
+            stats.flush()
+        for sink in self.sinks:
+            sink.close()
+        capture.stop()
         self.__stream.release()
         if self.is_running():
             self.stop()
 
     def get_predictions(self) -> tuple:
         """
-        Returns the argmax of the classifier output for both hands
+        Returns the argmax of the classifier output for both hands, or the smoothed classes if smoothing is enabled
 
         :return: Classifier Output, -1 if no class was detected.
         """
-        return self.__prediction_left.value, self.__prediction_right.value
+        return tuple(self.__results.read_field("predictions").tolist())
 
     def get__hands_coords(self) -> list:
         """
@@ -174,8 +438,51 @@ class HandVideoClassifier:
 
         :return: Hands coords in frame.
         """
-        return [[self.left_center_coords_x.value, self.left_center_coords_y.value],
-                [self.right_center_coords_x.value, self.right_center_coords_y.value]]
+        return self.__results.read_field("centers").tolist()
+
+    def get_results(self) -> np.ndarray:
+        """
+        Returns a consistent snapshot of the last published frame results, read at once:
+        frame_id (capture index, -1 before the first frame), timestamp (time.monotonic() at capture),
+        dropped_frames (camera frames skipped because detection was busy), fps, n_classes,
+        predictions (smoothed classes if smoothing is enabled), confidences, centers,
+        probabilities (raw classifier output, only the n_classes first columns are used) and landmarks.
+
+        :return: 0-d structured array, fields are accessed by name (snapshot["predictions"]).
+        """
+        return self.__results.read()
+
+    def get_frame_id(self) -> int:
+        """
+        Returns the index of the last published frame, used to skip frames that were already processed.
+
+        :return: Frame index, -1 before the first frame.
+        """
+        return int(self.__results.read_field("frame_id"))
+
+    def get_stats(self) -> dict | None:
+        """
+        Returns the detection loop stats, updated by the subprocess every flush_interval seconds:
+        uptime, age (seconds since the last update), frames, detections, classified, hands_frames and dropped_frames
+        counters, fps, hands_rate (smoothed fraction of the detection frames with hands),
+        stages (last_ms, mean_ms, count and total_s of the capture, detection, inference, publish, display and frame
+        stages) and inference_histogram (number of inferences per duration bucket, by upper bound in ms).
+
+        :return: stats dictionary, None if the instrumentation is disabled.
+        """
+        if self.__stats is None:
+            return None
+        return stats_to_dict(self.__stats.read())
+
+    def get_frame_buffer(self) -> FrameBuffer | None:
+        """
+        Returns the shared memory buffer of the annotated frames, attached by start.
+        Frames are read in place with latest() and is_valid(), or copied with read().
+        The buffer keeps the last frame after stop, it is released with this object or by the next start.
+
+        :return: FrameBuffer object, None if share_frames is disabled or the process was not started.
+        """
+        return self._frame_buffer
 
     def _set_running(self):
         self.__running.value = 1
@@ -199,6 +506,9 @@ class HandVideoClassifier:
             raise Exception("Cannot stop : no process is running")
 
         self.__running.value = 0
+        for exporter in self._exporters:
+            exporter.close()
+        self._exporters = []
 
         if self.__verbose:
             print("INFO: Subprocess terminated.")
@@ -0,0 +1,80 @@
+from __future__ import annotations
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+import cv2
+
+N_LANDMARKS = 21  # Mediapipe hand landmarks count
+HANDEDNESS_LABELS = ("Left", "Right")  # Handedness index used in LandmarkExtractor.handedness
+HAND_CONNECTIONS = ((0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10), (10, 11),
+                    (11, 12), (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17), (17, 18), (18, 19),
+                    (19, 20))  # Mediapipe hand skeleton, pairs of landmark indices
+HANDS_COLORS = ((127, 127, 0), (0, 127, 127))  # BGR color of each hand, same as the GUI hands cursors
+
+_CONNECTIONS = np.array(HAND_CONNECTIONS, dtype=np.intp)
+
+_XYZ = attrgetter("x", "y", "z")
+
+
+class LandmarkExtractor:
+    def __init__(self, max_num_hands: int = 2) -> None:
+        """
+        Converts Mediapipe hands results into preallocated arrays reused across frames.
+        The arrays are overwritten by each call to extract, copy them to keep the values.
+        :param max_num_hands: maximum number of hands extracted, same as the Hands object setting.
+        """
+        self.max_num_hands = max_num_hands
+        self.landmarks = np.zeros((max_num_hands, N_LANDMARKS, 3), dtype=np.float32)
+        self.handedness = np.full(max_num_hands, -1, dtype=np.int8)  # Index in HANDEDNESS_LABELS, -1 if no hand
+        self.scores = np.zeros(max_num_hands, dtype=np.float32)
+        self.n_hands = 0
+        self._flat_landmarks = self.landmarks.reshape(max_num_hands, N_LANDMARKS * 3)
+
+    def extract(self, results) -> int:
+        """
+        Fills the landmarks, handedness and scores arrays from the output of Hands.process.
+        The landmarks of the rows after the number of detected hands are left unchanged.
+        :param results: Mediapipe hands results.
+        :return: number of detected hands.
+        """
+        hands = results.multi_hand_landmarks or ()
+        self.n_hands = min(len(hands), self.max_num_hands)
+
+        for hand_id in range(self.n_hands):
+            # Single C-level iteration over the landmarks attributes, without per-landmark temporary lists
+            self._flat_landmarks[hand_id] = np.fromiter(chain.from_iterable(map(_XYZ, hands[hand_id].landmark)),
+                                                        dtype=np.float32, count=N_LANDMARKS * 3)
+
+        if results.multi_handedness:
+            for hand_id in range(self.n_hands):
+                classification = results.multi_handedness[hand_id].classification[0]
+                self.handedness[hand_id] = HANDEDNESS_LABELS.index(classification.label)
+                self.scores[hand_id] = classification.score
+        self.handedness[self.n_hands:] = -1
+        self.scores[self.n_hands:] = 0
+
+        return self.n_hands
+
+    def mirror(self) -> None:
+        """
+        Mirrors the detected hands horizontally, giving the results of a detection on the mirrored frame
+        without mirroring the frame: x coordinates become 1 - x and the Left and Right handedness are swapped.
+        """
+        np.subtract(1, self.landmarks[:self.n_hands, :, 0], out=self.landmarks[:self.n_hands, :, 0])
+        np.subtract(1, self.handedness[:self.n_hands], out=self.handedness[:self.n_hands])
+
+
+def draw_landmarks(src: np.ndarray, landmarks: np.ndarray, n_hands: int) -> None:
+    """
+    Draws the hands skeletons on a frame, each hand in a single polylines call.
+    :param src: BGR frame, modified in place.
+    :param landmarks: (hands, 21, 3) landmarks, x and y normalized to the frame size.
+    :param n_hands: number of hands to draw.
+    """
+    height, width = src.shape[:2]
+    for hand_id in range(n_hands):
+        points = (landmarks[hand_id, :, :2] * (width, height)).astype(np.int32)
+        cv2.polylines(src, list(points[_CONNECTIONS]), isClosed=False, color=HANDS_COLORS[hand_id % 2],
+                      thickness=2, lineType=cv2.LINE_AA)
+        for x, y in points.tolist():
+            cv2.circle(src, (x, y), radius=3, color=(255, 255, 255), thickness=-1)
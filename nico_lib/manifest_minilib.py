@@ -0,0 +1,182 @@
+from __future__ import annotations
+import argparse
+import datetime
+import hashlib
+import json
+import os
+
+from nico_lib.backend_minilib import backend_from_path
+from nico_lib.features_minilib import NORMALIZATIONS
+
+MANIFEST_VERSION = 1
+N_FEATURES = 63
+
+
+def manifest_path(model_path: str) -> str:
+    """
+    Returns the manifest file path of a model, shared by all the exported formats of the model
+    (model.h5, model.npz and model.tflite use model.manifest.json).
+    :param model_path: model file path.
+    :return: manifest file path.
+    """
+    return os.path.splitext(model_path)[0] + ".manifest.json"
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 digest of a file.
+    :param path: file path.
+    :param chunk_size: read size in bytes.
+    :return: hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(model_path: str,
+                   labels: list,
+                   data_path: str | None = None,
+                   files_names: list | None = None,
+                   samples: list | None = None,
+                   normalization: str = "none") -> dict:
+    """
+    Writes the manifest of a trained model: ordered labels (the label of output i is labels[i]),
+    hashes of the dataset files, input normalization and model files formats.
+    :param model_path: trained model file path.
+    :param labels: class names, in the order of the model outputs.
+    :param data_path: dataset folder, no dataset information if None.
+    :param files_names: dataset CSV file of each class.
+    :param samples: number of samples of each class.
+    :param normalization: one of features_minilib.NORMALIZATIONS.
+    :return: manifest dictionary.
+    """
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization <{normalization}>, use one of {NORMALIZATIONS}")
+    manifest = {"version": MANIFEST_VERSION,
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "labels": list(labels),
+                "input": {"n_features": N_FEATURES, "normalization": normalization},
+                "formats": {os.path.basename(model_path): backend_from_path(model_path)}}
+    if data_path is not None:
+        manifest["dataset"] = {label: {"file": file_name,
+                                       "sha256": hash_file(os.path.join(data_path, file_name)),
+                                       "samples": None if samples is None else int(samples[i])}
+                               for i, (label, file_name) in enumerate(zip(labels, files_names))}
+    _save(manifest, manifest_path(model_path))
+    return manifest
+
+
+def add_model_format(model_path: str, manifest: dict | None = None) -> dict | None:
+    """
+    Registers an exported model file in the manifest shared with the trained model.
+    :param model_path: exported model file path.
+    :param manifest: manifest of the trained model, read from the manifest file if None.
+    :return: updated manifest, None if the model has no manifest.
+    """
+    if manifest is None:
+        manifest = load_manifest(model_path)
+        if manifest is None:
+            return None
+    manifest["formats"][os.path.basename(model_path)] = backend_from_path(model_path)
+    _save(manifest, manifest_path(model_path))
+    return manifest
+
+
+def write_variant_manifest(model_path: str, variant_path: str, compression: dict,
+                           manifest: dict | None = None) -> dict:
+    """
+    Writes the manifest of a compressed variant of a trained model (same labels, input normalization and dataset)
+    and lists the variant in the manifest of the trained model, so that the variant can be loaded on its own.
+    :param model_path: trained model file path.
+    :param variant_path: variant model file path.
+    :param compression: compression method, parameters and evaluation results.
+    :param manifest: manifest of the trained model, read from the manifest file if None.
+    :return: manifest of the variant.
+    """
+    if manifest is None:
+        manifest = load_manifest(model_path)
+        if manifest is None:
+            raise FileNotFoundError(f"No manifest found for <{model_path}> ({manifest_path(model_path)})")
+    variant = {key: value for key, value in manifest.items() if key != "variants"}
+    variant["created"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    variant["formats"] = {os.path.basename(variant_path): backend_from_path(variant_path)}
+    variant["compression"] = dict(compression, base=os.path.basename(model_path))
+    _save(variant, manifest_path(variant_path))
+
+    manifest.setdefault("variants", {})[os.path.basename(variant_path)] = compression
+    _save(manifest, manifest_path(model_path))
+    return variant
+
+
+def _save(manifest: dict, path: str) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="UTF8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def load_manifest(model_path: str, n_classes: int | None = None) -> dict | None:
+    """
+    Reads and validates the manifest of a model.
+    :param model_path: model file path.
+    :param n_classes: number of model outputs, checked against the labels if not None.
+    :return: manifest dictionary, None if the model has no manifest.
+    """
+    path = manifest_path(model_path)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="UTF8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in <{path}>")
+    if manifest["input"]["normalization"] not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization <{manifest['input']['normalization']}> in <{path}>")
+    if n_classes is not None and len(manifest["labels"]) != n_classes:
+        raise ValueError(f"The manifest <{path}> has {len(manifest['labels'])} labels "
+                         f"for a model with {n_classes} outputs")
+    return manifest
+
+
+def check_dataset(manifest: dict, data_path: str) -> list:
+    """
+    Compares the dataset files with the hashes recorded at training time.
+    :param manifest: manifest dictionary.
+    :param data_path: dataset folder.
+    :return: labels whose file is missing or changed since the training.
+    """
+    changed = []
+    for label, entry in manifest.get("dataset", {}).items():
+        path = os.path.join(data_path, entry["file"])
+        if not os.path.isfile(path) or hash_file(path) != entry["sha256"]:
+            changed.append(label)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the manifest of a model and check its dataset")
+    parser.add_argument("model_path", help="Model file (.h5/.keras, .npz, .tflite or .onnx)")
+    parser.add_argument("--data_path", default=None, help="Dataset folder to compare with the training dataset")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.model_path)
+    if manifest is None:
+        raise FileNotFoundError(f"No manifest found for <{args.model_path}> ({manifest_path(args.model_path)})")
+    for index, label in enumerate(manifest["labels"]):
+        print(f"INFO: {index:>3} : {label}")
+    print(f"INFO: Normalization : {manifest['input']['normalization']}, formats : {manifest['formats']}")
+    if "compression" in manifest:
+        print(f"INFO: Compressed variant of {manifest['compression']['base']} : {manifest['compression']}")
+    for variant, compression in manifest.get("variants", {}).items():
+        print(f"INFO: Variant {variant} : {compression}")
+    if args.data_path is not None:
+        changed = check_dataset(manifest, args.data_path)
+        print("INFO: Dataset unchanged since training" if not changed else
+              f"INFO: Classes changed since training : {changed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import datetime
+import json
+import time
+import numpy as np
+
+RESULTS_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimer:
+    def __init__(self, capacity: int = 4096) -> None:
+        """
+        Records the duration of each processing stage of every frame, in preallocated arrays, for percentiles.
+        Stages are timed with lap, which takes the start time and returns the end time, the start of the next stage:
+        t = time.perf_counter(); ...; t = timer.lap("decode", t); ...; t = timer.lap("inference", t)
+        :param capacity: initial number of durations per stage, doubled when full.
+        """
+        self.capacity = capacity
+        self._durations = {}  # Stage name: durations in seconds array
+        self._counts = {}  # Stage name: number of recorded durations
+
+    def add(self, stage: str, duration: float) -> None:
+        """
+        Records a duration.
+        :param stage: stage name, stages are reported in the order of their first duration.
+        :param duration: duration in seconds.
+        """
+        durations = self._durations.get(stage)
+        if durations is None:
+            durations = self._durations[stage] = np.empty(self.capacity, dtype=np.float64)
+            self._counts[stage] = 0
+        count = self._counts[stage]
+        if count == durations.shape[0]:
+            durations = self._durations[stage] = np.concatenate((durations, np.empty_like(durations)))
+        durations[count] = duration
+        self._counts[stage] = count + 1
+
+    def lap(self, stage: str, start: float) -> float:
+        """
+        Records the duration of a stage ending now.
+        :param stage: stage name.
+        :param start: time.perf_counter() at the start of the stage.
+        :return: time.perf_counter() at the end of the stage.
+        """
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def reset(self) -> None:
+        """
+        Forgets the recorded durations (after warm-up frames for example), keeping the allocated arrays.
+        """
+        for stage in self._counts:
+            self._counts[stage] = 0
+
+    def durations(self, stage: str) -> np.ndarray:
+        """
+        Returns the recorded durations of a stage.
+        :param stage: stage name.
+        :return: durations in seconds.
+        """
+        return self._durations[stage][:self._counts.get(stage, 0)]
+
+    def summary(self) -> dict:
+        """
+        Returns the statistics of each stage: number of durations, mean, p50, p95, p99 and max in milliseconds,
+        and fps, the rate the stage alone could sustain.
+        :return: {stage: statistics}.
+        """
+        stages = {}
+        for stage, count in self._counts.items():
+            if count == 0:
+                continue
+            durations = self.durations(stage) * 1e3
+            stats = {"count": count, "mean_ms": float(durations.mean())}
+            for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+                stats[f"p{percentile}_ms"] = float(value)
+            stats["max_ms"] = float(durations.max())
+            stats["fps"] = 1e3 / stats["mean_ms"] if stats["mean_ms"] > 0 else float("inf")
+            stages[stage] = stats
+        return stages
+
+
+def make_results(timer: StageTimer, config: dict, frame_stage: str = "frame") -> dict:
+    """
+    Builds the results of a benchmark run, saved with save_results.
+    :param timer: StageTimer of the run.
+    :param config: run parameters, recorded as is.
+    :param frame_stage: stage timing the whole processing of a frame, giving the frames count and fps.
+    :return: results dictionary.
+    """
+    stages = timer.summary()
+    frame = stages.get(frame_stage, {"count": 0, "fps": 0.})
+    return {"version": RESULTS_VERSION,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "config": config,
+            "frames": frame["count"],
+            "fps": frame["fps"],
+            "stages": stages}
+
+
+def save_results(results: dict, path: str) -> None:
+    """
+    Writes benchmark results to a JSON file.
+    :param results: make_results dictionary.
+    :param path: JSON file path.
+    """
+    with open(path, "w", encoding="UTF8") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path: str) -> dict:
+    """
+    Reads benchmark results from a JSON file.
+    :param path: JSON file path.
+    :return: results dictionary.
+    """
+    with open(path, "r", encoding="UTF8") as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version in <{path}>")
+    return results
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.1,
+                    metrics: tuple = ("p50_ms", "p95_ms")) -> tuple:
+    """
+    Compares the stages timings of two runs.
+    :param baseline: reference results.
+    :param current: new results.
+    :param tolerance: relative increase of a timing above which it is a regression.
+    :param metrics: compared statistics.
+    :return: (table rows with a header row, list of the "stage metric" regressions).
+    """
+    rows = [["Stage", "Metric", "Baseline", "Current", "Change"]]
+    regressions = []
+    for stage, stats in current["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        for metric in metrics:
+            before, after = baseline["stages"][stage][metric], stats[metric]
+            change = after / before - 1 if before > 0 else 0.
+            regressed = change > tolerance
+            if regressed:
+                regressions.append(f"{stage} {metric}")
+            rows.append([stage, metric, f"{before:.3f}", f"{after:.3f}",
+                         f"{change:+.1%}" + (" REGRESSION" if regressed else "")])
+    return rows, regressions
+
+
+def summary_table(results: dict) -> list:
+    """
+    Formats the stages statistics of a run for tabulate.
+    :param results: make_results dictionary.
+    :return: list of table rows, the first one being the header.
+    """
+    rows = [["Stage", "Count", "Mean (ms)"] + [f"p{p} (ms)" for p in PERCENTILES] + ["Max (ms)", "FPS"]]
+    for stage, stats in results["stages"].items():
+        rows.append([stage, stats["count"], f"{stats['mean_ms']:.3f}"]
+                    + [f"{stats[f'p{p}_ms']:.3f}" for p in PERCENTILES]
+                    + [f"{stats['max_ms']:.3f}", f"{stats['fps']:.1f}"])
+    return rows
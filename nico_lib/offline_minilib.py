@@ -0,0 +1,348 @@
+from __future__ import annotations
+import csv
+import os
+import shutil
+import tempfile
+import zipfile
+from multiprocessing import Pool
+import numpy as np
+import cv2
+
+from nico_lib.backend_minilib import load_backend
+from nico_lib.features_minilib import transform_landmarks
+from nico_lib.landmarks_minilib import N_LANDMARKS, LandmarkExtractor
+from nico_lib.manifest_minilib import load_manifest
+
+OUTPUT_FORMATS = (".csv", ".parquet", ".npz")
+
+
+def iter_video_results(video_path: str,
+                       model,
+                       start_frame: int = 0,
+                       end_frame: int | None = None,
+                       batch_size: int = 256,
+                       flip: bool = True,
+                       normalization: str = "none"):
+    """
+    Decodes a video file as fast as possible and classifies every detected hand,
+    the landmarks of batch_size frames being classified in a single inference call.
+    Unlike HandVideoClassifier, hands are classified even when a single hand is detected.
+    :param video_path: video file path.
+    :param model: InferenceBackend object.
+    :param start_frame: index of the first frame.
+    :param end_frame: index after the last frame, end of the video if None.
+    :param batch_size: number of frames per batch.
+    :param flip: mirrors the frames like the real-time classifier does before detection.
+    :param normalization: input transform of the model, from its manifest.
+    :return: generator of dictionaries of arrays, one row per frame: frame, timestamp (seconds in video),
+    n_hands, handedness (-1 if no hand), scores, landmarks, probabilities (NaN if no hand) and predictions (-1).
+    """
+    import mediapipe as mp
+
+    hands = mp.solutions.hands.Hands(min_detection_confidence=0.9, max_num_hands=2)
+    extractor = LandmarkExtractor(max_num_hands=2)
+    stream = cv2.VideoCapture(video_path)
+    if not stream.isOpened():
+        raise IOError(f"Cannot open video file <{video_path}>")
+    if start_frame > 0:
+        stream.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if end_frame is None:
+        # Read until the end of the stream, the frame count of many containers is 0 or approximate
+        end_frame = float("inf")
+
+    # Batch buffers, reused for each batch
+    frames = np.zeros(batch_size, dtype=np.int64)
+    timestamps = np.zeros(batch_size, dtype=np.float64)
+    n_hands = np.zeros(batch_size, dtype=np.int8)
+    handedness = np.zeros((batch_size, 2), dtype=np.int8)
+    scores = np.zeros((batch_size, 2), dtype=np.float32)
+    landmarks = np.zeros((batch_size, 2, N_LANDMARKS, 3), dtype=np.float32)
+
+    frame_id = start_frame
+    try:
+        while frame_id < end_frame:
+            size = 0
+            while size < batch_size and frame_id < end_frame:
+                grabbed, src = stream.read()
+                if not grabbed:
+                    end_frame = frame_id
+                    break
+                if flip:
+                    src = cv2.flip(src, 1)
+                frames[size] = frame_id
+                timestamps[size] = stream.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                n_hands[size] = extractor.extract(hands.process(cv2.cvtColor(src, cv2.COLOR_BGR2RGB)))
+                handedness[size] = extractor.handedness
+                scores[size] = extractor.scores
+                landmarks[size] = extractor.landmarks
+                landmarks[size, n_hands[size]:] = np.nan
+                size += 1
+                frame_id += 1
+            if size == 0:
+                break
+
+            # Single inference call for all the hands of the batch
+            detected = np.arange(2) < n_hands[:size, None]
+            probabilities = np.full((size, 2, model.n_classes), np.nan, dtype=np.float32)
+            if detected.any():
+                probabilities[detected] = model.predict(transform_landmarks(landmarks[:size][detected], normalization))
+            predictions = np.where(detected, np.argmax(np.nan_to_num(probabilities, nan=-1), axis=-1), -1)
+
+            yield {"frame": frames[:size].copy(),
+                   "timestamp": timestamps[:size].copy(),
+                   "n_hands": n_hands[:size].copy(),
+                   "handedness": handedness[:size].copy(),
+                   "scores": scores[:size].copy(),
+                   "landmarks": landmarks[:size].copy(),
+                   "probabilities": probabilities,
+                   "predictions": predictions.astype(np.int32)}
+    finally:
+        stream.release()
+        hands.close()
+
+
+class ResultWriter:
+    def __init__(self, output_path: str, labels: list | None = None) -> None:
+        """
+        Base class for per-frame results output, the write_batch function needs to be implemented in the subclass.
+        :param output_path: output file path.
+        :param labels: class names used in the columns names, class indexes if None.
+        """
+        self.output_path = output_path
+        self.labels = labels
+
+    def columns(self, n_classes: int) -> list:
+        """
+        Returns the flat columns names, in the order of flatten_batch.
+        :param n_classes: number of model outputs.
+        :return: list of columns names.
+        """
+        labels = self.labels if self.labels is not None else [str(c) for c in range(n_classes)]
+        columns = ["frame", "timestamp", "n_hands"]
+        for hand in range(2):
+            columns += [f"handedness_{hand}", f"score_{hand}", f"prediction_{hand}"]
+            columns += [f"proba_{hand}_{label}" for label in labels]
+            columns += [f"lm_{hand}_{i}_{axis}" for i in range(N_LANDMARKS) for axis in "xyz"]
+        return columns
+
+    @staticmethod
+    def flatten_batch(batch: dict) -> list:
+        """
+        Returns the batch as a list of columns, in the order of columns.
+        :param batch: batch of results from iter_video_results.
+        :return: list of 1D arrays.
+        """
+        size = batch["frame"].shape[0]
+        columns = [batch["frame"], batch["timestamp"], batch["n_hands"]]
+        for hand in range(2):
+            columns += [batch["handedness"][:, hand], batch["scores"][:, hand], batch["predictions"][:, hand]]
+            columns += list(batch["probabilities"][:, hand].T)
+            columns += list(batch["landmarks"][:, hand].reshape(size, -1).T)
+        return columns
+
+    def write_batch(self, batch: dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class CsvResultWriter(ResultWriter):
+    def __init__(self, output_path: str, labels: list | None = None) -> None:
+        super().__init__(output_path, labels)
+        self._file = open(output_path, "w", encoding="UTF8", newline="")
+        self._writer = csv.writer(self._file)
+        self._header_written = False
+
+    def write_batch(self, batch: dict) -> None:
+        if not self._header_written:
+            self._writer.writerow(self.columns(batch["probabilities"].shape[-1]))
+            self._header_written = True
+        self._writer.writerows(zip(*(column.tolist() for column in self.flatten_batch(batch))))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    def __init__(self, output_path: str, labels: list | None = None) -> None:
+        """
+        Parquet output, requires the pyarrow package.
+        """
+        super().__init__(output_path, labels)
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._writer_class = pyarrow.parquet.ParquetWriter
+        self._writer = None
+
+    def write_batch(self, batch: dict) -> None:
+        table = self._pa.table(dict(zip(self.columns(batch["probabilities"].shape[-1]), self.flatten_batch(batch))))
+        if self._writer is None:
+            self._writer = self._writer_class(self.output_path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class NumpyResultWriter(ResultWriter):
+    def __init__(self, output_path: str, labels: list | None = None) -> None:
+        """
+        NumPy .npz output keeping the arrays shapes. Each batch is appended to one temporary raw file per array,
+        streamed into the archive when the writer is closed, so the memory use does not grow with the video length.
+        """
+        super().__init__(output_path, labels)
+        self._spill_dir = None
+        self._spills = {}  # Array name: (raw file, dtype, shape of a row)
+        self._rows = 0
+
+    def write_batch(self, batch: dict) -> None:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="npz_writer_",
+                                               dir=os.path.dirname(os.path.abspath(self.output_path)))
+            for key, array in batch.items():
+                self._spills[key] = (open(os.path.join(self._spill_dir, f"{key}.raw"), "wb"), array.dtype,
+                                     array.shape[1:])
+        for key, array in batch.items():
+            self._spills[key][0].write(np.ascontiguousarray(array, dtype=self._spills[key][1]).data)
+        self._rows += batch["frame"].shape[0]
+
+    def close(self) -> None:
+        try:
+            # Same layout as np.savez: one uncompressed .npy entry per array
+            with zipfile.ZipFile(self.output_path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for key, (spill, dtype, row_shape) in self._spills.items():
+                    spill.close()
+                    with archive.open(f"{key}.npy", "w", force_zip64=True) as entry, open(spill.name, "rb") as raw:
+                        np.lib.format.write_array_header_1_0(entry, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                                     "fortran_order": False,
+                                                                     "shape": (self._rows,) + row_shape})
+                        shutil.copyfileobj(raw, entry, 1 << 20)
+                if self.labels is not None:
+                    with archive.open("labels.npy", "w", force_zip64=True) as entry:
+                        np.lib.format.write_array(entry, np.array(self.labels))
+        finally:
+            for spill, _, _ in self._spills.values():
+                spill.close()
+            if self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+
+def open_writer(output_path: str, labels: list | None = None) -> ResultWriter:
+    """
+    Creates the results writer matching the output file extension.
+    :param output_path: .csv, .parquet or .npz file path.
+    :param labels: class names used in the columns names, class indexes if None.
+    :return: ResultWriter object.
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension == ".csv":
+        return CsvResultWriter(output_path, labels)
+    elif extension == ".parquet":
+        return ParquetResultWriter(output_path, labels)
+    elif extension == ".npz":
+        return NumpyResultWriter(output_path, labels)
+    raise ValueError(f"Unsupported output format <{extension}>, use one of {OUTPUT_FORMATS}")
+
+
+def classify_video(video_path: str,
+                   model_path: str,
+                   output_path: str,
+                   start_frame: int = 0,
+                   end_frame: int | None = None,
+                   batch_size: int = 256,
+                   backend: str | None = None,
+                   labels: list | None = None,
+                   flip: bool = True) -> int:
+    """
+    Classifies the hands of every frame of a video file and writes the per-frame results.
+    :param video_path: video file path.
+    :param model_path: model file (.h5/.keras, .npz, .tflite or .onnx).
+    :param output_path: .csv, .parquet or .npz file path.
+    :param start_frame: index of the first frame.
+    :param end_frame: index after the last frame, end of the video if None.
+    :param batch_size: number of frames per inference call.
+    :param backend: inference backend, guessed from model_path if None.
+    :param labels: class names used in the columns names, labels of the model manifest if None.
+    :param flip: mirrors the frames like the real-time classifier does before detection.
+    :return: number of processed frames.
+    """
+    model = load_backend(model_path, backend)
+    manifest = load_manifest(model_path, n_classes=model.n_classes)
+    if labels is None and manifest is not None:
+        labels = manifest["labels"]
+    normalization = manifest["input"]["normalization"] if manifest is not None else "none"
+    n_frames = 0
+    with open_writer(output_path, labels) as writer:
+        for batch in iter_video_results(video_path, model, start_frame, end_frame, batch_size, flip, normalization):
+            writer.write_batch(batch)
+            n_frames += batch["frame"].shape[0]
+    return n_frames
+
+
+def _classify_range(args: tuple) -> int:
+    return classify_video(*args)
+
+
+def classify_video_parallel(video_path: str,
+                            model_path: str,
+                            output_path: str,
+                            n_jobs: int | None = None,
+                            start_frame: int = 0,
+                            end_frame: int | None = None,
+                            batch_size: int = 256,
+                            backend: str | None = None,
+                            labels: list | None = None,
+                            flip: bool = True) -> int:
+    """
+    Same as classify_video, the frames range being split into contiguous chunks processed by n_jobs processes.
+    The hands tracking restarts at the beginning of each chunk.
+    Without end_frame, the chunks are split on the frame count of the container and the last chunk is read until
+    the end of the stream, the count being approximate for some formats. The video is processed by a single job
+    if the container has no frame count.
+    :param n_jobs: number of processes, number of cores if None.
+    :return: number of processed frames.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    last_frame = end_frame
+    if end_frame is None:
+        stream = cv2.VideoCapture(video_path)
+        if not stream.isOpened():
+            raise IOError(f"Cannot open video file <{video_path}>")
+        last_frame = int(stream.get(cv2.CAP_PROP_FRAME_COUNT))
+        stream.release()
+        if last_frame <= start_frame:
+            return classify_video(video_path, model_path, output_path, start_frame, None, batch_size, backend,
+                                  labels, flip)
+    if labels is None:
+        manifest = load_manifest(model_path)
+        labels = manifest["labels"] if manifest is not None else None
+    bounds = np.linspace(start_frame, last_frame, n_jobs + 1).astype(int).tolist()
+    bounds[-1] = end_frame  # None reads the last chunk until the end of the stream
+
+    part_dir = tempfile.mkdtemp(prefix="classify_video_")
+    try:
+        parts = [os.path.join(part_dir, f"part_{i}.npz") for i in range(n_jobs)]
+        with Pool(n_jobs) as pool:
+            pool.map(_classify_range, [(video_path, model_path, part, first, last, batch_size, backend, None, flip)
+                                       for part, first, last in zip(parts, bounds[:-1], bounds[1:])])
+
+        # Parts are merged in frames order
+        n_frames = 0
+        with open_writer(output_path, labels) as writer:
+            for part in parts:
+                with np.load(part) as data:
+                    if "frame" in data and data["frame"].shape[0] > 0:
+                        writer.write_batch({key: data[key] for key in data.files if key != "labels"})
+                        n_frames += data["frame"].shape[0]
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return n_frames
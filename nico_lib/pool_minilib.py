@@ -0,0 +1,250 @@
+from __future__ import annotations
+import os
+import signal
+import threading
+import time
+from multiprocessing import Array, Pipe, Process, Value
+import numpy as np
+import cv2
+
+from nico_lib.backend_minilib import InferenceBackend, load_backend
+from nico_lib.capture_minilib import FpsCounter, FrameGrabber, open_stream
+from nico_lib.features_minilib import transform_landmarks
+from nico_lib.hvc_minilib import STARTUP_TIMEOUT, send_startup_error, wait_for_startup
+from nico_lib.landmarks_minilib import LandmarkExtractor
+from nico_lib.manifest_minilib import load_manifest
+from nico_lib.shm_minilib import MAX_CLASSES, ResultBlock
+
+
+class HandVideoClassifierPool:
+    def __init__(self,
+                 model_path: str,
+                 stream_paths: list,
+                 n_workers: int | None = None,
+                 backend: str | None = None,
+                 verbose: bool = False) -> None:
+        """
+        Runs the hand posture classification on several streams (cameras or video files)
+        with a fixed number of worker processes, each worker handling a subset of the streams.
+        Each worker loads the model once for all its streams and classifies the hands of all its streams
+        in a single inference call. NumPy models are loaded once in the main process and shared with the workers.
+
+        :param model_path: model file (.h5/.keras, .npz, .tflite or .onnx),
+        :param stream_paths: list of integers for cameras or strings for video files,
+        :param n_workers: number of worker processes, min(number of streams, number of cores) if None,
+        :param backend: inference backend, guessed from model_path if None,
+        :param verbose: enables verbose mode.
+        """
+        if n_workers is None:
+            n_workers = min(len(stream_paths), os.cpu_count() or 1)
+        self.model_path = model_path
+        self.stream_paths = list(stream_paths)
+        self.n_workers = max(1, min(n_workers, len(self.stream_paths)))
+        self.backend = backend
+        manifest = load_manifest(model_path)
+        self.normalization = manifest["input"]["normalization"] if manifest is not None else "none"
+        self.startup_timings = []
+        self.__verbose = verbose
+        self.__processes = []
+        self.__results = [ResultBlock() for _ in self.stream_paths]
+        self.__ended = Array("b", len(self.stream_paths))  # Set when a stream reaches its end or fails
+        self.__running = Value("i", 0)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_HandVideoClassifierPool__processes"] = []  # Started processes cannot be sent to the workers
+        return state
+
+    def start(self, timeout: float = STARTUP_TIMEOUT) -> "HandVideoClassifierPool":
+        """
+        Workers startup, blocks until all workers are ready.
+
+        :param timeout: maximum startup duration in seconds.
+        :return: HandVideoClassifierPool object
+        """
+        # Shared before the workers creation: copy-on-write pages with fork, pickled once per worker otherwise
+        model = load_backend(self.model_path, self.backend) if self.backend == "numpy" or \
+            (self.backend is None and self.model_path.endswith(".npz")) else None
+
+        self.__running.value = 1
+        receivers = []
+        for worker_id in range(self.n_workers):
+            stream_ids = list(range(worker_id, len(self.stream_paths), self.n_workers))
+            receiver, sender = Pipe(duplex=False)
+            process = Process(target=self._worker_subprocess, args=(stream_ids, model, sender))
+            process.start()
+            sender.close()
+            self.__processes.append(process)
+            receivers.append(receiver)
+
+        n_ready = 0
+        try:
+            for process, receiver in zip(self.__processes, receivers):
+                self.startup_timings.append(wait_for_startup(process, receiver, timeout)[0])
+                n_ready += 1
+        except Exception:
+            # The failed worker is already stopped, the next ones may still be importing or loading the model
+            for process in self.__processes[n_ready:]:
+                process.terminate()
+            self.stop()
+            raise
+        finally:
+            for receiver in receivers:
+                receiver.close()
+
+        if self.__verbose:
+            print(f"INFO: {self.n_workers} workers started for {len(self.stream_paths)} streams.")
+
+        return self
+
+    def _worker_subprocess(self, stream_ids: list, model: InferenceBackend | None, startup_sender):
+        signal.signal(signal.SIGINT, lambda x, y: 0)
+
+        timings = {}
+        streams = []
+        grabbers = []
+        try:
+            start_time = time.perf_counter()
+            import mediapipe as mp
+            timings["imports"] = time.perf_counter() - start_time
+
+            # One Hands object per stream as Mediapipe tracks hands between frames
+            start_time = time.perf_counter()
+            hands = [mp.solutions.hands.Hands(min_detection_confidence=0.9, max_num_hands=2) for _ in stream_ids]
+            extractors = [LandmarkExtractor(max_num_hands=2) for _ in stream_ids]
+            timings["hands"] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            if model is None:
+                model = load_backend(self.model_path, self.backend)
+            model.warmup(2 * len(stream_ids))
+            if model.n_classes > MAX_CLASSES:
+                raise ValueError(f"The model must have at most {MAX_CLASSES} outputs")
+            timings["model"] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            new_frame = threading.Event()
+            for stream_id in stream_ids:
+                streams.append(open_stream(self.stream_paths[stream_id]))
+                grabbers.append(FrameGrabber(streams[-1],
+                                             drop_frames=type(self.stream_paths[stream_id]) == int,
+                                             new_frame_event=new_frame))
+            timings["capture"] = time.perf_counter() - start_time
+        except Exception as e:
+            send_startup_error(startup_sender, e)
+            for stream in streams:
+                stream.release()
+            return
+
+        startup_sender.send(("ready", timings, {}))
+        startup_sender.close()
+
+        for stream_id in stream_ids:
+            with self.__results[stream_id].write() as record:
+                record["n_classes"] = model.n_classes
+        for grabber in grabbers:
+            grabber.start()
+
+        fps_counters = [FpsCounter() for _ in stream_ids]
+        batch = np.zeros((2 * len(stream_ids), 63), dtype=np.float32)
+        features = np.zeros((2, 21, 3), dtype=np.float32)
+        active = list(range(len(stream_ids)))
+        while self.__running.value == 1 and active:
+            new_frame.wait(timeout=0.1)
+            new_frame.clear()
+
+            # Detection on the newest frame of each stream
+            frames = []
+            for i in active:
+                grabbed, frame_id, timestamp, src = grabbers[i].read(timeout=0)
+                if grabbed:
+                    # Detection on the frame as captured, the landmarks are mirrored instead of the whole frame
+                    rgb_src = cv2.cvtColor(src, cv2.COLOR_BGR2RGB)
+                    n_hands = extractors[i].extract(hands[i].process(rgb_src))
+                    extractors[i].mirror()
+                    if n_hands == 2:
+                        batch[2 * len(frames):2 * len(frames) + 2] = \
+                            transform_landmarks(extractors[i].landmarks, self.normalization, out=features)
+                    frames.append((i, frame_id, timestamp, (rgb_src.shape[1], rgb_src.shape[0])))
+                elif grabbers[i].ended:
+                    self.__ended[stream_ids[i]] = 1
+            active = [i for i in active if not self.__ended[stream_ids[i]]]
+            if not frames:
+                continue
+
+            # Single inference call for the hands of all the streams of the worker
+            preds = model.predict(batch[:2 * len(frames)])
+            for n, (i, frame_id, timestamp, frame_size) in enumerate(frames):
+                extractor = extractors[i]
+                self.__results[stream_ids[i]].publish(frame_id, timestamp, frame_size,
+                                                      extractor.landmarks, extractor.handedness, extractor.scores,
+                                                      preds[2 * n:2 * n + 2] if extractor.n_hands == 2 else None,
+                                                      dropped_frames=grabbers[i].dropped_frames,
+                                                      fps=fps_counters[i].tick())
+
+        for grabber, stream in zip(grabbers, streams):
+            grabber.stop()
+            stream.release()
+
+    def get_results(self, stream_index: int) -> np.ndarray:
+        """
+        Returns a consistent snapshot of the last published results of a stream,
+        with the same fields as HandVideoClassifier.get_results.
+
+        :param stream_index: index of the stream in stream_paths.
+        :return: 0-d structured array.
+        """
+        return self.__results[stream_index].read()
+
+    def get_predictions(self, stream_index: int) -> tuple:
+        """
+        Returns the argmax of the classifier output for both hands of a stream.
+
+        :param stream_index: index of the stream in stream_paths.
+        :return: Classifier Output, -1 if no class was detected.
+        """
+        return tuple(self.__results[stream_index].read_field("predictions").tolist())
+
+    def get_health(self) -> dict:
+        """
+        Returns the state of each stream and aggregated values over all the streams.
+
+        :return: dictionary with a "streams" list (stream, alive, frame_id, fps, dropped_frames,
+        age of the last result in seconds) and the aggregated "alive_streams", "total_fps" and "dropped_frames".
+        """
+        now = time.monotonic()
+        streams = []
+        for stream_id, (stream_path, block) in enumerate(zip(self.stream_paths, self.__results)):
+            snapshot = block.read()
+            worker_alive = self.__processes[stream_id % self.n_workers].is_alive() if self.__processes else False
+            streams.append({"stream": stream_path,
+                            "alive": worker_alive and not self.__ended[stream_id],
+                            "frame_id": int(snapshot["frame_id"]),
+                            "fps": float(snapshot["fps"]),
+                            "dropped_frames": int(snapshot["dropped_frames"]),
+                            "age": now - float(snapshot["timestamp"]) if snapshot["frame_id"] >= 0 else None})
+
+        return {"streams": streams,
+                "alive_streams": sum(stream["alive"] for stream in streams),
+                "total_fps": sum(stream["fps"] for stream in streams if stream["alive"]),
+                "dropped_frames": sum(stream["dropped_frames"] for stream in streams)}
+
+    def is_running(self) -> bool:
+        """
+        Returns True while at least one stream is processed.
+
+        :return: Running state
+        """
+        return self.__running.value == 1 and any(process.is_alive() for process in self.__processes)
+
+    def stop(self) -> None:
+        """
+        Stops all the workers and waits for them.
+        """
+        if self.__verbose:
+            print("INFO: Shutting down workers ...")
+        self.__running.value = 0
+        for process in self.__processes:
+            process.join()
+        if self.__verbose:
+            print("INFO: Workers terminated.")
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import numpy as np
+
+from nico_lib.landmarks_minilib import N_LANDMARKS
+
+# Quality levels from best to lowest: (detection scale, detection every N frames)
+DEFAULT_LEVELS = ((1., 1), (0.75, 1), (0.5, 1), (0.5, 2), (0.35, 2), (0.35, 3))
+
+
+class QualityGovernor:
+    def __init__(self,
+                 target_fps: float,
+                 levels: tuple | list = DEFAULT_LEVELS,
+                 initial_level: int = 0,
+                 window: int = 30,
+                 headroom: float = 1.3,
+                 smoothing: float = 0.9) -> None:
+        """
+        Adaptive quality control of the detection loop.
+        The quality is lowered when the processing time of a frame does not allow the target FPS
+        during window frames, and raised again when the processing is faster than target FPS * headroom
+        during 2 * window frames.
+        :param target_fps: frames per second the loop must be able to process.
+        :param levels: quality levels (detection scale, detection every N frames) from best to lowest.
+        :param initial_level: index of the starting level.
+        :param window: number of consecutive frames before lowering the quality.
+        :param headroom: speed margin required to raise the quality.
+        :param smoothing: weight of the previous value of the processing time average, between 0 and 1.
+        """
+        self.target_fps = target_fps
+        self.levels = tuple(levels)
+        self.level = min(max(initial_level, 0), len(self.levels) - 1)
+        self.window = window
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.processing_time = 0.
+        self._slow_frames = 0
+        self._fast_frames = 0
+
+    @property
+    def detection_scale(self) -> float:
+        return self.levels[self.level][0]
+
+    @property
+    def detect_every(self) -> int:
+        return self.levels[self.level][1]
+
+    def update(self, processing_time: float) -> tuple:
+        """
+        Registers the processing time of a frame and adapts the quality level.
+        :param processing_time: duration of the processing of the frame in seconds, without waiting for the frame.
+        :return: (detection scale, detection every N frames) to use for the next frames.
+        """
+        if self.processing_time == 0:
+            self.processing_time = processing_time
+        else:
+            self.processing_time = self.smoothing * self.processing_time + (1 - self.smoothing) * processing_time
+
+        frame_budget = 1 / self.target_fps
+        if self.processing_time > frame_budget:
+            self._slow_frames += 1
+            self._fast_frames = 0
+        elif self.processing_time * self.headroom < frame_budget:
+            self._fast_frames += 1
+            self._slow_frames = 0
+        else:
+            self._slow_frames = self._fast_frames = 0
+
+        if self._slow_frames >= self.window and self.level < len(self.levels) - 1:
+            self.level += 1
+            self._slow_frames = 0
+        elif self._fast_frames >= 2 * self.window and self.level > 0:
+            self.level -= 1
+            self._fast_frames = 0
+
+        return self.levels[self.level]
+
+
+class LandmarkExtrapolator:
+    def __init__(self, max_num_hands: int = 2, max_duration: float = 0.2) -> None:
+        """
+        Estimates the landmarks of the frames without detection from the two last detections,
+        assuming a constant speed of the hands (no future frame is awaited, so no latency is added).
+        :param max_duration: maximum extrapolation duration after the last detection in seconds.
+        """
+        self.max_duration = max_duration
+        self._landmarks = np.zeros((2, max_num_hands, N_LANDMARKS, 3), dtype=np.float32)  # Previous and last detections
+        self._timestamps = np.zeros(2, dtype=np.float64)
+        self._n_hands = np.zeros(2, dtype=np.int64)
+        self._count = 0
+
+    def add(self, landmarks: np.ndarray, n_hands: int, timestamp: float) -> None:
+        """
+        Registers the landmarks of a detection.
+        :param landmarks: (hands, 21, 3) detected landmarks.
+        :param n_hands: number of detected hands.
+        :param timestamp: capture time of the frame.
+        """
+        self._landmarks[0] = self._landmarks[1]
+        self._timestamps[0] = self._timestamps[1]
+        self._n_hands[0] = self._n_hands[1]
+        self._landmarks[1] = landmarks
+        self._timestamps[1] = timestamp
+        self._n_hands[1] = n_hands
+        self._count += 1
+
+    def predict(self, landmarks: np.ndarray, timestamp: float) -> int:
+        """
+        Writes in place the estimated landmarks at the given time.
+        :param landmarks: (hands, 21, 3) output array.
+        :param timestamp: capture time of the frame.
+        :return: number of hands of the last detection.
+        """
+        landmarks[:] = self._landmarks[1]
+        n_hands = int(self._n_hands[1])
+        duration = self._timestamps[1] - self._timestamps[0]
+        if self._count >= 2 and self._n_hands[0] == n_hands and duration > 0:
+            elapsed = min(timestamp - self._timestamps[1], self.max_duration)
+            landmarks[:n_hands] += (self._landmarks[1, :n_hands] - self._landmarks[0, :n_hands]) * (elapsed / duration)
+        return n_hands
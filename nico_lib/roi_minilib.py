@@ -0,0 +1,103 @@
+from __future__ import annotations
+import numpy as np
+import cv2
+
+
+class RoiTracker:
+    def __init__(self,
+                 margin: float = 0.5,
+                 min_size: int = 160,
+                 max_size: int | None = None,
+                 expected_hands: int = 2) -> None:
+        """
+        Region of interest tracking around the hands detected in the previous frame,
+        so that the detection only processes the part of the frame containing the hands.
+        The region is kept while the hands stay inside it, which keeps the Mediapipe tracking stable,
+        and is moved when a hand comes close to its border.
+        :param margin: margin added around the hands bounding box, relative to its size.
+        :param min_size: minimum width and height of the region in pixels.
+        :param max_size: longest side of the image fed to the detection, larger regions are downscaled.
+        :param expected_hands: number of hands to track, the tracking is lost when fewer hands are found.
+        """
+        self.margin = margin
+        self.min_size = min_size
+        self.max_size = max_size
+        self.expected_hands = expected_hands
+        self.roi = None  # (x0, y0, x1, y1) in mirrored frame pixels, None when the tracking is lost
+        self.lost_count = 0
+        self.cropped = False  # True if the last prepared image was a region of the frame
+        self._active_roi = None
+
+    def prepare(self, src: np.ndarray, full_frame: bool = False, scale: float = 1.) -> np.ndarray:
+        """
+        Crops, mirrors, downscales and converts the frame to RGB for the detection.
+        Only the region is mirrored, the full frame is left untouched.
+        :param src: BGR frame, not mirrored.
+        :param full_frame: ignores the region and prepares the full frame.
+        :param scale: additional downscale factor of the image fed to the detection.
+        :return: RGB image of the region (or of the full frame).
+        """
+        if self.roi is None or full_frame:
+            region = src
+            self._active_roi = (0, 0, src.shape[1], src.shape[0])
+            self.cropped = False
+        else:
+            x0, y0, x1, y1 = self.roi
+            # Region in mirrored coordinates, taken from the frame before mirroring
+            region = src[y0:y1, src.shape[1] - x1:src.shape[1] - x0]
+            self._active_roi = self.roi
+            self.cropped = True
+
+        if self.max_size is not None and max(region.shape[:2]) * scale > self.max_size:
+            scale = self.max_size / max(region.shape[:2])
+        if scale < 1:
+            region = cv2.resize(region, (int(region.shape[1] * scale), int(region.shape[0] * scale)),
+                                interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(cv2.flip(region, 1), cv2.COLOR_BGR2RGB)
+
+    def to_frame(self, landmarks: np.ndarray, n_hands: int, frame_size: tuple) -> None:
+        """
+        Maps in place landmarks normalized to the last prepared image to landmarks normalized to the full frame.
+        :param landmarks: (hands, 21, 3) landmarks array.
+        :param n_hands: number of detected hands (rows to map).
+        :param frame_size: (width, height) of the full frame in pixels.
+        """
+        x0, y0, x1, y1 = self._active_roi
+        width, height = frame_size
+        scale = np.array([(x1 - x0) / width, (y1 - y0) / height, (x1 - x0) / width], dtype=np.float32)
+        offset = np.array([x0 / width, y0 / height, 0], dtype=np.float32)
+        landmarks[:n_hands] *= scale
+        landmarks[:n_hands] += offset
+
+    def update(self, landmarks: np.ndarray, n_hands: int, frame_size: tuple) -> None:
+        """
+        Updates the region from the landmarks of the current frame, mapped to the full frame.
+        :param landmarks: (hands, 21, 3) landmarks array normalized to the full frame.
+        :param n_hands: number of detected hands.
+        :param frame_size: (width, height) of the full frame in pixels.
+        """
+        if n_hands < self.expected_hands:
+            if self.roi is not None:
+                self.lost_count += 1
+            self.roi = None
+            return
+
+        width, height = frame_size
+        points = landmarks[:n_hands, :, :2].reshape(-1, 2) * (width, height)
+        bx0, by0 = points.min(axis=0)
+        bx1, by1 = points.max(axis=0)
+
+        # The region is kept while the hands bounding box stays inside its inner part
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            band_x = (x1 - x0) * self.margin / (2 * (1 + self.margin))
+            band_y = (y1 - y0) * self.margin / (2 * (1 + self.margin))
+            if bx0 > x0 + band_x / 2 and bx1 < x1 - band_x / 2 and \
+                    by0 > y0 + band_y / 2 and by1 < y1 - band_y / 2:
+                return
+
+        half_width = max((bx1 - bx0) * (1 + self.margin), self.min_size) / 2
+        half_height = max((by1 - by0) * (1 + self.margin), self.min_size) / 2
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        self.roi = (int(max(cx - half_width, 0)), int(max(cy - half_height, 0)),
+                    int(min(cx + half_width, width)), int(min(cy + half_height, height)))
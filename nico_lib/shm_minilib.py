@@ -0,0 +1,315 @@
+from __future__ import annotations
+import weakref
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+MAX_CLASSES = 32  # Maximum number of model outputs stored in the result block
+
+RESULT_DTYPE = np.dtype([("sequence", np.uint64),  # Seqlock counter, odd while a write is in progress
+                         ("frame_id", np.int64),  # Index of the published frame, -1 before the first frame
+                         ("timestamp", np.float64),  # time.monotonic() at capture
+                         ("dropped_frames", np.int64),  # Captured frames skipped by the detection
+                         ("fps", np.float32),  # Smoothed rate of processed frames
+                         ("n_classes", np.int32),
+                         ("predictions", np.int32, (2,)),  # Published class (argmax or smoothed), -1 if no class
+                         ("confidences", np.float32, (2,)),  # Confidence of the published class
+                         ("centers", np.int32, (2, 2)),  # Hands centers in frame pixels
+                         ("handedness", np.int8, (2,)),  # Index in landmarks_minilib.HANDEDNESS_LABELS, -1 if none
+                         ("scores", np.float32, (2,)),  # Handedness scores
+                         ("probabilities", np.float32, (2, MAX_CLASSES)),
+                         ("landmarks", np.float32, (2, 21, 3))])
+
+STAT_STAGES = ("capture", "detection", "inference", "publish", "display", "frame")  # Timed detection loop stages
+INFERENCE_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 25., float("inf"))  # Histogram buckets upper bounds
+
+STATS_DTYPE = np.dtype([("sequence", np.uint64),
+                        ("started", np.float64),  # time.monotonic() at the start of the detection loop
+                        ("updated", np.float64),  # time.monotonic() at the last update
+                        ("frames", np.int64),  # Processed frames
+                        ("detections", np.int64),  # Frames processed by the hands detection
+                        ("classified", np.int64),  # Frames whose hands were classified
+                        ("hands_frames", np.int64),  # Detection frames with at least one hand
+                        ("dropped_frames", np.int64),  # Captured frames skipped by the detection
+                        ("fps", np.float32),
+                        ("hands_rate", np.float32),  # Smoothed fraction of the detection frames with hands
+                        ("stage_last_ms", np.float32, (len(STAT_STAGES),)),
+                        ("stage_mean_ms", np.float32, (len(STAT_STAGES),)),  # Exponentially smoothed
+                        ("stage_total_s", np.float64, (len(STAT_STAGES),)),
+                        ("stage_count", np.int64, (len(STAT_STAGES),)),
+                        ("inference_buckets", np.int64, (len(INFERENCE_BUCKETS_MS),))])  # Non-cumulative counts
+
+_ONE = np.uint64(1)
+
+
+def _release(shm: shared_memory.SharedMemory, unlink: bool) -> None:
+    shm.close()
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedRecord:
+    def __init__(self, dtype: np.dtype, name: str | None = None) -> None:
+        """
+        Single numpy record stored in a shared memory block, protected by a seqlock.
+        A single process writes, any number of processes read a consistent copy without locks.
+        The record must start with an uint64 "sequence" field.
+        :param dtype: structured dtype of the record.
+        :param name: name of an existing block to attach to, a new block is created if None.
+        """
+        self.dtype = np.dtype(dtype)
+        self._owner = name is None
+        self._attach(name)
+        if self._owner:
+            self.record[()] = np.zeros((), dtype=self.dtype)
+
+    def _attach(self, name: str | None) -> None:
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=self.dtype.itemsize)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.record = np.ndarray((), dtype=self.dtype, buffer=self._shm.buf)
+        self._sequence = np.ndarray((), dtype=np.uint64, buffer=self._shm.buf)
+        self._finalizer = weakref.finalize(self, _release, self._shm, self._owner)
+
+    def __getstate__(self) -> dict:
+        return {"dtype": self.dtype, "name": self.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.dtype = state["dtype"]
+        self._owner = False
+        self._attach(state["name"])
+
+    @contextmanager
+    def write(self):
+        """
+        Context manager giving the record to update, readers retry until the block is exited.
+        """
+        self._sequence += _ONE
+        try:
+            yield self.record
+        finally:
+            self._sequence += _ONE
+
+    def read(self) -> np.ndarray:
+        """
+        Returns a consistent copy of the record.
+        :return: 0-d structured array.
+        """
+        while True:
+            sequence = int(self._sequence)
+            if sequence % 2 == 0:
+                snapshot = self.record.copy()
+                if int(self._sequence) == sequence:
+                    return snapshot
+
+    def read_field(self, field: str) -> np.ndarray:
+        """
+        Returns a consistent copy of a single field of the record.
+        :param field: field name.
+        :return: field copy.
+        """
+        while True:
+            sequence = int(self._sequence)
+            if sequence % 2 == 0:
+                value = self.record[field].copy()
+                if int(self._sequence) == sequence:
+                    return value
+
+    def close(self) -> None:
+        """
+        Releases the shared memory block, unlinking it if this object created it.
+        """
+        self._finalizer()
+
+
+class ResultBlock(SharedRecord):
+    def __init__(self, name: str | None = None) -> None:
+        """
+        Per-frame classifier results shared between the detection subprocess and its readers.
+        :param name: name of an existing block to attach to, a new block is created if None.
+        """
+        super().__init__(RESULT_DTYPE, name)
+        if self._owner:
+            self.record["frame_id"] = -1
+            self.record["predictions"] = -1
+            self.record["centers"] = -1
+            self.record["handedness"] = -1
+
+    def publish(self,
+                frame_id: int,
+                timestamp: float,
+                frame_size: tuple,
+                landmarks: np.ndarray,
+                handedness: np.ndarray,
+                scores: np.ndarray,
+                probabilities: np.ndarray | None,
+                dropped_frames: int = 0,
+                fps: float = 0.,
+                classes: np.ndarray | None = None,
+                confidences: np.ndarray | None = None) -> None:
+        """
+        Writes the results of a frame at once, called by the detection process only.
+        Centers and landmarks are kept from the previous classified frame when no classification was made.
+        :param frame_id: capture index of the frame.
+        :param timestamp: time.monotonic() at capture.
+        :param frame_size: (width, height) of the frame in pixels.
+        :param landmarks: (2, 21, 3) landmarks array.
+        :param handedness: (2,) handedness indexes.
+        :param scores: (2,) handedness scores.
+        :param probabilities: (2, n_classes) classifier output, None if both hands were not detected.
+        :param dropped_frames: captured frames skipped by the detection.
+        :param fps: rate of processed frames.
+        :param classes: (2,) published classes (a smoothed prediction for example), argmax of probabilities if None.
+        :param confidences: (2,) confidences of the published classes, max of probabilities if None.
+        """
+        with self.write() as record:
+            record["frame_id"] = frame_id
+            record["timestamp"] = timestamp
+            record["dropped_frames"] = dropped_frames
+            record["fps"] = fps
+            record["handedness"] = handedness
+            record["scores"] = scores
+            if probabilities is not None:
+                record["predictions"] = np.argmax(probabilities, axis=1) if classes is None else classes
+                record["confidences"] = np.max(probabilities, axis=1) if confidences is None else confidences
+                record["probabilities"][:, :probabilities.shape[1]] = probabilities
+                record["landmarks"] = landmarks
+                # Middle finger MCP (landmark 9) used as hand center
+                record["centers"] = landmarks[:, 9, :2] * frame_size
+            else:
+                record["predictions"] = -1
+                record["confidences"] = 0
+                record["probabilities"] = 0
+
+
+class StatsBlock(SharedRecord):
+    def __init__(self, name: str | None = None) -> None:
+        """
+        Detection loop counters and stages timings shared between the detection subprocess and its readers,
+        updated by stats_minilib.LoopStats.
+        :param name: name of an existing block to attach to, a new block is created if None.
+        """
+        super().__init__(STATS_DTYPE, name)
+
+
+FRAME_HEADER_DTYPE = np.dtype([("writing", np.uint64),  # Number of the publication being written
+                               ("sequence", np.uint64),  # Number of the last complete publication, 0 if none
+                               ("height", np.int32),
+                               ("width", np.int32),
+                               ("channels", np.int32),
+                               ("frame_ids", np.int64, (2,)),  # Capture index of the frame of each slot
+                               ("timestamps", np.float64, (2,))])  # time.monotonic() at capture of each slot
+_FRAME_HEADER_SIZE = 64  # Frame slots offset
+
+
+class FrameBuffer:
+    def __init__(self,
+                 shape: tuple | None = None,
+                 name: str | None = None,
+                 create: bool | None = None,
+                 owner: bool | None = None) -> None:
+        """
+        Latest video frame shared between processes, double-buffered: publication n is written to slot n % 2 while
+        the readers use the frame of the previous publication, in place, without copy nor lock.
+        A single process publishes, any number of processes read.
+        :param shape: (height, width, channels) of the frames, needed to create the buffer.
+        :param name: shared memory block name, chosen by the system if None when creating.
+        :param create: creates the buffer if True, attaches to the existing buffer name if False,
+        creates it if a shape is given when None.
+        :param owner: unlinks the block when closed, same as create if None. A creator that is not the owner hands
+        the block over to a process attaching to it as owner (the block is created by the process that knows the
+        frames size and owned by the process that outlives it).
+        """
+        if create is None:
+            create = shape is not None
+        self._owner = create if owner is None else owner
+        if create:
+            if shape is None:
+                raise ValueError("The frames shape is needed to create a frame buffer")
+            height, width, channels = shape
+            self._shm = shared_memory.SharedMemory(create=True, name=name,
+                                                   size=_FRAME_HEADER_SIZE + 2 * height * width * channels)
+            if not self._owner:
+                # Registered by the owner when it attaches, the resource tracker unlinks the block if the owner dies
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.header = np.ndarray((), dtype=FRAME_HEADER_DTYPE, buffer=self._shm.buf)
+        if create:
+            self.header[()] = np.zeros((), dtype=FRAME_HEADER_DTYPE)
+            self.header["height"], self.header["width"], self.header["channels"] = shape
+        self.shape = (int(self.header["height"]), int(self.header["width"]), int(self.header["channels"]))
+        self.slots = np.ndarray((2,) + self.shape, dtype=np.uint8, buffer=self._shm.buf, offset=_FRAME_HEADER_SIZE)
+        self._finalizer = weakref.finalize(self, _release, self._shm, self._owner)
+
+    def __getstate__(self) -> dict:
+        return {"name": self.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(name=state["name"], create=False)
+
+    def publish(self, frame: np.ndarray, frame_id: int = 0, timestamp: float = 0.) -> None:
+        """
+        Copies a frame to the slot not used by the readers, then makes it the latest frame.
+        :param frame: (height, width, channels) uint8 frame.
+        :param frame_id: capture index of the frame.
+        :param timestamp: time.monotonic() at capture.
+        """
+        number = int(self.header["sequence"]) + 1
+        slot = number % 2
+        self.header["writing"] = number
+        self.slots[slot] = frame
+        self.header["frame_ids"][slot] = frame_id
+        self.header["timestamps"][slot] = timestamp
+        self.header["sequence"] = number
+
+    def latest(self) -> tuple | None:
+        """
+        Returns the latest frame in place, valid as long as is_valid(sequence) is True
+        (until the second next publication starts).
+        :return: (sequence, read-only frame view, frame_id, timestamp), None if no frame was published.
+        """
+        sequence = int(self.header["sequence"])
+        if sequence == 0:
+            return None
+        slot = sequence % 2
+        frame = self.slots[slot]
+        frame.flags.writeable = False
+        return sequence, frame, int(self.header["frame_ids"][slot]), float(self.header["timestamps"][slot])
+
+    def is_valid(self, sequence: int) -> bool:
+        """
+        Checks that the frame of a publication was not overwritten, after using a latest() frame view.
+        :param sequence: sequence returned by latest.
+        :return: True if the frame was not modified.
+        """
+        return int(self.header["writing"]) < sequence + 2
+
+    def read(self, out: np.ndarray | None = None) -> tuple | None:
+        """
+        Returns a consistent copy of the latest frame.
+        :param out: (height, width, channels) uint8 array receiving the frame, allocated if None.
+        :return: (frame, frame_id, timestamp), None if no frame was published.
+        """
+        while True:
+            latest = self.latest()
+            if latest is None:
+                return None
+            sequence, frame, frame_id, timestamp = latest
+            if out is None:
+                out = np.empty(self.shape, dtype=np.uint8)
+            out[:] = frame
+            if self.is_valid(sequence):
+                return out, frame_id, timestamp
+
+    def close(self) -> None:
+        """
+        Releases the shared memory block, unlinking it if this object created it.
+        """
+        self._finalizer()
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import cv2
+
+from nico_lib.shm_minilib import FrameBuffer
+
+SINK_TYPES = ("none", "shm", "mjpeg", "file")
+
+
+class FrameSink:
+    def __init__(self) -> None:
+        """
+        Base class for the consumers of the video frames (HandVideoClassifier annotated frames, GUI images),
+        the write function needs to be implemented in the subclass.
+        Sinks are created by the user and opened by the process producing the frames (the detection subprocess
+        for HandVideoClassifier), they must be picklable until opened.
+        """
+        self.frame_size = None
+
+    def open(self, frame_size: tuple, fps: float | None = None) -> None:
+        """
+        Prepares the sink, called once the frames size is known.
+        :param frame_size: (width, height) of the frames.
+        :param fps: frame rate of the source, unknown if None.
+        """
+        self.frame_size = tuple(frame_size)
+
+    @property
+    def active(self) -> bool:
+        """
+        Tells whether the sink currently consumes frames, the frames are not prepared for it otherwise.
+        """
+        return True
+
+    def write(self, frame: np.ndarray, frame_id: int, timestamp: float) -> None:
+        """
+        Receives a frame, without copy: the array is only valid during the call.
+        :param frame: (height, width, 3) BGR frame.
+        :param frame_id: index of the frame.
+        :param timestamp: time.monotonic() at capture.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Releases the sink resources.
+        """
+        pass
+
+
+class SharedFrameSink(FrameSink):
+    def __init__(self, name: str | None = None, owner: bool = True) -> None:
+        """
+        Publishes the frames in a shared memory FrameBuffer, read by other processes with FrameBuffer(name=name).
+        :param name: shared memory block name, chosen by the system if None.
+        :param owner: unlinks the block when the sink is closed, if False the block is left to a process attaching
+        to it with FrameBuffer(name=name, owner=True).
+        """
+        super().__init__()
+        self.name = name
+        self.owner = owner
+        self.buffer = None
+
+    def open(self, frame_size: tuple, fps: float | None = None) -> None:
+        super().open(frame_size, fps)
+        self.buffer = FrameBuffer((frame_size[1], frame_size[0], 3), name=self.name, owner=self.owner)
+        self.name = self.buffer.name
+
+    def write(self, frame: np.ndarray, frame_id: int, timestamp: float) -> None:
+        self.buffer.publish(frame, frame_id, timestamp)
+
+    def close(self) -> None:
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+
+class _MjpegHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/stream.mjpg"):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        sink = self.server.sink
+        with sink._condition:
+            sink._clients += 1
+        try:
+            last_id = -1
+            while not sink._closed:
+                with sink._condition:
+                    sink._condition.wait_for(lambda: sink._jpeg_id != last_id or sink._closed, timeout=1.)
+                    jpeg, last_id = sink._jpeg, sink._jpeg_id
+                if jpeg is None or sink._closed:
+                    continue
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % jpeg.size)
+                self.wfile.write(jpeg.data)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with sink._condition:
+                sink._clients -= 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class MjpegSink(FrameSink):
+    def __init__(self, port: int = 8090, host: str = "127.0.0.1", quality: int = 80) -> None:
+        """
+        Serves the frames as an MJPEG stream on http://host:port/stream.mjpg (readable by browsers and
+        cv2.VideoCapture). Frames are encoded only while at least one client is connected.
+        :param port: listening port, a free port is chosen if 0.
+        :param host: listening address.
+        :param quality: JPEG quality, from 0 to 100.
+        """
+        super().__init__()
+        self.port = port
+        self.host = host
+        self.quality = quality
+        self.address = None
+        self._server = None
+        self._clients = 0
+        self._closed = False
+
+    def open(self, frame_size: tuple, fps: float | None = None) -> None:
+        super().open(frame_size, fps)
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._jpeg_id = 0
+        self._server = ThreadingHTTPServer((self.host, self.port), _MjpegHandler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        self.address = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def active(self) -> bool:
+        return self._clients > 0
+
+    def write(self, frame: np.ndarray, frame_id: int, timestamp: float) -> None:
+        encoded, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if encoded:
+            with self._condition:
+                self._jpeg = jpeg
+                self._jpeg_id += 1
+                self._condition.notify_all()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._closed = True
+            with self._condition:
+                self._condition.notify_all()
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FileSink(FrameSink):
+    def __init__(self, path: str, fps: float | None = None, fourcc: str = "mp4v") -> None:
+        """
+        Records the frames to a video file.
+        :param path: video file path.
+        :param fps: frame rate of the file, source frame rate if None (30 if unknown).
+        :param fourcc: codec code.
+        """
+        super().__init__()
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self._writer = None
+
+    def open(self, frame_size: tuple, fps: float | None = None) -> None:
+        super().open(frame_size, fps)
+        self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                       self.fps or fps or 30., tuple(frame_size))
+        if not self._writer.isOpened():
+            raise IOError(f"Cannot open video file <{self.path}> for writing")
+
+    def write(self, frame: np.ndarray, frame_id: int, timestamp: float) -> None:
+        self._writer.write(frame)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+def make_sink(spec: str) -> FrameSink | None:
+    """
+    Creates a sink from a short description: "none", "shm" or "shm:name", "mjpeg" or "mjpeg:port",
+    "file:path".
+    :param spec: sink description.
+    :return: FrameSink object, None for "none".
+    """
+    kind, _, argument = spec.partition(":")
+    if kind == "none":
+        return None
+    elif kind == "shm":
+        return SharedFrameSink(argument or None)
+    elif kind == "mjpeg":
+        return MjpegSink(int(argument)) if argument else MjpegSink()
+    elif kind == "file" and argument:
+        return FileSink(argument)
+    raise ValueError(f"Unknown sink <{spec}>, use one of {SINK_TYPES} (shm:name, mjpeg:port, file:path)")
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import numpy as np
+
+
+class PredictionSmoother:
+    def __init__(self,
+                 n_classes: int,
+                 n_hands: int = 2,
+                 ema_alpha: float | None = 0.5,
+                 vote_window: int = 1,
+                 enter_threshold: float = 0.,
+                 exit_threshold: float = 0.) -> None:
+        """
+        Temporal smoothing and confidence gating of the classifier output of consecutive frames:
+        exponential moving average of the probabilities, majority vote over the last vote_window frames and
+        hysteresis on the confidence (EMA probability) of the published class.
+        A new class is published when its confidence reaches enter_threshold, the published class is kept while
+        its confidence stays above exit_threshold, otherwise no class (-1) is published.
+        All the state is stored in preallocated arrays, an update does not allocate arrays.
+        :param n_classes: number of model outputs.
+        :param n_hands: number of hands.
+        :param ema_alpha: weight of the new probabilities in the moving average, between 0 and 1, no average if None.
+        :param vote_window: number of frames of the majority vote, no vote if 1.
+        :param enter_threshold: confidence needed to publish a new class.
+        :param exit_threshold: confidence under which the published class is dropped, lower than enter_threshold.
+        """
+        if exit_threshold > enter_threshold:
+            raise ValueError("exit_threshold must be lower than enter_threshold")
+        self.n_classes = n_classes
+        self.ema_alpha = 1. if ema_alpha is None else ema_alpha
+        self.vote_window = max(1, vote_window)
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+
+        self.classes = np.full(n_hands, -1, dtype=np.int32)  # Published class of each hand, -1 if none
+        self.confidences = np.zeros(n_hands, dtype=np.float32)  # Confidence of the published class
+        self._ema = np.zeros((n_hands, n_classes), dtype=np.float32)
+        self._weighted = np.zeros((n_hands, n_classes), dtype=np.float32)
+        self._candidates = np.zeros(n_hands, dtype=np.int64)
+        self._votes = np.zeros((self.vote_window, n_hands), dtype=np.int64)  # Ring buffer of the EMA argmax
+        self._vote_counts = np.zeros((n_hands, n_classes), dtype=np.int32)
+        self._position = 0
+        self._count = 0
+
+    def reset(self) -> None:
+        """
+        Forgets the previous frames, called when the hands are lost.
+        """
+        self.classes[:] = -1
+        self.confidences[:] = 0
+        self._vote_counts[:] = 0
+        self._position = 0
+        self._count = 0
+
+    def update(self, probabilities: np.ndarray | None) -> tuple:
+        """
+        Adds the classifier output of a frame.
+        :param probabilities: (hands, n_classes) classifier output, None if the hands were not detected.
+        :return: (classes, confidences) arrays, updated in place by the next calls.
+        """
+        if probabilities is None:
+            self.reset()
+            return self.classes, self.confidences
+
+        # Exponential moving average, initialized with the first frame
+        if self._count == 0:
+            self._ema[:] = probabilities
+        else:
+            np.multiply(probabilities, self.ema_alpha, out=self._weighted)
+            self._ema *= 1 - self.ema_alpha
+            self._ema += self._weighted
+        np.argmax(self._ema, axis=1, out=self._candidates)
+
+        # Majority vote, the counts are updated with the vote entering and the vote leaving the window
+        if self.vote_window > 1:
+            votes = self._votes[self._position]
+            for hand in range(votes.shape[0]):
+                if self._count >= self.vote_window:
+                    self._vote_counts[hand, votes[hand]] -= 1
+                votes[hand] = self._candidates[hand]
+                self._vote_counts[hand, votes[hand]] += 1
+            self._position = (self._position + 1) % self.vote_window
+            np.argmax(self._vote_counts, axis=1, out=self._candidates)
+        self._count += 1
+
+        # Hysteresis on the confidence of the published class
+        for hand in range(self.classes.shape[0]):
+            candidate = int(self._candidates[hand])
+            current = int(self.classes[hand])
+            if candidate != current and self._ema[hand, candidate] >= self.enter_threshold:
+                self.classes[hand] = current = candidate
+            elif current != -1 and self._ema[hand, current] < self.exit_threshold:
+                self.classes[hand] = current = -1
+            self.confidences[hand] = self._ema[hand, current] if current != -1 else 0.
+        return self.classes, self.confidences
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import json
+import socket
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+from nico_lib.shm_minilib import INFERENCE_BUCKETS_MS, STAT_STAGES, StatsBlock
+
+
+class LoopStats:
+    def __init__(self, block: StatsBlock, flush_interval: float = 0.25, smoothing: float = 0.9) -> None:
+        """
+        Collects the counters and stages timings of the detection loop in plain Python values, cheap to update
+        on every frame, and copies them to the shared stats block every flush_interval seconds.
+        :param block: StatsBlock written by this process only.
+        :param flush_interval: minimum duration in seconds between two updates of the block.
+        :param smoothing: weight of the previous value in the smoothed means and hands rate, between 0 and 1.
+        """
+        self.block = block
+        self.flush_interval = flush_interval
+        self.smoothing = smoothing
+        self._stage_index = {stage: index for index, stage in enumerate(STAT_STAGES)}
+        self.stage_last = [0.] * len(STAT_STAGES)
+        self.stage_mean = [0.] * len(STAT_STAGES)
+        self.stage_total = [0.] * len(STAT_STAGES)
+        self.stage_count = [0] * len(STAT_STAGES)
+        self.inference_buckets = [0] * len(INFERENCE_BUCKETS_MS)
+        self.frames = self.detections = self.classified = self.hands_frames = self.dropped_frames = 0
+        self.fps = self.hands_rate = 0.
+        self.started = time.monotonic()
+        self._last_flush = self.started
+
+    def add(self, stage: str, duration: float) -> None:
+        """
+        Records the duration of a stage, inference durations are also counted in the histogram.
+        :param stage: one of shm_minilib.STAT_STAGES.
+        :param duration: duration in seconds.
+        """
+        index = self._stage_index[stage]
+        self.stage_last[index] = duration
+        self.stage_total[index] += duration
+        self.stage_count[index] += 1
+        self.stage_mean[index] = duration if self.stage_count[index] == 1 else \
+            self.smoothing * self.stage_mean[index] + (1 - self.smoothing) * duration
+        if stage == "inference":
+            self.inference_buckets[bisect_left(INFERENCE_BUCKETS_MS, duration * 1e3)] += 1
+
+    def frame(self, detected: bool, n_hands: int, classified: bool, dropped_frames: int, fps: float) -> None:
+        """
+        Counts a processed frame, and updates the shared block if the flush interval elapsed.
+        :param detected: the hands detection ran on the frame.
+        :param n_hands: number of detected hands.
+        :param classified: the hands were classified.
+        :param dropped_frames: total number of captured frames skipped by the detection.
+        :param fps: rate of processed frames.
+        """
+        self.frames += 1
+        if detected:
+            self.detections += 1
+            self.hands_frames += n_hands > 0
+            self.hands_rate = self.smoothing * self.hands_rate + (1 - self.smoothing) * (n_hands > 0)
+        self.classified += classified
+        self.dropped_frames = dropped_frames
+        self.fps = fps
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush(now)
+
+    def flush(self, now: float | None = None) -> None:
+        """
+        Copies the collected values to the shared block.
+        :param now: time.monotonic() of the update, current time if None.
+        """
+        self._last_flush = time.monotonic() if now is None else now
+        with self.block.write() as record:
+            record["started"] = self.started
+            record["updated"] = self._last_flush
+            record["frames"] = self.frames
+            record["detections"] = self.detections
+            record["classified"] = self.classified
+            record["hands_frames"] = self.hands_frames
+            record["dropped_frames"] = self.dropped_frames
+            record["fps"] = self.fps
+            record["hands_rate"] = self.hands_rate
+            record["stage_last_ms"] = self.stage_last
+            record["stage_last_ms"] *= 1e3
+            record["stage_mean_ms"] = self.stage_mean
+            record["stage_mean_ms"] *= 1e3
+            record["stage_total_s"] = self.stage_total
+            record["stage_count"] = self.stage_count
+            record["inference_buckets"] = self.inference_buckets
+
+
+def stats_to_dict(snapshot: np.ndarray) -> dict:
+    """
+    Converts a stats block snapshot to a dictionary of Python values.
+    :param snapshot: StatsBlock.read() record.
+    :return: uptime (seconds since the start of the detection loop at the last update), age (seconds since the last
+    update), counters, fps, hands_rate, stages ({stage: {last_ms, mean_ms, count, total_s}}) and inference_histogram
+    ({bucket upper bound in ms: count}).
+    """
+    started, updated = float(snapshot["started"]), float(snapshot["updated"])
+    return {"uptime": updated - started if updated > 0 else 0.,
+            "age": time.monotonic() - updated if updated > 0 else None,
+            "frames": int(snapshot["frames"]),
+            "detections": int(snapshot["detections"]),
+            "classified": int(snapshot["classified"]),
+            "hands_frames": int(snapshot["hands_frames"]),
+            "dropped_frames": int(snapshot["dropped_frames"]),
+            "fps": float(snapshot["fps"]),
+            "hands_rate": float(snapshot["hands_rate"]),
+            "stages": {stage: {"last_ms": float(snapshot["stage_last_ms"][index]),
+                               "mean_ms": float(snapshot["stage_mean_ms"][index]),
+                               "count": int(snapshot["stage_count"][index]),
+                               "total_s": float(snapshot["stage_total_s"][index])}
+                       for index, stage in enumerate(STAT_STAGES)},
+            "inference_histogram": {str(bound): int(count) for bound, count
+                                    in zip(INFERENCE_BUCKETS_MS, snapshot["inference_buckets"].tolist())}}
+
+
+def prometheus_text(stats: dict, prefix: str = "hvc") -> str:
+    """
+    Formats stats in the Prometheus text exposition format.
+    :param stats: stats_to_dict dictionary.
+    :param prefix: metrics names prefix.
+    :return: metrics text.
+    """
+    lines = []
+
+    def metric(name: str, kind: str, description: str, samples: list) -> None:
+        lines.append(f"# HELP {prefix}_{name} {description}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{prefix}_{name}{suffix}{labels} {value}")
+
+    metric("frames_total", "counter", "Frames processed by the detection loop.", [("", "", stats["frames"])])
+    metric("detections_total", "counter", "Frames processed by the hands detection.",
+           [("", "", stats["detections"])])
+    metric("classified_frames_total", "counter", "Frames whose hands were classified.",
+           [("", "", stats["classified"])])
+    metric("hands_frames_total", "counter", "Detection frames with at least one hand.",
+           [("", "", stats["hands_frames"])])
+    metric("dropped_frames_total", "counter", "Captured frames skipped by the detection.",
+           [("", "", stats["dropped_frames"])])
+    metric("fps", "gauge", "Processed frames per second.", [("", "", stats["fps"])])
+    metric("hands_rate", "gauge", "Smoothed fraction of the detection frames with hands.",
+           [("", "", stats["hands_rate"])])
+    metric("uptime_seconds", "gauge", "Duration of the detection loop.", [("", "", stats["uptime"])])
+    metric("stage_seconds_total", "counter", "Time spent in each stage of the detection loop.",
+           [("", f'{{stage="{stage}"}}', values["total_s"]) for stage, values in stats["stages"].items()])
+    metric("stage_runs_total", "counter", "Runs of each stage of the detection loop.",
+           [("", f'{{stage="{stage}"}}', values["count"]) for stage, values in stats["stages"].items()])
+    metric("stage_mean_milliseconds", "gauge", "Smoothed duration of each stage of the detection loop.",
+           [("", f'{{stage="{stage}"}}', values["mean_ms"]) for stage, values in stats["stages"].items()])
+
+    samples = []
+    cumulative = 0
+    for bound, count in stats["inference_histogram"].items():
+        cumulative += count
+        le = "+Inf" if bound == "inf" else str(float(bound) / 1e3)
+        samples.append(("_bucket", f'{{le="{le}"}}', cumulative))
+    samples.append(("_sum", "", stats["stages"]["inference"]["total_s"]))
+    samples.append(("_count", "", stats["stages"]["inference"]["count"]))
+    metric("inference_seconds", "histogram", "Duration of the hands classification.", samples)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stats = self.server.get_stats()
+        if self.path == "/metrics":
+            body, content_type = prometheus_text(stats).encode(), "text/plain; version=0.0.4"
+        elif self.path == "/stats":
+            body, content_type = json.dumps(stats).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class MetricsHttpServer:
+    def __init__(self, get_stats, port: int = 9100, host: str = "127.0.0.1") -> None:
+        """
+        Local HTTP endpoint serving the stats in Prometheus text format on /metrics and in JSON on /stats,
+        from a daemon thread.
+        :param get_stats: function returning a stats_to_dict dictionary.
+        :param port: listening port, a free port is chosen if 0.
+        :param host: listening address.
+        """
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.get_stats = get_stats
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> "MetricsHttpServer":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class UdpStatsSender:
+    def __init__(self, get_stats, address: tuple, interval: float = 1.) -> None:
+        """
+        Sends the stats in JSON, one datagram every interval seconds, from a daemon thread.
+        :param get_stats: function returning a stats_to_dict dictionary.
+        :param address: (host, port) destination.
+        :param interval: duration in seconds between two datagrams.
+        """
+        self.get_stats = get_stats
+        self.address = tuple(address)
+        self.interval = interval
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._send_loop, daemon=True)
+
+    def start(self) -> "UdpStatsSender":
+        self._thread.start()
+        return self
+
+    def _send_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self._socket.sendto(json.dumps(self.get_stats()).encode(), self.address)
+            except OSError:
+                pass  # Unreachable destination, the next datagram is sent anyway
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self._socket.close()
@@ -1,26 +1,36 @@
+from __future__ import annotations
 import cv2
-import numpy as np
 import os
+import time
+import numpy as np
 import tensorflow as tf
-from keras import layers, models
+from keras import callbacks, layers, mixed_precision, models
 import mediapipe as mp
 import argparse
+from tabulate import tabulate
+
+from nico_lib.backend_minilib import backend_from_path, export_numpy
+from nico_lib.compress_minilib import check_confidence, distill_model, evaluate_variant, prune_model, quantize_int8, \
+    report_table, variant_path
+from nico_lib.dataset_minilib import CACHE_PATH, DATASET_PATH, list_class_files, load_dataset
+from nico_lib.features_minilib import NORMALIZATIONS, augment_landmarks, mirror_classes, transform_landmarks
+from nico_lib.landmarks_minilib import LandmarkExtractor
+from nico_lib.manifest_minilib import add_model_format, load_manifest, write_manifest, write_variant_manifest
 
 MODEL_PATH = "Assets/model_data/model.h5"
+CHECKPOINT_PATH = "Assets/model_data/checkpoints/model.weights.h5"  # Best weights during training
+
 
+HIDDEN_UNITS = (63, 128, 256, 128)
+STUDENT_HIDDEN_UNITS = (32, 32)  # Distilled model
 
-def create_model(n_classes):
-    model = models.Sequential([
-        layers.Dense(63, activation='relu', input_shape=(63,)),
-        layers.Dropout(0.2),
-        layers.Dense(128, activation='relu', input_shape=(128,)),
-        layers.Dropout(0.2),
-        layers.Dense(256, activation='relu', input_shape=(256,)),
-        layers.Dropout(0.2),
-        layers.Dense(128, activation='relu', input_shape=(128,)),
-        layers.Dropout(0.2),
-        layers.Dense(n_classes, activation="softmax")
-    ])
+
+def create_model(n_classes, hidden_units=HIDDEN_UNITS):
+    model = models.Sequential([layers.Input(shape=(63,))])
+    for units in hidden_units:
+        model.add(layers.Dense(units, activation='relu'))
+        model.add(layers.Dropout(0.2))
+    model.add(layers.Dense(n_classes, activation="softmax", dtype="float32"))  # float32 output with mixed precision
 
     model.compile(optimizer='adam',
                   loss=tf.losses.SparseCategoricalCrossentropy(from_logits=True),
@@ -29,46 +39,305 @@ def create_model(n_classes):
     return model
 
 
-def load_data_from_file(path: str, class_id: int):
-    if os.path.isfile(path) and os.path.getsize(path) > 0:
-        with open(path, 'r') as f:
-            lm_from_csv = np.loadtxt(f.readlines(), delimiter=',').reshape((-1, 63))
-            labels = np.ones(lm_from_csv.shape[0], dtype=int) * class_id
-        return lm_from_csv, labels
-    else:
-        raise ValueError(f"File <{path}> is empty or doesn't exist")
+def configure_threads(intra_op_threads: int = 0, inter_op_threads: int = 0) -> None:
+    """
+    Sets the TensorFlow thread pools sizes, must be called before any TensorFlow operation.
+    :param intra_op_threads: threads used inside an operation (matrix products), TensorFlow default if 0.
+    :param inter_op_threads: operations run in parallel, TensorFlow default if 0.
+    """
+    if intra_op_threads > 0:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def split_indexes(n_samples: int, validation_split: float = 0.1, seed: int = 0) -> tuple:
+    """
+    Random split of the samples into a training and a validation set, the same for a given seed.
+    :param n_samples: number of samples.
+    :param validation_split: fraction of the samples held out for validation.
+    :param seed: seed of the split.
+    :return: (training indexes, validation indexes).
+    """
+    indexes = np.random.default_rng(seed).permutation(n_samples)
+    n_validation = int(n_samples * validation_split)
+    return indexes[n_validation:], indexes[:n_validation]
+
+
+def make_datasets(x: np.ndarray,
+                  y: np.ndarray,
+                  batch_size: int = 64,
+                  validation_split: float = 0.1,
+                  shuffle_buffer: int = 0,
+                  data_threads: int = 0,
+                  augment: bool = False,
+                  mirror: float = 0.,
+                  mirrored_classes: np.ndarray | None = None,
+                  seed: int = 0) -> tuple:
+    """
+    Splits the samples into a training and a validation set and builds the tf.data input pipelines.
+    The training samples are cached after the first epoch, reshuffled at each epoch and prefetched
+    while the previous batch is processed.
+    :param x: (samples, 63) samples.
+    :param y: (samples,) class indexes.
+    :param batch_size: number of samples per batch.
+    :param validation_split: fraction of the samples held out for validation, no validation set if 0.
+    :param shuffle_buffer: size of the shuffle buffer, all the training samples if 0.
+    :param data_threads: size of the input pipeline thread pool, TensorFlow default if 0.
+    :param augment: applies a new random augmentation (features_minilib.augment_landmarks) to each training batch.
+    :param mirror: probability of mirroring an augmented sample, 0 to disable the mirroring.
+    :param mirrored_classes: mirrored class of each class (features_minilib.mirror_classes), required with mirror.
+    :param seed: seed of the split and of the shuffling.
+    :return: (training dataset, validation dataset or None, number of training samples).
+    """
+    train_indexes, validation_indexes = split_indexes(x.shape[0], validation_split, seed)
+    n_validation = validation_indexes.shape[0]
+
+    options = tf.data.Options()
+    if data_threads > 0:
+        options.threading.private_threadpool_size = data_threads
+
+    train_dataset = tf.data.Dataset.from_tensor_slices((x[train_indexes], y[train_indexes])) \
+        .cache() \
+        .shuffle(shuffle_buffer or train_indexes.shape[0], seed=seed, reshuffle_each_iteration=True) \
+        .batch(batch_size)
+    if augment:
+        rng = np.random.default_rng(seed)
+
+        def augment_batch(features, labels):
+            features, labels = tf.numpy_function(
+                lambda batch, batch_labels: augment_landmarks(batch, rng, mirror=mirror, labels=batch_labels,
+                                                              mirrored_classes=mirrored_classes),
+                [features, labels], (tf.float32, labels.dtype))
+            return tf.ensure_shape(features, (None, 63)), tf.ensure_shape(labels, (None,))
+
+        train_dataset = train_dataset.map(augment_batch)
+    train_dataset = train_dataset.prefetch(tf.data.AUTOTUNE).with_options(options)
+
+    validation_dataset = None
+    if n_validation > 0:
+        validation_dataset = tf.data.Dataset.from_tensor_slices((x[validation_indexes], y[validation_indexes])) \
+            .batch(batch_size) \
+            .cache() \
+            .prefetch(tf.data.AUTOTUNE) \
+            .with_options(options)
+
+    return train_dataset, validation_dataset, train_indexes.shape[0]
+
+
+class ThroughputLogger(callbacks.Callback):
+    def __init__(self, n_samples: int) -> None:
+        """
+        Reports the number of training samples processed per second at the end of each epoch,
+        also added to the epoch logs as samples_per_sec.
+        :param n_samples: number of training samples per epoch.
+        """
+        super().__init__()
+        self.n_samples = n_samples
+        self._epoch_start = 0.
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        samples_per_sec = self.n_samples / max(time.perf_counter() - self._epoch_start, 1e-9)
+        if logs is not None:
+            logs["samples_per_sec"] = samples_per_sec
+        print(f"INFO: Epoch {epoch + 1} : {samples_per_sec:.0f} samples/s")
+
+
+def compress(model_path: str,
+             data_path: str = DATASET_PATH,
+             cache_path: str | None = CACHE_PATH,
+             validation_split: float = 0.1,
+             seed: int = 0,
+             batch_size: int = 64,
+             sparsity: float = 0.8,
+             prune_epochs: int = 5,
+             student_units: tuple = STUDENT_HIDDEN_UNITS,
+             distill_epochs: int = 30) -> dict:
+    """
+    Creates the compressed variants of a trained model next to it, evaluates them on the held-out samples
+    and records them in the model manifest:
+    int8 (full integer TensorFlow Lite), pruned (magnitude pruning and fine-tuning, compressed NumPy weights)
+    and distilled (smaller network trained on the model predictions, full integer TensorFlow Lite).
+    Each variant has its own manifest and can be given as model_path to HandVideoClassifier.
+    :param model_path: trained Keras model, with its manifest.
+    :param data_path: dataset folder.
+    :param cache_path: dataset cache folder, no cache if None.
+    :param validation_split: fraction of the samples held out for the evaluation, same split as the training
+    for a given seed.
+    :param seed: seed of the split.
+    :param batch_size: fine-tuning and distillation batch size.
+    :param sparsity: fraction of the weights of the pruned variant set to zero.
+    :param prune_epochs: fine-tuning epochs of the pruned variant.
+    :param student_units: sizes of the hidden layers of the distilled variant.
+    :param distill_epochs: training epochs of the distilled variant.
+    :return: {variant name: evaluation results}.
+    """
+    model = models.load_model(model_path)
+    manifest = load_manifest(model_path, n_classes=model.output_shape[-1])
+    if manifest is None:
+        raise FileNotFoundError(f"No manifest found for <{model_path}>, train the model first")
+    files_names = [manifest["dataset"][label]["file"] for label in manifest["labels"]] \
+        if "dataset" in manifest else list_class_files(data_path)
+    x, y, _ = load_dataset(data_path, files_names, cache_path=cache_path, verbose=True)
+    x = np.array(transform_landmarks(x, manifest["input"]["normalization"]), dtype=np.float32)
+    train_indexes, validation_indexes = split_indexes(x.shape[0], validation_split, seed)
+    if validation_indexes.shape[0] == 0:
+        raise ValueError("The variants are evaluated on the held-out samples, use a validation split above 0")
+    x_train, y_train = x[train_indexes], y[train_indexes]
+    n_classes = len(manifest["labels"])
+
+    print("INFO: Full integer quantization")
+    int8_path = quantize_int8(model, x_train, variant_path(model_path, "int8", ".tflite"))
+
+    print(f"INFO: Pruning at {sparsity:.0%} sparsity")
+    pruned = models.clone_model(model)
+    pruned.set_weights(model.get_weights())
+    prune_model(pruned, x_train, y_train, sparsity=sparsity, epochs=prune_epochs, batch_size=batch_size)
+    pruned_keras_path = variant_path(model_path, "pruned", ".h5")
+    pruned.save(pruned_keras_path)
+    pruned_path = export_numpy(pruned_keras_path, compressed=True)
+
+    print(f"INFO: Distillation to hidden layers {list(student_units)}")
+    student = distill_model(model, create_model(n_classes, student_units), x_train, y_train, n_classes,
+                            epochs=distill_epochs, batch_size=batch_size, seed=seed)
+    distilled_keras_path = variant_path(model_path, "distilled", ".h5")
+    student.save(distilled_keras_path)
+    distilled_path = quantize_int8(student, x_train, variant_path(model_path, "distilled", ".tflite"))
+
+    variants = {"base": (model_path, None),
+                "int8": (int8_path, {"method": "int8"}),
+                "pruned": (pruned_path, {"method": "pruning", "sparsity": sparsity, "epochs": prune_epochs}),
+                "distilled": (distilled_path, {"method": "distillation+int8", "hidden_units": list(student_units),
+                                               "epochs": distill_epochs})}
+    results = {}
+    for name, (path, compression) in variants.items():
+        results[name] = dict(evaluate_variant(path, x[validation_indexes], y[validation_indexes]),
+                             path=path, backend=backend_from_path(path))
+        if compression is not None:
+            evaluation = {key: results[name][key] for key in ("accuracy", "mean_confidence", "size", "latency_p50_us")}
+            write_variant_manifest(model_path, path, dict(compression, **evaluation), manifest)
+    add_model_format(pruned_keras_path)
+    add_model_format(distilled_keras_path)
+
+    rows = report_table(results)
+    print(tabulate(tabular_data=rows[1:], headers=rows[0], tablefmt="rounded_outline"))
+    for name in check_confidence(results):
+        print(f"WARNING: the {name} variant is less confident than the base model "
+              f"({results[name]['mean_confidence']:.2f} against {results['base']['mean_confidence']:.2f}), "
+              f"its predictions may stay under the smoothing enter_threshold")
+    return results
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Train and visualize")
+    parser = argparse.ArgumentParser(description="Train and visualize, or compress a trained model")
+    parser.add_argument('command', nargs="?", choices=("train", "compress"), default="train",
+                        help="compress creates the int8, pruned and distilled variants of the trained model")
     parser.add_argument('--no_train',
                         help="Disable model training and use pre-existing model",
                         action="store_true")
+    parser.add_argument('--data_path', default=DATASET_PATH, help="Folder of the class CSV files")
+    parser.add_argument('--cache_path', default=CACHE_PATH, help="Folder of the binary dataset cache")
+    parser.add_argument('--no_cache', help="Parse the CSV files without using the cache", action="store_true")
+    parser.add_argument('--epochs', type=int, default=50, help="Maximum number of epochs")
+    parser.add_argument('--batch_size', type=int, default=64, help="Number of samples per batch")
+    parser.add_argument('--validation_split', type=float, default=0.1,
+                        help="Fraction of the samples held out for early stopping, 0 to train on all the samples")
+    parser.add_argument('--patience', type=int, default=5,
+                        help="Epochs without validation loss improvement before stopping")
+    parser.add_argument('--shuffle_buffer', type=int, default=0, help="Shuffle buffer size, 0 for the whole dataset")
+    parser.add_argument('--intra_op_threads', type=int, default=0, help="Threads per operation, 0 for default")
+    parser.add_argument('--inter_op_threads', type=int, default=0, help="Parallel operations, 0 for default")
+    parser.add_argument('--data_threads', type=int, default=0, help="Input pipeline threads, 0 for default")
+    parser.add_argument('--mixed_precision', help="Computes in float16 (for GPUs with float16 units)",
+                        action="store_true")
+    parser.add_argument('--checkpoint_path', default=CHECKPOINT_PATH, help="Best weights file during training")
+    parser.add_argument('--resume', help="Starts from the weights of the checkpoint", action="store_true")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the validation split and of the shuffling")
+    parser.add_argument('--normalization', choices=NORMALIZATIONS, default="wrist_scale",
+                        help="Input transform, recorded in the manifest and applied again at inference")
+    parser.add_argument('--no_augment', help="Disable the random augmentation of the training samples",
+                        action="store_true")
+    parser.add_argument('--mirror', type=float, default=0.,
+                        help="Probability of mirroring an augmented sample, left and right classes being swapped")
+    parser.add_argument('--hidden_units', default=",".join(map(str, HIDDEN_UNITS)),
+                        help="Comma separated sizes of the hidden layers")
+    parser.add_argument('--model_path', default=MODEL_PATH, help="Trained model to compress")
+    parser.add_argument('--sparsity', type=float, default=0.8, help="Fraction of the pruned weights")
+    parser.add_argument('--prune_epochs', type=int, default=5, help="Fine-tuning epochs after pruning")
+    parser.add_argument('--student_units', default=",".join(map(str, STUDENT_HIDDEN_UNITS)),
+                        help="Comma separated sizes of the hidden layers of the distilled model")
+    parser.add_argument('--distill_epochs', type=int, default=30, help="Training epochs of the distilled model")
     args = parser.parse_args()
 
-    data_path = "Assets/datasets_records"
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+
+    if args.command == "compress":
+        compress(args.model_path,
+                 data_path=args.data_path,
+                 cache_path=None if args.no_cache else args.cache_path,
+                 validation_split=args.validation_split,
+                 seed=args.seed,
+                 batch_size=args.batch_size,
+                 sparsity=args.sparsity,
+                 prune_epochs=args.prune_epochs,
+                 student_units=tuple(int(units) for units in args.student_units.split(",")),
+                 distill_epochs=args.distill_epochs)
+        return
+
+    data_path = args.data_path
     train_model = not args.no_train
     model_path = MODEL_PATH
 
-    files_names = [class_file for class_file in os.listdir(data_path)]
+    files_names = list_class_files(data_path)
 
     if train_model:
-        x, y = load_data_from_file(data_path + "/" + files_names[0], class_id=0)
-        for i in range(1, len(files_names)):
-            xc, yc = load_data_from_file(data_path + "/" + files_names[i], class_id=i)
-            x = np.concatenate((x, xc))
-            y = np.concatenate((y, yc))
+        x, y, files_names = load_dataset(data_path, files_names,
+                                         cache_path=None if args.no_cache else args.cache_path, verbose=True)
+        x = transform_landmarks(x, args.normalization)
+
+        train_dataset, validation_dataset, n_train = make_datasets(x, y,
+                                                                   batch_size=args.batch_size,
+                                                                   validation_split=args.validation_split,
+                                                                   shuffle_buffer=args.shuffle_buffer,
+                                                                   data_threads=args.data_threads,
+                                                                   augment=not args.no_augment,
+                                                                   mirror=args.mirror,
+                                                                   mirrored_classes=mirror_classes(
+                                                                       [x[:-4] for x in files_names]),
+                                                                   seed=args.seed)
 
-        model = create_model(len(files_names))
+        if args.mixed_precision:
+            mixed_precision.set_global_policy("mixed_float16")
+        model = create_model(len(files_names), [int(units) for units in args.hidden_units.split(",")])
         model.summary()
+        if args.resume and os.path.isfile(args.checkpoint_path):
+            model.load_weights(args.checkpoint_path)
+            print(f"INFO: Training resumed from {args.checkpoint_path}")
 
-        model.fit(x=x, y=y,
-                  epochs=50)
+        monitor = "val_loss" if validation_dataset is not None else "loss"
+        os.makedirs(os.path.dirname(args.checkpoint_path) or ".", exist_ok=True)
+        model.fit(train_dataset,
+                  validation_data=validation_dataset,
+                  epochs=args.epochs,
+                  callbacks=[ThroughputLogger(n_train),
+                             callbacks.EarlyStopping(monitor=monitor, patience=args.patience,
+                                                     restore_best_weights=True, verbose=1),
+                             callbacks.ModelCheckpoint(args.checkpoint_path, monitor=monitor,
+                                                       save_best_only=True, save_weights_only=True)])
         model.save(model_path)
+        posture_list = [x[:-4] for x in files_names]
+        normalization = args.normalization
+        write_manifest(model_path, posture_list, data_path, files_names, samples=np.bincount(y).tolist(),
+                       normalization=normalization)
     else:
         model = models.load_model(model_path)
+        manifest = load_manifest(model_path, n_classes=model.output_shape[-1])
+        posture_list = manifest["labels"] if manifest is not None else [x[:-4] for x in files_names]
+        normalization = manifest["input"]["normalization"] if manifest is not None else "none"
 
-    posture_list = [x[:-4] for x in files_names]
     print(f"INFO: Loaded classes : {posture_list}")
 
     # Capture object initialisation
@@ -77,6 +346,7 @@ def main():
     # Hands detection objects
     mp_hands = mp.solutions.hands
     hands = mp_hands.Hands(min_detection_confidence=0.9)
+    extractor = LandmarkExtractor(max_num_hands=2)
 
     while cap.isOpened():
         ret, img = cap.read()
@@ -88,10 +358,7 @@ def main():
             # Detection
             results = hands.process(img_rgb)
 
-            nb_hands = 0
-            # if at least one hand is detected :
-            if results.multi_hand_landmarks:
-                nb_hands = len(results.multi_hand_landmarks)
+            nb_hands = extractor.extract(results)
 
             if nb_hands == 0:
                 cv2.rectangle(img_rgb, (0, 0), (w, h), (0, 0, 0), 5)
@@ -101,14 +368,10 @@ def main():
                             fontScale=1, color=(100, 0, 255), thickness=1)
             elif nb_hands == 1:
                 cv2.rectangle(img_rgb, (0, 0), (w, h), (0, 255, 0), 5)
-                coords_list = np.zeros((21, 3), dtype=np.float32)
-                for handLms in results.multi_hand_landmarks:
-                    # Landmarks enumeration
-                    for nb, lm in enumerate(handLms.landmark):
-                        coords_list[nb, :] = [lm.x, lm.y, lm.z]
+                coords_list = extractor.landmarks[0]
 
                 if coords_list.flatten().shape == (63,):
-                    pred = model.predict(coords_list.reshape(1, 63), verbose=False)
+                    pred = model.predict(transform_landmarks(coords_list, normalization), verbose=False)
                     for c in range(len(posture_list)):
                         cv2.rectangle(img=img_rgb,
                                       pt1=(0, img_rgb.shape[0]//len(posture_list)